@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errorcode, pooling
+from dotenv import load_dotenv
+
+# Read .env once per process rather than on every connection
+load_dotenv()
+
+POOL_NAME = "shipping_ab_test"
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF", "0.5"))
+STREAM_BATCH_SIZE = 10_000
+
+# Errors worth retrying: the server went away, refused us, or a lock was contended
+TRANSIENT_ERRORS = {
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.ER_CON_COUNT_ERROR,
+    errorcode.ER_LOCK_WAIT_TIMEOUT,
+    errorcode.ER_LOCK_DEADLOCK,
+}
+
+_pool = None
+_engine = None
+_lock = threading.Lock()
+
+def _env(*names, default=None):
+    for name in names:
+        value = os.getenv(name)
+        if value:
+            return value
+    return default
+
+def get_db_config():
+    """Connection settings; MYSQL_* (data_simulation) and DB_* (etl_pipeline) names are both accepted.
+
+    Defaults match docker/docker-compose.yaml.
+    """
+    return {
+        'host': _env('MYSQL_HOST', 'DB_HOST', default='localhost'),
+        'port': int(_env('MYSQL_PORT', 'DB_PORT', default='3308')),
+        'user': _env('MYSQL_USER', 'DB_USER', default='devcharlie'),
+        'password': _env('MYSQL_PASSWORD', 'DB_PASSWORD', default='devcharlie'),
+        'database': _env('MYSQL_DATABASE', 'DB_NAME', default='ecommerce_ab_test'),
+    }
+
+def is_transient(err):
+    return getattr(err, 'errno', None) in TRANSIENT_ERRORS
+
+def retry(fn, *args, attempts=RETRY_ATTEMPTS, **kwargs):
+    """Call fn, retrying with exponential backoff on transient MySQL errors."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except mysql.connector.Error as err:
+            if not is_transient(err) or attempt == attempts:
+                raise
+            delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+            print(f"Transient database error ({err}); retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def set_pool_size(size):
+    """Size of the pool this process opens; call before the first connection (e.g. 1 in single-query workers)."""
+    global POOL_SIZE
+    POOL_SIZE = size
+
+def get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = retry(pooling.MySQLConnectionPool, pool_name=POOL_NAME, pool_size=POOL_SIZE, **get_db_config())
+        return _pool
+
+def _checkout():
+    # MySQLConnectionPool raises immediately when exhausted; wait for a connection to come back
+    deadline = time.monotonic() + POOL_TIMEOUT
+    while True:
+        try:
+            return get_pool().get_connection()
+        except pooling.PoolError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+def get_connection(**overrides):
+    """Pooled connection (close() hands it back); overrides open a dedicated connection instead.
+
+    Raises mysql.connector.Error if no connection can be made after retries.
+    """
+    if overrides:
+        return retry(mysql.connector.connect, **{**get_db_config(), **overrides})
+    return retry(_checkout)
+
+@contextmanager
+def connection(**overrides):
+    conn = get_connection(**overrides)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def cursor(streaming=False, commit=False, **overrides):
+    """Cursor on a pooled connection; streaming=True uses an unbuffered (server-side) cursor."""
+    with connection(**overrides) as conn:
+        cur = conn.cursor(buffered=not streaming)
+        try:
+            yield cur
+            if commit:
+                conn.commit()
+        except Exception:
+            if commit:
+                conn.rollback()
+            raise
+        finally:
+            if streaming:
+                # Drain anything left unread so the connection can be reused
+                conn.consume_results()
+            cur.close()
+
+def fetch_all(query, params=None):
+    def _fetch():
+        with cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+    return retry(_fetch)
+
+def execute(query, params=None):
+    """Run a write statement in its own transaction; returns the affected row count."""
+    def _execute():
+        with cursor(commit=True) as cur:
+            cur.execute(query, params)
+            return cur.rowcount
+    return retry(_execute)
+
+def stream_query(query, params=None, batch_size=STREAM_BATCH_SIZE):
+    """Yield rows as the server sends them, holding at most batch_size rows client-side."""
+    with cursor(streaming=True) as cur:
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+def get_engine():
+    """Shared SQLAlchemy engine (for pandas.read_sql) built from the same settings."""
+    global _engine
+    with _lock:
+        if _engine is None:
+            from sqlalchemy import create_engine
+            from sqlalchemy.engine import URL
+
+            config = get_db_config()
+            url = URL.create(
+                "mysql+mysqlconnector",
+                username=config['user'],
+                password=config['password'],
+                host=config['host'],
+                port=config['port'],
+                database=config['database'],
+            )
+            _engine = create_engine(url, pool_size=POOL_SIZE, pool_pre_ping=True)
+        return _engine
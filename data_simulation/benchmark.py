@@ -0,0 +1,136 @@
+import random
+import sys
+import time
+from datetime import datetime
+
+import mysql.connector
+import numpy as np
+
+import generate_order_items
+import generate_orders
+import generate_reviews
+import generate_user_behaviors
+from db_connection import get_connection
+from common.db import get_db_config
+from text_pool import get_text_pool
+
+USER_IDS = list(range(1, 5001))
+STORE_IDS = list(range(1, 8))
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def report(label, rows, seconds):
+    print(f"{label:<28} {rows:>12,} rows  {seconds:8.3f}s  {rows / seconds:>14,.0f} rows/sec")
+
+def benchmark_orders(num_orders=200_000):
+    """Compare the row-by-row generate_orders loop with the vectorized batch generator."""
+    print(f"▶ generate_orders ({num_orders:,} orders)")
+    _, elapsed = timed(generate_orders.generate_orders, USER_IDS, STORE_IDS, num_orders)
+    report("loop", num_orders, elapsed)
+    _, elapsed = timed(generate_orders.generate_orders_batch, USER_IDS, STORE_IDS, num_orders)
+    report("batch", num_orders, elapsed)
+    batch, elapsed = timed(generate_orders.generate_orders_batch, USER_IDS, STORE_IDS, num_orders)
+    _, convert = timed(generate_orders.orders_batch_to_rows, batch)
+    report("batch + row conversion", num_orders, elapsed + convert)
+
+def benchmark_text_pool(num_orders=20_000):
+    """Per-row Faker calls versus sampling product names and review text from the TextPool."""
+    order_data = [(i, "home", 120.0) for i in range(num_orders)]
+    delivered = [(i, 1, datetime(2024, 1, 1), 0) for i in range(num_orders)]
+    pool, elapsed = timed(get_text_pool)
+    print(f"▶ text pool ready in {elapsed:.3f}s")
+
+    print(f"▶ generate_order_items ({num_orders:,} orders)")
+    items, elapsed = timed(generate_order_items.generate_order_items, order_data, random.Random(42))
+    report("faker", len(items), elapsed)
+    items, elapsed = timed(generate_order_items.generate_order_items, order_data, random.Random(42), pool)
+    report("text pool", len(items), elapsed)
+
+    print(f"▶ generate_reviews ({num_orders:,} delivered orders)")
+    reviews, elapsed = timed(generate_reviews.generate_reviews, delivered, random.Random(42))
+    report("faker", len(reviews), elapsed)
+    reviews, elapsed = timed(generate_reviews.generate_reviews, delivered, random.Random(42), pool)
+    report("text pool", len(reviews), elapsed)
+
+def benchmark_order_items(num_orders=1_000_000):
+    """Vectorized order-item splitting, checked against the item-total invariants."""
+    orders = generate_orders.generate_orders_batch(USER_IDS, STORE_IDS, num_orders)
+    order_ids = np.arange(1, num_orders + 1)
+    pool = get_text_pool()
+
+    print(f"▶ generate_order_items_batch ({num_orders:,} orders)")
+    items, elapsed = timed(
+        generate_order_items.generate_order_items_batch,
+        order_ids, orders["product_category"], orders["total_value"], pool=pool,
+    )
+    report("batch", len(items["order_id"]), elapsed)
+    generate_order_items.validate_order_items_batch(
+        items, order_ids, orders["product_category"], orders["total_value"]
+    )
+    print("✅ item totals match order totals to the cent; prices within category bounds")
+
+def benchmark_behaviors(num_orders=200_000):
+    """Compare the per-event behavior loops with the vectorized ragged-array generator."""
+    orders = generate_orders.generate_orders_batch(USER_IDS, STORE_IDS, num_orders)
+    order_data = list(zip(
+        range(1, num_orders + 1),
+        orders["user_id"].tolist(),
+        orders["product_category"].tolist(),
+        orders["order_date"].astype(object),
+    ))
+    users_with_orders = set(orders["user_id"].tolist())
+
+    print(f"▶ user behaviors ({num_orders:,} orders, {len(USER_IDS):,} users)")
+    behaviors, elapsed = timed(generate_user_behaviors.generate_behaviors_for_orders, order_data)
+    extra, extra_elapsed = timed(
+        generate_user_behaviors.generate_behaviors_for_non_order_users, USER_IDS, users_with_orders
+    )
+    report("loop", len(behaviors) + len(extra), elapsed + extra_elapsed)
+    behaviors, elapsed = timed(
+        generate_user_behaviors.generate_behaviors_batch,
+        orders["user_id"], orders["product_category"], orders["order_date"], USER_IDS,
+    )
+    report("batch", len(behaviors["user_id"]), elapsed)
+
+def benchmark_connections(iterations=200):
+    """Connection setup overhead: a fresh connection per call (the old get_connection) vs the pool."""
+    def fresh():
+        for _ in range(iterations):
+            conn = mysql.connector.connect(**get_db_config())
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            conn.close()
+
+    def pooled():
+        for _ in range(iterations):
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            conn.close()
+
+    print(f"▶ connection setup ({iterations} round-trips)")
+    _, elapsed = timed(fresh)
+    print(f"{'fresh connection':<28} {elapsed / iterations * 1000:8.2f} ms/connection")
+    get_connection().close()  # warm the pool
+    _, elapsed = timed(pooled)
+    print(f"{'pooled connection':<28} {elapsed / iterations * 1000:8.2f} ms/connection")
+
+BENCHMARKS = {
+    "orders": benchmark_orders,
+    "text_pool": benchmark_text_pool,
+    "order_items": benchmark_order_items,
+    "behaviors": benchmark_behaviors,
+    "connections": benchmark_connections,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
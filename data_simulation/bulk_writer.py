@@ -0,0 +1,136 @@
+import os
+import tempfile
+import time
+from datetime import date, datetime
+from itertools import islice
+from db_connection import connection
+
+# Rows held in memory (and committed) per round-trip
+CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '10000'))
+# Spool chunks to a TSV and push them with LOAD DATA LOCAL INFILE instead of executemany
+USE_LOAD_DATA = os.getenv('BULK_USE_LOAD_DATA', '0') == '1'
+
+def iter_chunks(rows, chunk_size=CHUNK_SIZE):
+    """Yield lists of at most chunk_size rows from any iterable without materializing it."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _tsv_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+    )
+
+def _spool_chunk(chunk, spool_dir):
+    fd, path = tempfile.mkstemp(suffix=".tsv", dir=spool_dir)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        for row in chunk:
+            f.write("\t".join(_tsv_value(v) for v in row))
+            f.write("\n")
+    return path
+
+def bulk_insert(table, columns, rows, chunk_size=CHUNK_SIZE, use_load_data=USE_LOAD_DATA, after_chunk=None):
+    """Stream rows into table in chunks, committing per chunk; returns the number of rows written.
+
+    after_chunk(cursor, chunk), if given, runs in each chunk's transaction just before its commit.
+    """
+    column_list = ", ".join(columns)
+    insert_query = f"""
+    INSERT INTO {table} ({column_list})
+    VALUES ({", ".join(["%s"] * len(columns))})
+    """
+    load_query = f"""
+    LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+    CHARACTER SET utf8mb4
+    FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+    LINES TERMINATED BY '\\n'
+    ({column_list})
+    """
+
+    spool_dir = tempfile.mkdtemp(prefix=f"bulk_{table}_") if use_load_data else None
+    # LOAD DATA needs a dedicated connection allowed to read from the spool directory
+    overrides = {"allow_local_infile_in_path": spool_dir} if use_load_data else {}
+
+    total = 0
+    start = time.perf_counter()
+    try:
+        with connection(**overrides) as conn:
+            cursor = conn.cursor()
+            try:
+                for chunk in iter_chunks(rows, chunk_size):
+                    if use_load_data:
+                        path = _spool_chunk(chunk, spool_dir)
+                        try:
+                            cursor.execute(load_query, (path,))
+                        finally:
+                            os.remove(path)
+                    else:
+                        cursor.executemany(insert_query, chunk)
+                    if after_chunk:
+                        after_chunk(cursor, chunk)
+                    conn.commit()
+                    total += len(chunk)
+            finally:
+                cursor.close()
+    finally:
+        if spool_dir:
+            os.rmdir(spool_dir)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"{table}: {total} rows written in {elapsed:.2f}s ({rate:,.0f} rows/sec).")
+    return total
+
+def _create_id_reservations(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS id_reservations (
+        table_name VARCHAR(64) PRIMARY KEY,
+        next_id BIGINT NOT NULL
+    )
+    """)
+
+def next_id(table, id_column, count):
+    """Reserve count consecutive primary key values for table, so ids can be allocated client-side; returns the first.
+
+    The table's row in id_reservations is locked (SELECT ... FOR UPDATE) while the range is taken,
+    so writers reserving at the same time always get disjoint ranges. Rows inserted without a
+    reservation (AUTO_INCREMENT) are skipped over through MAX(id_column), but must not be written
+    while reserved ranges are still being filled.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            # DDL commits implicitly, so it runs before the reservation's transaction
+            _create_id_reservations(cur)
+            cur.execute("INSERT IGNORE INTO id_reservations (table_name, next_id) VALUES (%s, 1)", (table,))
+            cur.execute("SELECT next_id FROM id_reservations WHERE table_name = %s FOR UPDATE", (table,))
+            ((reserved,),) = cur.fetchall()
+            cur.execute(f"SELECT COALESCE(MAX({id_column}), 0) + 1 FROM {table}")
+            ((free,),) = cur.fetchall()
+            first = max(int(reserved), int(free))
+            cur.execute("UPDATE id_reservations SET next_id = %s WHERE table_name = %s", (first + count, table))
+            conn.commit()
+        finally:
+            cur.close()
+    return first
+
+def with_reserved_ids(table, id_column, rows, chunk_size=CHUNK_SIZE):
+    """Prefix each row with a reserved id, reserving one chunk at a time so rows can still stream."""
+    for chunk in iter_chunks(rows, chunk_size):
+        first = next_id(table, id_column, len(chunk))
+        for i, row in enumerate(chunk):
+            yield (first + i,) + tuple(row)
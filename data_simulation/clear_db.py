@@ -1,6 +1,6 @@
 # data_simulation/00_reset_database.py
 
-from db_connection import get_connection
+from db_connection import cursor
 
 DROP_QUERIES = [
     "SET FOREIGN_KEY_CHECKS = 0;",
@@ -15,13 +15,10 @@ DROP_QUERIES = [
 ]
 
 def reset_database():
-    conn = get_connection()
-    cursor = conn.cursor()
-    for query in DROP_QUERIES:
-        cursor.execute(query)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # One connection, so SET FOREIGN_KEY_CHECKS applies to the drops
+    with cursor(commit=True) as cur:
+        for query in DROP_QUERIES:
+            cur.execute(query)
     print("✅ Database reset successfully.")
 
 if __name__ == "__main__":
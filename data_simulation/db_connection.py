@@ -1,22 +1,17 @@
 import os
-import mysql.connector  
-from dotenv import load_dotenv
+import sys
 
-def get_connection():
-    load_dotenv() 
-    db_config = {
-        'host': os.getenv('MYSQL_HOST', ''),
-        'user': os.getenv('MYSQL_USER', ''),
-        'password': os.getenv('MYSQL_PASSWORD', ''),
-        'database': os.getenv('MYSQL_DATABASE', ''),
-        'port': os.getenv('MYSQL_PORT', '')
-    }
-    
-    try:
-        connection = mysql.connector.connect(**db_config)
-        return connection
-    except mysql.connector.Error as err:
-        print(f"Error: {err}")
-        return None
-    
-    
\ No newline at end of file
+# The data-access layer is shared with etl_pipeline and lives in common/db.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.db import (  # noqa: E402
+    connection,
+    cursor,
+    execute,
+    fetch_all,
+    get_connection,
+    get_engine,
+    retry,
+    set_pool_size,
+    stream_query,
+)
@@ -1,36 +1,41 @@
 import random
+import numpy as np
 from datetime import datetime
-from db_connection import get_connection
+from db_connection import fetch_all
+from bulk_writer import bulk_insert, next_id, with_reserved_ids
 
 random.seed(42)
 
 LOGISTICS_COMPANIES = ["DHL", "UPS", "FedEx", "DPD", "GLS"]
 SHIPPING_METHODS = {0: "express", 1: "standard", 2: "economy"}
 SHIPPING_PROMISE_DAYS = {0: 1, 1: 2, 2: 3}
+LOGISTICS_COLUMNS = (
+    "order_id", "logistics_company", "shipping_method",
+    "expected_delivery", "actual_delivery", "delay_hours",
+)
 
 def fetch_orders_needing_logistics():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    # Only orders newer than the last one with logistics: a primary-key range scan, so a
+    # top-up run costs time proportional to the new orders rather than the whole table
+    return fetch_all("""
         SELECT order_id, shipped_time, received_time
         FROM orders
-        WHERE logistics_id IS NULL 
-        AND order_status != 'cancelled' 
+        WHERE order_id > (SELECT COALESCE(MAX(order_id), 0) FROM logistics)
+        AND logistics_id IS NULL
+        AND order_status != 'cancelled'
     """)
-    orders = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return orders
 
 def assign_variant(order_id):
     return order_id % 3
 
-def generate_logistics_records(order_rows):
-    logistics_records = []
+def generate_logistics_records(order_rows, rng=random):
+    return list(iter_logistics_records(order_rows, rng))
 
+def iter_logistics_records(order_rows, rng=random):
+    """Lazily yield logistics rows so they can be streamed into the database."""
     for order_id, shipped_time, received_time in order_rows:
         variant = assign_variant(order_id)
-        logistics_company = random.choice(LOGISTICS_COMPANIES)
+        logistics_company = rng.choice(LOGISTICS_COMPANIES)
         shipping_method = SHIPPING_METHODS[variant]
         expected_days = SHIPPING_PROMISE_DAYS[variant]
 
@@ -42,45 +47,85 @@ def generate_logistics_records(order_rows):
         expected_hours = expected_days * 24
         delay_hours = max(total_hours - expected_hours, 0)
 
-        logistics_records.append((
+        yield (
             order_id,
             logistics_company,
             shipping_method,
             expected_days,
             actual_delivery,
             delay_hours
-        ))
+        )
 
-    return logistics_records
+def assign_logistics_ids(order_rows):
+    """Fill logistics_id on (order_id, user_id, store_id, logistics_id, ...) rows of non-cancelled orders."""
+    order_rows = list(order_rows)
+    rows = []
+    next_logistics_id = next_id("logistics", "logistics_id", sum(row[7] != "cancelled" for row in order_rows))
+    for row in order_rows:
+        if row[7] != "cancelled":
+            row = row[:3] + (next_logistics_id,) + row[4:]
+            next_logistics_id += 1
+        rows.append(row)
+    return rows
 
-def insert_logistics_to_db(logistics_records):
-    conn = get_connection()
-    cursor = conn.cursor()
+def derive_logistics_batch(order_ids, shipped_time, received_time, order_status, first_logistics_id, seed=42):
+    """Vectorized logistics for a generate_orders_batch result whose order ids are already allocated.
 
-    insert_query = """
-    INSERT INTO logistics (
-        order_id, logistics_company, shipping_method,
-        expected_delivery, actual_delivery, delay_hours
-    ) VALUES (%s, %s, %s, %s, %s, %s)
+    Returns (logistics_id per order, 0 for cancelled orders; logistics columns keyed like LOGISTICS_COLUMNS).
     """
-    cursor.executemany(insert_query, logistics_records)
-    conn.commit()
+    rng = np.random.default_rng(seed)
+    order_ids = np.asarray(order_ids)
+    shipped = order_status != "cancelled"
+    logistics_ids = np.zeros(len(order_ids), dtype=np.int64)
+    logistics_ids[shipped] = first_logistics_id + np.arange(shipped.sum())
+
+    ids = order_ids[shipped]
+    variant = ids % 3
+    seconds = (received_time[shipped] - shipped_time[shipped]).astype("timedelta64[s]").astype(np.int64)
+    expected_days = np.asarray([SHIPPING_PROMISE_DAYS[v] for v in range(3)])[variant]
+    logistics = {
+        "logistics_id": logistics_ids[shipped],
+        "order_id": ids,
+        "logistics_company": np.asarray(LOGISTICS_COMPANIES)[rng.integers(0, len(LOGISTICS_COMPANIES), size=len(ids))],
+        "shipping_method": np.asarray([SHIPPING_METHODS[v] for v in range(3)])[variant],
+        "expected_delivery": expected_days,
+        "actual_delivery": seconds // 86400,
+        "delay_hours": np.maximum(seconds // 3600 - expected_days * 24, 0),
+    }
+    return logistics_ids, logistics
 
-    # Update orders table with logistics IDs using efficient batch update
+def logistics_batch_to_rows(logistics):
+    """Lazily convert a derive_logistics_batch result into (logistics_id,) + LOGISTICS_COLUMNS rows."""
+    return zip(*(logistics[column].tolist() for column in ("logistics_id",) + LOGISTICS_COLUMNS))
+
+def _link_orders(cursor, chunk):
+    # Committed together with the chunk's logistics rows: a failed run never leaves logistics behind
+    # an unlinked order, which fetch_orders_needing_logistics' MAX(order_id) watermark would then skip
     cursor.execute("""
         UPDATE orders o
         JOIN logistics l ON o.order_id = l.order_id
         SET o.logistics_id = l.logistics_id
-        WHERE o.logistics_id IS NULL
-    """)
-    conn.commit()
+        WHERE l.logistics_id BETWEEN %s AND %s
+    """, (chunk[0][0], chunk[-1][0]))
+
+def insert_logistics_to_db(logistics_records, with_ids=False):
+    """Insert logistics rows and point their orders at them.
+
+    with_ids=True means rows start with a client-allocated logistics_id that the orders were
+    already written with, so no update is needed.
+    """
+    if with_ids:
+        count = bulk_insert("logistics", ("logistics_id",) + LOGISTICS_COLUMNS, logistics_records)
+        print(f"{count} logistics records inserted.")
+        return
 
-    cursor.close()
-    conn.close()
-    print(f"{len(logistics_records)} logistics records inserted and orders updated.")
+    # Reserve ids per chunk so each orders update only touches its chunk's id range
+    records = with_reserved_ids("logistics", "logistics_id", logistics_records)
+    count = bulk_insert("logistics", ("logistics_id",) + LOGISTICS_COLUMNS, records, after_chunk=_link_orders)
+    print(f"{count} logistics records inserted and orders updated.")
 
 if __name__ == "__main__":
     order_rows = fetch_orders_needing_logistics()
-    logistics = generate_logistics_records(order_rows)
+    logistics = iter_logistics_records(order_rows)
     insert_logistics_to_db(logistics)
     print("Logistics records generated and inserted successfully.")
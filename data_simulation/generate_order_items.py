@@ -1,6 +1,10 @@
 import random
+import sys
+import numpy as np
 from faker import Faker
-from db_connection import get_connection
+from db_connection import fetch_all
+from bulk_writer import bulk_insert
+from text_pool import get_text_pool
 
 fake = Faker()
 random.seed(42)
@@ -17,22 +21,25 @@ CATEGORIES = [
 
 CATEGORY_LIST = [c[0] for c in CATEGORIES]
 PRICE_MAP = {cat: price_range for cat, price_range in CATEGORIES}
+ORDER_ITEM_COLUMNS = ("order_id", "product_name", "category", "quantity", "price")
+
+ITEM_COUNTS = [1, 2, 3]
+ITEM_COUNT_WEIGHTS = [0.7, 0.2, 0.1]
+MAIN_CATEGORY_PROB = 0.85
+# Per-category (min, max) unit price in cents, indexed like CATEGORY_LIST
+PRICE_BOUNDS_CENTS = np.array([[low * 100, high * 100] for _, (low, high) in CATEGORIES], dtype=np.int64)
 
 def fetch_order_data():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT order_id, product_category, total_value FROM orders")
-    orders = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return orders
+    return fetch_all("SELECT order_id, product_category, total_value FROM orders")
 
-def generate_order_items(order_data):
-    order_items = []
+def generate_order_items(order_data, rng=random, pool=None):
+    return list(iter_order_items(order_data, rng, pool))
 
+def iter_order_items(order_data, rng=random, pool=None):
+    """Lazily yield order item rows; product names come from a TextPool when one is given."""
     for order_id, main_category, total_value in order_data:
         # Determine number of items (1-3)
-        num_items = random.choices([1, 2, 3], weights=[0.7, 0.2, 0.1])[0]
+        num_items = rng.choices([1, 2, 3], weights=[0.7, 0.2, 0.1])[0]
         items = []
         remaining_total = total_value
         
@@ -41,21 +48,21 @@ def generate_order_items(order_data):
             is_last = (item_num == num_items - 1)
             
             # 85% chance to match order category, 15% random
-            category = main_category if random.random() < 0.85 else random.choice(CATEGORY_LIST)
+            category = main_category if rng.random() < 0.85 else rng.choice(CATEGORY_LIST)
             min_price, max_price = PRICE_MAP[category]
             
             # Generate quantity (1-3 except last item)
             if is_last:
                 quantity = 1  
             else:
-                quantity = random.randint(1, 3)
+                quantity = rng.randint(1, 3)
                 # Ensure remaining total can support subsequent items
                 max_possible_price = min(max_price, (remaining_total / quantity) - 0.01)
                 if max_possible_price < min_price:
                     quantity = max(1, int(remaining_total / max_price))
                     max_possible_price = min(max_price, remaining_total / quantity)
                 
-                price = round(random.uniform(min_price, max_possible_price), 2)
+                price = round(rng.uniform(min_price, max_possible_price), 2)
                 item_total = price * quantity
                 remaining_total -= item_total
             
@@ -76,7 +83,10 @@ def generate_order_items(order_data):
                 remaining_total = total_value - sum(it[3]*it[4] for it in items)
                 price = round((remaining_total) / quantity, 2)
             
-            product_name = f"{fake.company()} {fake.word().capitalize()}"
+            if pool is not None:
+                product_name = pool.product_name(rng)
+            else:
+                product_name = f"{fake.company()} {fake.word().capitalize()}"
             
             items.append((
                 order_id,
@@ -86,29 +96,124 @@ def generate_order_items(order_data):
                 round(price, 2)
             ))
 
-        
+        yield from items
 
-        order_items.extend(items)
+def _category_codes(categories):
+    names, inverse = np.unique(np.asarray(categories), return_inverse=True)
+    return np.array([CATEGORY_LIST.index(name) for name in names], dtype=np.int64)[inverse]
 
-    return order_items
-
-def insert_order_items_to_db(order_items):
-    conn = get_connection()
-    cursor = conn.cursor()
+def generate_order_items_batch(order_ids, main_categories, total_values, seed=42, pool=None):
+    """Vectorized generate_order_items over arrays of orders, returned as a dict of NumPy columns.
 
-    insert_query = """
-    INSERT INTO order_items (
-        order_id, product_name, category, quantity, price
-    ) VALUES (%s, %s, %s, %s, %s)
+    Prices stay within PRICE_MAP bounds and each order's items sum to its total_value to the cent.
     """
-    cursor.executemany(insert_query, order_items)
-    conn.commit()
-    print(f"{cursor.rowcount} order items inserted successfully.")
-    cursor.close()
-    conn.close()
+    rng = np.random.default_rng(seed)
+    if pool is None:
+        pool = get_text_pool()
+    order_ids = np.asarray(order_ids)
+    main_idx = _category_codes(main_categories)
+    totals = np.rint(np.asarray(total_values, dtype=np.float64) * 100).astype(np.int64)
+    num_orders = len(order_ids)
+
+    # Expand orders into item slots
+    num_items = rng.choice(ITEM_COUNTS, p=ITEM_COUNT_WEIGHTS, size=num_orders)
+    order_pos = np.repeat(np.arange(num_orders), num_items)
+    slot = np.arange(len(order_pos)) - np.repeat(np.cumsum(num_items) - num_items, num_items)
+    is_last = slot == num_items[order_pos] - 1
+    category = np.where(
+        rng.random(len(order_pos)) < MAIN_CATEGORY_PROB,
+        main_idx[order_pos],
+        rng.integers(0, len(CATEGORY_LIST), size=len(order_pos)),
+    )
+    # Last item keeps quantity 1 so it can absorb the remainder to the cent
+    quantity = np.where(is_last, 1, rng.integers(1, 4, size=len(order_pos)))
+
+    # Orders whose draws cannot add up to the total within category bounds fall back to a single
+    # main-category item, which always fits since total_value was drawn from that category's range.
+    low, high = PRICE_BOUNDS_CENTS[category, 0], PRICE_BOUNDS_CENTS[category, 1]
+    min_total = np.bincount(order_pos, weights=quantity * low, minlength=num_orders)
+    max_total = np.bincount(order_pos, weights=quantity * high, minlength=num_orders)
+    feasible = (min_total <= totals) & (totals <= max_total)
+    keep = feasible[order_pos] | (slot == 0)
+    order_pos, slot, is_last, category, quantity = (
+        order_pos[keep], slot[keep], is_last[keep], category[keep], quantity[keep]
+    )
+    fallback = ~feasible[order_pos]
+    category[fallback] = main_idx[order_pos[fallback]]
+    quantity[fallback] = 1
+    is_last[fallback] = True
+
+    # Every item starts at its minimum price; the slack above that is split in whole cents
+    low, high = PRICE_BOUNDS_CENTS[category, 0], PRICE_BOUNDS_CENTS[category, 1]
+    width = high - low
+    slack = totals - np.bincount(order_pos, weights=quantity * low, minlength=num_orders).astype(np.int64)
+    capacity = np.bincount(order_pos, weights=quantity * width, minlength=num_orders).astype(np.int64)
+    fill = np.divide(slack, capacity, out=np.zeros(num_orders), where=capacity > 0)
+
+    extra = np.where(is_last, 0, np.floor(rng.random(len(order_pos)) * fill[order_pos] * width)).astype(np.int64)
+    last_width = np.zeros(num_orders, dtype=np.int64)
+    last_width[order_pos[is_last]] = width[is_last]
+
+    # Push whatever the last item cannot hold back onto earlier items, one slot at a time
+    overflow = slack - np.bincount(order_pos, weights=quantity * extra, minlength=num_orders).astype(np.int64) - last_width
+    for s in range(max(ITEM_COUNTS) - 1):
+        rows = np.flatnonzero(~is_last & (slot == s))
+        need = np.maximum(overflow[order_pos[rows]], 0)
+        add = np.minimum(width[rows] - extra[rows], -(-need // quantity[rows]))
+        extra[rows] += add
+        overflow[order_pos[rows]] -= quantity[rows] * add
+
+    remainder = slack - np.bincount(order_pos, weights=quantity * extra, minlength=num_orders).astype(np.int64)
+    extra[is_last] = remainder[order_pos[is_last]]
+    price_cents = low + extra
+
+    return {
+        "order_id": order_ids[order_pos],
+        "product_name": pool.sample_product_names(len(order_pos), rng),
+        "category": np.asarray(CATEGORY_LIST)[category],
+        "quantity": quantity,
+        "price": price_cents / 100,
+    }
+
+def validate_order_items_batch(items, order_ids, main_categories, total_values):
+    """Raise ValueError if item totals differ from order totals or a price leaves its category bounds."""
+    order_ids = np.asarray(order_ids)
+    totals = np.rint(np.asarray(total_values, dtype=np.float64) * 100).astype(np.int64)
+    price_cents = np.rint(items["price"] * 100).astype(np.int64)
+    category = _category_codes(items["category"])
+
+    if ((price_cents < PRICE_BOUNDS_CENTS[category, 0]) | (price_cents > PRICE_BOUNDS_CENTS[category, 1])).any():
+        raise ValueError("Item price outside its category bounds.")
+    pos = np.searchsorted(np.sort(order_ids), items["order_id"])
+    item_totals = np.bincount(pos, weights=price_cents * items["quantity"], minlength=len(order_ids))
+    if not np.array_equal(item_totals.astype(np.int64), totals[np.argsort(order_ids)]):
+        raise ValueError("Item totals do not match order totals.")
+
+def order_items_batch_to_rows(items):
+    """Lazily convert a generate_order_items_batch result into row tuples for insert_order_items_to_db."""
+    return zip(
+        items["order_id"].tolist(),
+        items["product_name"].tolist(),
+        items["category"].tolist(),
+        items["quantity"].tolist(),
+        items["price"].tolist(),
+    )
+
+def insert_order_items_to_db(order_items):
+    count = bulk_insert("order_items", ORDER_ITEM_COLUMNS, order_items)
+    print(f"{count} order items inserted successfully.")
 
 if __name__ == "__main__":
     order_data = fetch_order_data()
-    order_items = generate_order_items(order_data)
+    if not order_data:
+        print("No orders in the database; no order items generated.")
+        sys.exit(0)
+    if "--batch" in sys.argv:
+        order_ids, main_categories, total_values = zip(*order_data)
+        items = generate_order_items_batch(order_ids, main_categories, total_values)
+        order_items = order_items_batch_to_rows(items)
+    else:
+        pool = get_text_pool() if "--text-pool" in sys.argv else None
+        order_items = iter_order_items(order_data, pool=pool)
     insert_order_items_to_db(order_items)
     print("Order items generated and inserted successfully.")
@@ -1,7 +1,11 @@
 import random
+import sys
+import numpy as np
 from faker import Faker
-from datetime import timedelta
-from db_connection import get_connection
+from datetime import datetime, timedelta, timezone
+from db_connection import fetch_all
+from bulk_writer import bulk_insert, next_id
+from generate_logistics import derive_logistics_batch, insert_logistics_to_db, logistics_batch_to_rows
 
 fake = Faker()
 random.seed(42)
@@ -25,57 +29,62 @@ STATUS_PROBS_BY_DELIVERY = {
     2: [0.85, 0.10, 0.05],
     3: [0.80, 0.14, 0.06],
 }
+ORDER_STATUSES = ["delivered", "cancelled", "returned"]
+ORDER_COLUMNS = (
+    "user_id", "store_id", "logistics_id",
+    "order_date", "shipped_time", "received_time",
+    "order_status", "product_category", "total_value",
+)
+
+# Window used by fake.date_time_between(start_date="-1y", end_date="-30d")
+ORDER_DATE_WINDOW = (timedelta(days=365), timedelta(days=30))
 
 def fetch_user_ids():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    user_ids = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
-    return user_ids
+    return [row[0] for row in fetch_all("SELECT user_id FROM users")]
 
 def fetch_store_ids():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT store_id FROM stores")
-    store_ids = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
-    return store_ids
+    return [row[0] for row in fetch_all("SELECT store_id FROM stores")]
+
+def generate_orders(user_ids, store_ids, num_orders=NUM_ORDERS, rng=random, fake=fake, now=None):
+    return list(iter_orders(user_ids, store_ids, num_orders, rng, fake, now))
 
-def generate_orders(user_ids, store_ids):
-    orders = []
+def iter_orders(user_ids, store_ids, num_orders=NUM_ORDERS, rng=random, fake=fake, now=None):
+    """Lazily yield order rows so they can be streamed into the database."""
+    # A fixed reference time keeps order dates reproducible across processes
+    if now is None:
+        order_window = ("-1y", "-30d")
+    else:
+        order_window = (now - ORDER_DATE_WINDOW[0], now - ORDER_DATE_WINDOW[1])
 
     # Assign delivery variants randomly to avoid sequence bias
-    delivery_variants = random.choices(DELIVERY_VARIANTS, k=NUM_ORDERS)
+    delivery_variants = rng.choices(DELIVERY_VARIANTS, k=num_orders)
 
-    for i in range(NUM_ORDERS):
-        user_id = random.choice(user_ids)
-        store_id = random.choice(store_ids)
-        order_date = fake.date_time_between(start_date="-1y", end_date="-30d")
+    for i in range(num_orders):
+        user_id = rng.choice(user_ids)
+        store_id = rng.choice(store_ids)
+        order_date = fake.date_time_between(start_date=order_window[0], end_date=order_window[1])
 
         delivery_days = delivery_variants[i]
 
-        shipped_time = order_date + timedelta(hours=random.randint(2, 6))
+        shipped_time = order_date + timedelta(hours=rng.randint(2, 6))
 
         # Choose status probabilities based on delivery time
         status_probs = STATUS_PROBS_BY_DELIVERY[delivery_days]
-        order_status = random.choices(
+        order_status = rng.choices(
             ["delivered", "cancelled", "returned"], weights=status_probs, k=1
         )[0]
 
         # Category and value: pick category and use its value range
-        category, value_range = random.choice(CATEGORIES)
-        total_value = round(random.uniform(*value_range), 2)
+        category, value_range = rng.choice(CATEGORIES)
+        total_value = round(rng.uniform(*value_range), 2)
 
         # Handle received_time logic
         if order_status == "cancelled":
             received_time = None
         else:
-            received_time = shipped_time + timedelta(days=delivery_days, hours=random.randint(0, 6))
+            received_time = shipped_time + timedelta(days=delivery_days, hours=rng.randint(0, 6))
 
-        orders.append((
+        yield (
             user_id,
             store_id,
             None,  # logistics_id to be updated later
@@ -85,32 +94,108 @@ def generate_orders(user_ids, store_ids):
             order_status,
             category,
             total_value
-        ))
-
-    return orders
-
-def insert_orders_to_db(orders):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    insert_query = """
-    INSERT INTO orders (
-        user_id, store_id, logistics_id,
-        order_date, shipped_time, received_time,
-        order_status, product_category, total_value
+        )
+
+def generate_orders_batch(user_ids, store_ids, num_orders=NUM_ORDERS, seed=42, now=None):
+    """Vectorized generate_orders: same distributions, returned as a dict of NumPy columns."""
+    rng = np.random.default_rng(seed)
+    user_ids = np.asarray(user_ids)
+    store_ids = np.asarray(store_ids)
+
+    delivery_days = rng.choice(np.asarray(DELIVERY_VARIANTS), size=num_orders)
+
+    # order_date uniform (to the second) over the same window fake.date_time_between uses
+    now = np.datetime64(now or datetime.now(timezone.utc).replace(tzinfo=None), "s")
+    start = now - np.timedelta64(ORDER_DATE_WINDOW[0], "s")
+    end = now - np.timedelta64(ORDER_DATE_WINDOW[1], "s")
+    span = (end - start).astype(np.int64)
+    order_date = start + rng.integers(0, span + 1, size=num_orders).astype("timedelta64[s]")
+
+    shipped_time = order_date + rng.integers(2, 7, size=num_orders).astype("timedelta64[h]")
+
+    # Status drawn per row from the cumulative probabilities of its delivery variant
+    status_cum = np.cumsum([STATUS_PROBS_BY_DELIVERY[d] for d in DELIVERY_VARIANTS], axis=1)
+    variant_idx = np.searchsorted(np.asarray(DELIVERY_VARIANTS), delivery_days)
+    u = rng.random(num_orders)
+    status_idx = (u[:, None] >= status_cum[variant_idx, :-1]).sum(axis=1)
+    order_status = np.asarray(ORDER_STATUSES)[status_idx]
+
+    category_idx = rng.integers(0, len(CATEGORIES), size=num_orders)
+    bounds = np.asarray([value_range for _, value_range in CATEGORIES], dtype=np.float64)
+    low, high = bounds[category_idx, 0], bounds[category_idx, 1]
+    total_value = np.round(low + (high - low) * rng.random(num_orders), 2)
+    product_category = np.asarray([name for name, _ in CATEGORIES])[category_idx]
+
+    received_time = (
+        shipped_time
+        + delivery_days.astype("timedelta64[D]")
+        + rng.integers(0, 7, size=num_orders).astype("timedelta64[h]")
     )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    received_time[order_status == "cancelled"] = np.datetime64("NaT")
+
+    return {
+        "user_id": rng.choice(user_ids, size=num_orders),
+        "store_id": rng.choice(store_ids, size=num_orders),
+        "order_date": order_date,
+        "shipped_time": shipped_time,
+        "received_time": received_time,
+        "order_status": order_status,
+        "product_category": product_category,
+        "total_value": total_value,
+    }
+
+def orders_batch_to_rows(batch, order_ids=None, logistics_ids=None):
+    """Lazily convert a generate_orders_batch result into row tuples for insert_orders_to_db.
+
+    With order_ids, rows start with the order_id; logistics_ids uses 0 for orders without logistics.
     """
-
-    cursor.executemany(insert_query, orders)
-    conn.commit()
-    print(f"{cursor.rowcount} orders inserted successfully.")
-    cursor.close()
-    conn.close()
+    # datetime64[s] -> datetime.datetime, NaT -> None
+    order_date = batch["order_date"].astype(object)
+    shipped_time = batch["shipped_time"].astype(object)
+    received_time = batch["received_time"].astype(object)
+    if logistics_ids is None:
+        logistics_ids = [None] * len(order_date)  # logistics_id to be updated later
+    else:
+        logistics_ids = [logistics_id or None for logistics_id in np.asarray(logistics_ids).tolist()]
+
+    columns = [
+        batch["user_id"].tolist(),
+        batch["store_id"].tolist(),
+        logistics_ids,
+        order_date,
+        shipped_time,
+        received_time,
+        batch["order_status"].tolist(),
+        batch["product_category"].tolist(),
+        batch["total_value"].tolist(),
+    ]
+    if order_ids is not None:
+        columns.insert(0, np.asarray(order_ids).tolist())
+    return zip(*columns)
+
+def insert_orders_to_db(orders, with_ids=False):
+    columns = ("order_id",) + ORDER_COLUMNS if with_ids else ORDER_COLUMNS
+    count = bulk_insert("orders", columns, orders)
+    print(f"{count} orders inserted successfully.")
 
 if __name__ == "__main__":
     user_ids = fetch_user_ids()
     store_ids = fetch_store_ids()
-    orders = generate_orders(user_ids, store_ids)
-    insert_orders_to_db(orders)
+    if not user_ids or not store_ids:
+        # Every order needs a user and a store to draw from
+        print("No users or stores in the database; no orders generated.")
+        sys.exit(0)
+    if "--batch" in sys.argv:
+        # Logistics are derived in the same pass, so orders are written with their logistics_id
+        batch = generate_orders_batch(user_ids, store_ids)
+        order_ids = next_id("orders", "order_id", len(batch["user_id"])) + np.arange(len(batch["user_id"]))
+        shipped = np.count_nonzero(batch["order_status"] != "cancelled")
+        logistics_ids, logistics = derive_logistics_batch(
+            order_ids, batch["shipped_time"], batch["received_time"], batch["order_status"],
+            next_id("logistics", "logistics_id", shipped),
+        )
+        insert_orders_to_db(orders_batch_to_rows(batch, order_ids, logistics_ids), with_ids=True)
+        insert_logistics_to_db(logistics_batch_to_rows(logistics), with_ids=True)
+    else:
+        insert_orders_to_db(iter_orders(user_ids, store_ids))
     print("Orders generated and inserted into the database successfully.")
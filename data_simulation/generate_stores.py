@@ -1,11 +1,13 @@
 import random 
 from faker import Faker
-from db_connection import get_connection
+from bulk_writer import bulk_insert
 
 fake = Faker()
 random.seed(42)
 
-def generate_stores():
+STORE_COLUMNS = ("store_name", "location", "store_type")
+
+def generate_stores(rng=random, fake=fake):
     store_locations = [ 
     ("Berlin", "urban"),
     ("Paris", "urban"),
@@ -22,23 +24,13 @@ def generate_stores():
     for i in range(7):
         name = f"{fake.company()} Store"
         location, _ = store_locations[i]
-        store_type = random.choice(store_types)
+        store_type = rng.choice(store_types)
         stores.append((name, location, store_type))
     return stores
 
 def insert_stores_to_db(stores):
-    conn = get_connection()
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO stores (store_name, location, store_type)
-    VALUES (%s, %s, %s) 
-    """
-    
-    cursor.executemany(insert_query, stores)
-    conn.commit()
-    print(f"{cursor.rowcount} stores inserted successfully.")
-    cursor.close()
-    conn.close()
+    count = bulk_insert("stores", STORE_COLUMNS, stores)
+    print(f"{count} stores inserted successfully.")
     
 if __name__ == "__main__":
     stores = generate_stores()
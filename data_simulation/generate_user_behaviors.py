@@ -1,7 +1,11 @@
 import random
+import sys
+import numpy as np
 from faker import Faker
 from datetime import datetime, timedelta
-from db_connection import get_connection
+from itertools import chain
+from db_connection import fetch_all
+from bulk_writer import bulk_insert
 
 fake = Faker()
 random.seed(42)
@@ -17,145 +21,220 @@ CATEGORIES = [
     "electronics", "fashion", "home", "toys", "books", "sports", "beauty"
 ]
 
+BEHAVIOR_COLUMNS = (
+    "user_id", "behavior_type", "product_category", "referral_source", "event_time",
+)
+
 # Define a reasonable minimum event date (e.g., start of simulation)
 MIN_EVENT_DATE = datetime(2023, 1, 1)
 
+# Behaviors per order (1-10) and per user without orders (0-5)
+ORDER_BEHAVIOR_COUNTS = range(1, 11)
+ORDER_BEHAVIOR_WEIGHTS = [0.05, 0.10, 0.15, 0.20, 0.15, 0.10, 0.10, 0.08, 0.05, 0.02]
+NON_ORDER_BEHAVIOR_COUNTS = range(0, 6)
+NON_ORDER_BEHAVIOR_WEIGHTS = [0.4, 0.3, 0.15, 0.10, 0.04, 0.01]
+ORDER_CATEGORY_PROB = 0.85
+
 def fetch_orders_with_user():
     """Fetch orders with user info and product category."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    return fetch_all("""
         SELECT o.order_id, o.user_id, o.product_category, o.order_date
         FROM orders o
     """)
-    orders = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return orders
 
 def fetch_all_users():
     """Fetch all user IDs."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    users = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
-    return users
-
-def generate_behaviors_for_orders(order_data):
+    return [row[0] for row in fetch_all("SELECT user_id FROM users")]
+
+def generate_behaviors_for_orders(order_data, rng=random):
     """Generate user behaviors for users who placed orders."""
-    behaviors = []
+    return list(iter_behaviors_for_orders(order_data, rng))
 
+def iter_behaviors_for_orders(order_data, rng=random):
+    """Lazily yield user behaviors for users who placed orders."""
     for order_id, user_id, order_category, order_date in order_data:
         # Vary number of behaviors per order: weighted towards moderate activity
-        num_behaviors = random.choices(
-            population=range(1, 11),
-            weights=[0.05, 0.10, 0.15, 0.20, 0.15, 0.10, 0.10, 0.08, 0.05, 0.02],
+        num_behaviors = rng.choices(
+            population=ORDER_BEHAVIOR_COUNTS,
+            weights=ORDER_BEHAVIOR_WEIGHTS,
             k=1
         )[0]
 
         for _ in range(num_behaviors):
             # 85% chance behavior category matches order category, else random category
-            if random.random() < 0.85:
+            if rng.random() < ORDER_CATEGORY_PROB:
                 behavior_category = order_category
             else:
-                behavior_category = random.choice(CATEGORIES)
+                behavior_category = rng.choice(CATEGORIES)
 
-            referral_source = random.choice(REFERRAL_SOURCES)
+            referral_source = rng.choice(REFERRAL_SOURCES)
             max_days_before = (order_date - MIN_EVENT_DATE).days
-            days_before = random.randint(0, max_days_before if max_days_before > 0 else 0)
+            days_before = rng.randint(0, max_days_before if max_days_before > 0 else 0)
             event_time = order_date - timedelta(
                 days=days_before,
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59)
+                hours=rng.randint(0, 23),
+                minutes=rng.randint(0, 59)
             )
             # Safety check to ensure event_time not before MIN_EVENT_DATE
             if event_time < MIN_EVENT_DATE:
                 event_time = MIN_EVENT_DATE
 
-            behavior_type = random.choice(BEHAVIOR_TYPES)
+            behavior_type = rng.choice(BEHAVIOR_TYPES)
 
-            behaviors.append((
+            yield (
                 user_id,
                 behavior_type,
                 behavior_category,
                 referral_source,
                 event_time
-            ))
-
-    return behaviors
+            )
 
-def generate_behaviors_for_non_order_users(all_users, users_with_orders):
+def generate_behaviors_for_non_order_users(all_users, users_with_orders, rng=random, now=None):
     """Generate user behaviors for users without orders."""
-    behaviors = []
+    return list(iter_behaviors_for_non_order_users(all_users, users_with_orders, rng, now))
+
+def iter_behaviors_for_non_order_users(all_users, users_with_orders, rng=random, now=None):
+    """Lazily yield user behaviors for users without orders."""
     non_order_users = set(all_users) - set(users_with_orders)
 
-    now = datetime.now()
+    now = now or datetime.now()
 
     for user_id in non_order_users:
         # Generate 0 to 5 behaviors, weighted towards fewer interactions
-        num_behaviors = random.choices(
-            population=range(0, 6),
-            weights=[0.4, 0.3, 0.15, 0.10, 0.04, 0.01],
+        num_behaviors = rng.choices(
+            population=NON_ORDER_BEHAVIOR_COUNTS,
+            weights=NON_ORDER_BEHAVIOR_WEIGHTS,
             k=1
         )[0]
 
         for _ in range(num_behaviors):
-            behavior_category = random.choice(CATEGORIES)
-            referral_source = random.choice(REFERRAL_SOURCES)
+            behavior_category = rng.choice(CATEGORIES)
+            referral_source = rng.choice(REFERRAL_SOURCES)
             # Event time between MIN_EVENT_DATE and now
             total_days = (now - MIN_EVENT_DATE).days
-            days_before = random.randint(0, total_days if total_days > 0 else 0)
+            days_before = rng.randint(0, total_days if total_days > 0 else 0)
             event_time = now - timedelta(
                 days=days_before,
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59)
+                hours=rng.randint(0, 23),
+                minutes=rng.randint(0, 59)
             )
             if event_time < MIN_EVENT_DATE:
                 event_time = MIN_EVENT_DATE
 
-            behavior_type = random.choice(BEHAVIOR_TYPES)
+            behavior_type = rng.choice(BEHAVIOR_TYPES)
 
-            behaviors.append((
+            yield (
                 user_id,
                 behavior_type,
                 behavior_category,
                 referral_source,
                 event_time
-            ))
+            )
 
+def _expand(rng, counts_population, weights, size):
+    """Draw an event count per source row; return (owner row of each event, CSR offsets)."""
+    counts = rng.choice(np.asarray(counts_population), p=weights, size=size)
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return np.repeat(np.arange(size), counts), offsets
+
+def _event_times(rng, anchors, max_days):
+    # anchor - (days, hours, minutes), never earlier than MIN_EVENT_DATE
+    n = len(anchors)
+    offset = (
+        rng.integers(0, max_days + 1, size=n).astype("timedelta64[D]")
+        + rng.integers(0, 24, size=n).astype("timedelta64[h]")
+        + rng.integers(0, 60, size=n).astype("timedelta64[m]")
+    )
+    return np.maximum(anchors - offset, np.datetime64(MIN_EVENT_DATE, "s"))
+
+def generate_behaviors_batch(order_user_ids, order_categories, order_dates, all_users, seed=42, now=None):
+    """Vectorized behaviors for ordering and non-ordering users as NumPy columns.
+
+    Events are stored flat; offsets[i]:offsets[i + 1] are the events of source row i, where the
+    first len(order_user_ids) source rows are orders and the rest are users without orders.
+    """
+    rng = np.random.default_rng(seed)
+    order_user_ids = np.asarray(order_user_ids, dtype=np.int64)
+    order_dates = np.asarray(order_dates, dtype="datetime64[s]")
+    order_categories = np.asarray(order_categories)
+    now = np.datetime64(now or datetime.now(), "s")
+    min_date = np.datetime64(MIN_EVENT_DATE, "s")
+    categories = np.asarray(CATEGORIES)
+
+    # Behaviors leading up to each order
+    owner, order_offsets = _expand(rng, ORDER_BEHAVIOR_COUNTS, ORDER_BEHAVIOR_WEIGHTS, len(order_user_ids))
+    n = len(owner)
+    max_days = np.maximum((order_dates - min_date).astype("timedelta64[D]").astype(np.int64), 0)
+    order_events = {
+        "user_id": order_user_ids[owner],
+        "behavior_type": rng.integers(0, len(BEHAVIOR_TYPES), size=n),
+        "product_category": np.where(
+            rng.random(n) < ORDER_CATEGORY_PROB,
+            order_categories[owner],
+            categories[rng.integers(0, len(categories), size=n)],
+        ),
+        "referral_source": rng.integers(0, len(REFERRAL_SOURCES), size=n),
+        "event_time": _event_times(rng, order_dates[owner], max_days[owner]),
+    }
+
+    # Browsing by users who never ordered, anywhere between MIN_EVENT_DATE and now
+    non_order_users = np.setdiff1d(np.asarray(all_users), order_user_ids)
+    owner, user_offsets = _expand(rng, NON_ORDER_BEHAVIOR_COUNTS, NON_ORDER_BEHAVIOR_WEIGHTS, len(non_order_users))
+    n = len(owner)
+    total_days = max(int((now - min_date).astype("timedelta64[D]").astype(np.int64)), 0)
+    user_events = {
+        "user_id": non_order_users[owner],
+        "behavior_type": rng.integers(0, len(BEHAVIOR_TYPES), size=n),
+        "product_category": categories[rng.integers(0, len(categories), size=n)],
+        "referral_source": rng.integers(0, len(REFERRAL_SOURCES), size=n),
+        "event_time": _event_times(rng, np.full(n, now), total_days),
+    }
+
+    behaviors = {key: np.concatenate([order_events[key], user_events[key]]) for key in order_events}
+    behaviors["behavior_type"] = np.asarray(BEHAVIOR_TYPES)[behaviors["behavior_type"]]
+    behaviors["referral_source"] = np.asarray(REFERRAL_SOURCES)[behaviors["referral_source"]]
+    behaviors["offsets"] = np.concatenate([order_offsets, order_offsets[-1] + user_offsets[1:]])
     return behaviors
 
-def insert_behaviors_to_db(behaviors):
-    conn = get_connection()
-    cursor = conn.cursor()
+def behaviors_batch_to_rows(behaviors):
+    """Lazily convert a generate_behaviors_batch result into row tuples for insert_behaviors_to_db."""
+    return zip(
+        behaviors["user_id"].tolist(),
+        behaviors["behavior_type"].tolist(),
+        behaviors["product_category"].tolist(),
+        behaviors["referral_source"].tolist(),
+        behaviors["event_time"].astype(object),
+    )
 
-    insert_query = """
-    INSERT INTO user_behaviors (
-        user_id, behavior_type, product_category, referral_source, event_time
-    ) VALUES (%s, %s, %s, %s, %s)
-    """
-    cursor.executemany(insert_query, behaviors)
-    conn.commit()
-    print(f"{cursor.rowcount} user behaviors inserted successfully.")
-    cursor.close()
-    conn.close()
+def insert_behaviors_to_db(behaviors):
+    count = bulk_insert("user_behaviors", BEHAVIOR_COLUMNS, behaviors)
+    print(f"{count} user behaviors inserted successfully.")
 
 if __name__ == "__main__":
     # Fetch data
     order_data = fetch_orders_with_user()
     all_users = fetch_all_users()
     users_with_orders = {row[1] for row in order_data}
-
-    # Generate behaviors for users with orders
-    behaviors_order_users = generate_behaviors_for_orders(order_data)
-
-    # Generate behaviors for users without orders
-    behaviors_non_order_users = generate_behaviors_for_non_order_users(all_users, users_with_orders)
-
-    # Combine all behaviors
-    all_behaviors = behaviors_order_users + behaviors_non_order_users
+    if not all_users:
+        print("No users in the database; no user behaviors generated.")
+        sys.exit(0)
+
+    if "--batch" in sys.argv:
+        # Users without any order still browse, so an empty orders table gives empty columns
+        _, order_user_ids, order_categories, order_dates = tuple(zip(*order_data)) or ((),) * 4
+        all_behaviors = behaviors_batch_to_rows(
+            generate_behaviors_batch(order_user_ids, order_categories, order_dates, all_users)
+        )
+    else:
+        # Generate behaviors for users with orders
+        behaviors_order_users = iter_behaviors_for_orders(order_data)
+
+        # Generate behaviors for users without orders
+        behaviors_non_order_users = iter_behaviors_for_non_order_users(all_users, users_with_orders)
+
+        # Combine all behaviors, streamed in chunks rather than held in one list
+        all_behaviors = chain(behaviors_order_users, behaviors_non_order_users)
 
     # Insert into DB
     insert_behaviors_to_db(all_behaviors)
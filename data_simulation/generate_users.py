@@ -3,7 +3,7 @@
 import random
 from faker import Faker
 from datetime import datetime, timedelta
-from db_connection import get_connection
+from bulk_writer import bulk_insert
 
 fake = Faker()
 random.seed(42)
@@ -14,12 +14,18 @@ REGIONS_URBAN = ["Berlin", "Paris", "London", "Madrid", "Rome"]
 REGIONS_RURAL = ["Lille", "Bordeaux"]
 DEVICE_TYPES = ["mobile", "desktop", "tablet"]
 CHANNELS = ["email", "social", "ads", "organic"]
+USER_COLUMNS = ("sign_up_date", "region", "device_type", "channel", "tenure_days", "is_premium")
 
-def generate_users():
+def generate_users(rng=random, fake=fake, start=0, num_users=NUM_USERS, now=None):
     users = []
     region_pool = REGIONS_URBAN + REGIONS_RURAL
+    # A fixed reference time keeps sign-up dates reproducible across processes
+    if now is None:
+        sign_up_window = ("-2y", "-1y")
+    else:
+        sign_up_window = (now - timedelta(days=730), now - timedelta(days=365))
 
-    for i in range(NUM_USERS):
+    for i in range(start, start + num_users):
         is_premium = i < NUM_PREMIUM
         
         if is_premium:
@@ -29,29 +35,18 @@ def generate_users():
             # 70% urban, 30% rural for regular
             weights = [0.14]*len(REGIONS_URBAN) + [0.15]*len(REGIONS_RURAL)
 
-        region = random.choices(population=region_pool, weights=weights, k=1)[0]
-        sign_up_date = fake.date_time_between(start_date="-2y", end_date="-1y")
-        device_type = random.choice(DEVICE_TYPES)
-        channel = random.choice(CHANNELS)
-        tenure_days = random.randint(30, 730)
+        region = rng.choices(population=region_pool, weights=weights, k=1)[0]
+        sign_up_date = fake.date_time_between(start_date=sign_up_window[0], end_date=sign_up_window[1])
+        device_type = rng.choice(DEVICE_TYPES)
+        channel = rng.choice(CHANNELS)
+        tenure_days = rng.randint(30, 730)
         users.append((sign_up_date, region, device_type, channel, tenure_days, is_premium))
 
     return users
 
 def insert_users_to_db(users):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    insert_query = """
-    INSERT INTO users (sign_up_date, region, device_type, channel, tenure_days, is_premium)
-    VALUES (%s, %s, %s, %s, %s, %s)
-    """
-
-    cursor.executemany(insert_query, users)
-    conn.commit()
-    print(f"{cursor.rowcount} users inserted successfully.")
-    cursor.close()
-    conn.close()
+    count = bulk_insert("users", USER_COLUMNS, users)
+    print(f"{count} users inserted successfully.")
 
 if __name__ == "__main__":
     users = generate_users()
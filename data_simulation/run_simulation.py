@@ -1,7 +1,26 @@
+import argparse
+import random
 import subprocess
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from faker import Faker
 
-PYTHON_PATH = sys.executable    
+import generate_logistics
+import generate_order_items
+import generate_orders
+import generate_reviews
+import generate_stores
+import generate_user_behaviors
+import generate_users
+from bulk_writer import bulk_insert, next_id
+from text_pool import get_text_pool
+
+PYTHON_PATH = sys.executable
+BASE_SEED = 42
+MAX_COMPUTE_WORKERS = 3
+MAX_WRITE_WORKERS = 3
 
 simulation_steps = [
     "generate_stores.py",
@@ -16,15 +35,155 @@ simulation_steps = [
 def run_script(path):
     print(f"▶ Running: {path}")
     result = subprocess.run([PYTHON_PATH, path], capture_output=True, text=True)
-    
+
     if result.returncode == 0:
         print(f"✅ Completed: {path}\n")
     else:
         print(f"❌ Error in {path}:\n{result.stderr}")
         exit(1)
 
+# In-process mode: each step receives its parents' generated data in memory, plus a
+# random.Random and a Faker seeded for it, and returns (output, write). Writes run on a background pool, after the writes of
+# the step's dependencies (foreign keys), while downstream steps keep generating.
+
+def _with_ids(table, id_column, rows):
+    rows = list(rows)
+    start = next_id(table, id_column, len(rows))
+    return [(start + i,) + tuple(row) for i, row in enumerate(rows)]
+
+def step_stores(inputs, rng, fake):
+    stores = _with_ids("stores", "store_id", generate_stores.generate_stores(rng, fake))
+    write = lambda: bulk_insert("stores", ("store_id",) + generate_stores.STORE_COLUMNS, stores)
+    return [row[0] for row in stores], write
+
+def step_users(inputs, rng, fake):
+    users = _with_ids("users", "user_id", generate_users.generate_users(rng, fake))
+    write = lambda: bulk_insert("users", ("user_id",) + generate_users.USER_COLUMNS, users)
+    return [row[0] for row in users], write
+
+def step_orders(inputs, rng, fake):
+    orders = _with_ids("orders", "order_id", generate_orders.generate_orders(
+        inputs["users"], inputs["stores"], rng=rng, fake=fake
+    ))
+    # Logistics ids are allocated here so orders are written with them and never updated
+    orders = generate_logistics.assign_logistics_ids(orders)
+    write = lambda: bulk_insert("orders", ("order_id",) + generate_orders.ORDER_COLUMNS, orders)
+    return orders, write
+
+def step_logistics(inputs, rng, fake):
+    # Same rows fetch_orders_needing_logistics would read back: (order_id, shipped_time, received_time)
+    shipped = [o for o in inputs["orders"] if o[7] != "cancelled"]
+    records = generate_logistics.generate_logistics_records([(o[0], o[5], o[6]) for o in shipped], rng)
+    records = [(o[3],) + record for o, record in zip(shipped, records)]
+    delay_hours = {record[1]: record[6] for record in records}
+    return delay_hours, lambda: generate_logistics.insert_logistics_to_db(records, with_ids=True)
+
+def step_order_items(inputs, rng, fake):
+    # (order_id, product_category, total_value) as in fetch_order_data, split by the batch engine
+    orders = inputs["orders"]
+    items = generate_order_items.generate_order_items_batch(
+        [o[0] for o in orders], [o[8] for o in orders], [o[9] for o in orders],
+        seed=rng.getrandbits(64), pool=get_text_pool(),
+    )
+    rows = generate_order_items.order_items_batch_to_rows(items)
+    return None, lambda: generate_order_items.insert_order_items_to_db(rows)
+
+def step_user_behaviors(inputs, rng, fake):
+    # (user_id, product_category, order_date) per order, as in fetch_orders_with_user
+    orders = inputs["orders"]
+    behaviors = generate_user_behaviors.generate_behaviors_batch(
+        [o[1] for o in orders], [o[8] for o in orders], [o[4] for o in orders],
+        inputs["users"], seed=rng.getrandbits(64),
+    )
+    rows = generate_user_behaviors.behaviors_batch_to_rows(behaviors)
+    return None, lambda: generate_user_behaviors.insert_behaviors_to_db(rows)
+
+def step_reviews(inputs, rng, fake):
+    # (order_id, user_id, received_time, delay_hours) as in fetch_delivered_orders
+    delay_hours = inputs["logistics"]
+    order_rows = [
+        (o[0], o[1], o[6], delay_hours[o[0]])
+        for o in inputs["orders"] if o[7] == "delivered"
+    ]
+    reviews = generate_reviews.generate_reviews(order_rows, rng, get_text_pool())
+    return None, lambda: generate_reviews.insert_reviews_to_db(reviews)
+
+# step name -> (function, dependencies)
+SIMULATION_DAG = {
+    "stores": (step_stores, []),
+    "users": (step_users, []),
+    "orders": (step_orders, ["users", "stores"]),
+    "logistics": (step_logistics, ["orders"]),
+    "order_items": (step_order_items, ["orders"]),
+    "user_behaviors": (step_user_behaviors, ["users", "orders"]),
+    "reviews": (step_reviews, ["orders", "logistics"]),
+}
+
+def step_generators(seed, name):
+    """(random.Random, Faker) seeded from (seed, step name), so concurrent steps stay reproducible."""
+    fake = Faker()
+    fake.seed_instance(f"{seed}:{name}")
+    return random.Random(f"{seed}:{name}"), fake
+
+def _write_after(dependencies, write):
+    for dependency in dependencies:
+        dependency.result()
+    write()
+
+def run_dag(dag=SIMULATION_DAG, seed=BASE_SEED):
+    """Run the steps in-process, starting each one as soon as its dependencies have generated."""
+    outputs = {}
+    writes = {}
+    running = {}
+    pending = dict(dag)
+
+    with ThreadPoolExecutor(MAX_COMPUTE_WORKERS) as compute, ThreadPoolExecutor(MAX_WRITE_WORKERS) as writer:
+        while pending or running:
+            for name, (step, deps) in list(pending.items()):
+                if all(dep in outputs for dep in deps):
+                    print(f"▶ Generating: {name}")
+                    inputs = {dep: outputs[dep] for dep in deps}
+                    running[compute.submit(step, inputs, *step_generators(seed, name))] = name
+                    del pending[name]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                outputs[name], write = future.result()
+                # Writes are submitted in topological order, so dependency writes are always ahead in the queue
+                dependencies = [writes[dep] for dep in dag[name][1]]
+                writes[name] = writer.submit(_write_after, dependencies, write)
+
+        for name, future in writes.items():
+            future.result()
+            print(f"✅ Completed: {name}")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the full data simulation.")
+    parser.add_argument("--subprocess", action="store_true", help="run each generator script in its own interpreter")
+    parser.add_argument("--workers", type=int, default=0, help="generate users, orders and behaviors in N processes")
+    parser.add_argument("--seed", type=int, default=BASE_SEED)
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None,
+                        help="reference time for generated dates under --workers (default: SIMULATION_NOW)")
+    args = parser.parse_args()
+
     print("🚀 Starting full data simulation...")
-    for step in simulation_steps:
-        run_script(step)
-    print("✅ All simulation steps completed successfully.")
+    start = time.perf_counter()
+    if args.subprocess:
+        for step in simulation_steps:
+            run_script(step)
+    else:
+        try:
+            if args.workers:
+                from sharded_simulation import SIMULATION_NOW, sharded_dag
+                now = args.now or SIMULATION_NOW
+                print(f"Dating rows from {now.isoformat()}.")
+                with ProcessPoolExecutor(args.workers) as executor:
+                    dag = sharded_dag(SIMULATION_DAG, executor, args.seed, now, args.workers)
+                    run_dag(dag, seed=args.seed)
+            else:
+                run_dag(seed=args.seed)
+        except Exception as err:
+            print(f"❌ Simulation failed: {err}")
+            exit(1)
+    print(f"✅ All simulation steps completed successfully in {time.perf_counter() - start:.1f}s.")
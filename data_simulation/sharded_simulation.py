@@ -0,0 +1,133 @@
+import hashlib
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from faker import Faker
+
+import generate_logistics
+import generate_orders
+import generate_user_behaviors
+import generate_users
+from bulk_writer import bulk_insert, next_id
+
+# Reference time for every generated date, so a seed reproduces the same rows on any day
+SIMULATION_NOW = datetime.fromisoformat(os.getenv("SIMULATION_NOW", "2025-01-01T00:00:00"))
+
+# Rows (or source rows) per shard. The shard layout depends only on these sizes,
+# never on the worker count, so the concatenated output is identical for any N.
+SHARD_SIZES = {
+    "users": 1000,
+    "orders": 1000,
+    "user_behaviors": 500,
+    "non_order_behaviors": 1000,
+}
+
+def shard_seed(base_seed, table, shard):
+    """Seed derived from (base seed, table, shard index), stable across processes and Python runs."""
+    digest = hashlib.sha256(f"{base_seed}:{table}:{shard}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+def _shard_generators(base_seed, table, shard):
+    seed = shard_seed(base_seed, table, shard)
+    fake = Faker()
+    fake.seed_instance(seed)
+    return random.Random(seed), fake
+
+def _shards(total, size):
+    return [(shard, start, min(size, total - start)) for shard, start in enumerate(range(0, total, size))]
+
+def _users_shard(base_seed, shard, start, count, now):
+    rng, fake = _shard_generators(base_seed, "users", shard)
+    return generate_users.generate_users(rng, fake, start=start, num_users=count, now=now)
+
+# Set in each orders worker by _share_ids
+_user_ids = _store_ids = None
+
+def _share_ids(user_ids, store_ids):
+    # Pool initializer: every worker receives the id lists once instead of with each shard
+    global _user_ids, _store_ids
+    _user_ids, _store_ids = user_ids, store_ids
+
+def _orders_shard(base_seed, shard, count, now):
+    rng, fake = _shard_generators(base_seed, "orders", shard)
+    return generate_orders.generate_orders(_user_ids, _store_ids, count, rng, fake, now)
+
+def _behaviors_shard(base_seed, shard, order_data):
+    rng, _ = _shard_generators(base_seed, "user_behaviors", shard)
+    return generate_user_behaviors.generate_behaviors_for_orders(order_data, rng)
+
+def _non_order_behaviors_shard(base_seed, shard, user_ids, now):
+    rng, _ = _shard_generators(base_seed, "non_order_behaviors", shard)
+    return generate_user_behaviors.generate_behaviors_for_non_order_users(user_ids, (), rng, now)
+
+def _gather(futures):
+    # Concatenate strictly in shard order, whatever order the workers finish in
+    rows = []
+    for future in futures:
+        rows.extend(future.result())
+    return rows
+
+def generate_users_sharded(executor, base_seed, num_users, now):
+    return _gather([
+        executor.submit(_users_shard, base_seed, shard, start, count, now)
+        for shard, start, count in _shards(num_users, SHARD_SIZES["users"])
+    ])
+
+def generate_orders_sharded(workers, base_seed, num_orders, user_ids, store_ids, now):
+    # A pool of its own, whose initializer hands the ids to each worker up front
+    with ProcessPoolExecutor(workers, initializer=_share_ids, initargs=(user_ids, store_ids)) as executor:
+        return _gather([
+            executor.submit(_orders_shard, base_seed, shard, count, now)
+            for shard, _, count in _shards(num_orders, SHARD_SIZES["orders"])
+        ])
+
+def generate_behaviors_sharded(executor, base_seed, order_data, all_users, now):
+    users_with_orders = {row[1] for row in order_data}
+    non_order_users = sorted(set(all_users) - users_with_orders)
+
+    size = SHARD_SIZES["user_behaviors"]
+    order_futures = [
+        executor.submit(_behaviors_shard, base_seed, shard, order_data[start:start + count])
+        for shard, start, count in _shards(len(order_data), size)
+    ]
+    size = SHARD_SIZES["non_order_behaviors"]
+    non_order_futures = [
+        executor.submit(_non_order_behaviors_shard, base_seed, shard, non_order_users[start:start + count], now)
+        for shard, start, count in _shards(len(non_order_users), size)
+    ]
+    return _gather(order_futures) + _gather(non_order_futures)
+
+def sharded_dag(base_dag, executor, base_seed, now, workers):
+    """Swap the users, orders and user_behaviors steps of a run_simulation DAG for sharded versions.
+
+    Every shard dates its rows from now (e.g. SIMULATION_NOW), never the clock, so a seed always
+    gives the same rows. Orders run on a separate pool of workers processes.
+    """
+    def step_users(inputs, rng, fake):
+        users = generate_users_sharded(executor, base_seed, generate_users.NUM_USERS, now)
+        first_id = next_id("users", "user_id", len(users))
+        users = [(first_id + i,) + row for i, row in enumerate(users)]
+        write = lambda: bulk_insert("users", ("user_id",) + generate_users.USER_COLUMNS, users)
+        return [row[0] for row in users], write
+
+    def step_orders(inputs, rng, fake):
+        orders = generate_orders_sharded(
+            workers, base_seed, generate_orders.NUM_ORDERS, inputs["users"], inputs["stores"], now
+        )
+        first_id = next_id("orders", "order_id", len(orders))
+        orders = [(first_id + i,) + row for i, row in enumerate(orders)]
+        orders = generate_logistics.assign_logistics_ids(orders)
+        write = lambda: bulk_insert("orders", ("order_id",) + generate_orders.ORDER_COLUMNS, orders)
+        return orders, write
+
+    def step_user_behaviors(inputs, rng, fake):
+        order_data = [(o[0], o[1], o[8], o[4]) for o in inputs["orders"]]
+        behaviors = generate_behaviors_sharded(executor, base_seed, order_data, inputs["users"], now)
+        return None, lambda: generate_user_behaviors.insert_behaviors_to_db(behaviors)
+
+    dag = dict(base_dag)
+    dag["users"] = (step_users, base_dag["users"][1])
+    dag["orders"] = (step_orders, base_dag["orders"][1])
+    dag["user_behaviors"] = (step_user_behaviors, base_dag["user_behaviors"][1])
+    return dag
@@ -0,0 +1,81 @@
+import os
+import threading
+import numpy as np
+from faker import Faker
+
+# Number of entries pre-generated per vocabulary
+POOL_SIZES = {
+    "companies": 2000,
+    "words": 5000,
+    "sentences": 20000,
+}
+POOL_DIR = os.getenv("TEXT_POOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "text_pool"))
+REVIEW_WORDS = (5, 15)  # nb_words range used by generate_reviews
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+class TextPool:
+    """Pre-generated Faker vocabularies sampled by index instead of calling Faker per row."""
+
+    def __init__(self, companies, words, sentences):
+        self.companies = companies
+        self.words = words  # already capitalized, as used in product names
+        self.sentences = sentences
+
+    @classmethod
+    def generate(cls, sizes=POOL_SIZES, seed=42):
+        fake = Faker()
+        fake.seed_instance(seed)
+        low, high = REVIEW_WORDS
+        companies = [fake.company() for _ in range(sizes["companies"])]
+        words = [fake.word().capitalize() for _ in range(sizes["words"])]
+        sentences = [
+            fake.sentence(nb_words=low + i % (high - low + 1))
+            for i in range(sizes["sentences"])
+        ]
+        return cls(np.array(companies), np.array(words), np.array(sentences))
+
+    def save(self, path=POOL_DIR):
+        os.makedirs(path, exist_ok=True)
+        for name in ("companies", "words", "sentences"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, path=POOL_DIR, mmap=True):
+        # Fixed-width unicode arrays, so they can be memory-mapped rather than read
+        mmap_mode = "r" if mmap else None
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ("companies", "words", "sentences")]
+        return cls(*arrays)
+
+    # Scalar draws for the row-by-row generators (random.Random-compatible rng)
+    def product_name(self, rng):
+        company = self.companies[rng.randrange(len(self.companies))]
+        word = self.words[rng.randrange(len(self.words))]
+        return f"{company} {word}"
+
+    def review_text(self, rng):
+        return str(self.sentences[rng.randrange(len(self.sentences))])
+
+    # Vectorized draws for the batch generators (numpy Generator)
+    def sample_product_names(self, n, rng):
+        companies = self.companies[rng.integers(0, len(self.companies), size=n)]
+        words = self.words[rng.integers(0, len(self.words), size=n)]
+        return np.char.add(np.char.add(companies, " "), words)
+
+    def sample_review_texts(self, n, rng):
+        return self.sentences[rng.integers(0, len(self.sentences), size=n)]
+
+def get_text_pool(path=POOL_DIR, sizes=POOL_SIZES, seed=42):
+    """Load the persisted pool (once per process), generating and saving it on first use."""
+    with _pools_lock:
+        if path not in _pools:
+            if all(os.path.exists(os.path.join(path, f"{name}.npy")) for name in sizes):
+                _pools[path] = TextPool.load(path)
+            else:
+                pool = TextPool.generate(sizes, seed)
+                pool.save(path)
+                print(f"Text pool generated and saved to {path}.")
+                _pools[path] = pool
+        return _pools[path]
@@ -0,0 +1,109 @@
+import os
+import zlib
+
+import numpy as np
+
+ALPHA = 0.05
+# Largest sample Shapiro-Wilk is accurate for (scipy warns beyond it)
+SHAPIRO_MAX_N = 5000
+# Rows per variant any strategy (and Levene) looks at
+MAX_SAMPLE = int(os.getenv('AB_ASSUMPTION_MAX_SAMPLE', str(SHAPIRO_MAX_N)))
+# effect_size strategy: |skewness|, |excess kurtosis| and largest/smallest variance ratio
+# under which ANOVA is robust in practice, whatever a test on millions of rows says
+MAX_ABS_SKEW = 1.0
+MAX_ABS_EXCESS_KURTOSIS = 2.0
+MAX_VARIANCE_RATIO = 4.0
+STRATEGIES = ('auto', 'shapiro', 'subsample', 'dagostino', 'anderson', 'effect_size')
+DEFAULT_STRATEGY = os.getenv('AB_ASSUMPTION_STRATEGY', 'auto')
+
+def stratified_subsample(values, strata=None, max_size=MAX_SAMPLE, seed=0):
+    """Deterministic sample of at most max_size values, allocated across strata by their share."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) <= max_size:
+        return values
+    rng = np.random.default_rng(seed)
+    if strata is None:
+        return values[np.sort(rng.choice(len(values), max_size, replace=False))]
+
+    strata = np.asarray(strata)
+    labels, codes, counts = np.unique(strata, return_inverse=True, return_counts=True)
+    quotas = np.floor(max_size * counts / len(values)).astype(int)
+    # Hand the rounding remainder to the strata with the largest fractional share
+    remainder = max_size - quotas.sum()
+    quotas[np.argsort(-(max_size * counts / len(values) - quotas), kind='stable')[:remainder]] += 1
+    picked = [
+        np.flatnonzero(codes == i)[np.sort(rng.choice(count, quota, replace=False))]
+        for i, (count, quota) in enumerate(zip(counts, quotas))
+        if quota > 0
+    ]
+    return values[np.sort(np.concatenate(picked))]
+
+def _normality(values, strategy, alpha):
+    from scipy import stats
+
+    if len(values) < 3:
+        return {'Statistic': None, 'p-value': None, 'Normality': None}
+    if strategy in ('shapiro', 'subsample'):
+        statistic, p_value = stats.shapiro(values)
+        return {'Statistic': statistic, 'p-value': p_value, 'Normality': p_value > alpha}
+    if strategy == 'dagostino':
+        if len(values) < 20:
+            return {'Statistic': None, 'p-value': None, 'Normality': None}
+        statistic, p_value = stats.normaltest(values)
+        return {'Statistic': statistic, 'p-value': p_value, 'Normality': p_value > alpha}
+    if strategy == 'anderson':
+        result = stats.anderson(values, dist='norm')
+        # Critical value at the 5% level (scipy tabulates 15, 10, 5, 2.5, 1)
+        critical = result.critical_values[list(result.significance_level).index(5.0)]
+        return {'Statistic': result.statistic, 'p-value': None, 'Normality': result.statistic < critical}
+    # effect_size
+    skewness = stats.skew(values)
+    excess_kurtosis = stats.kurtosis(values)
+    return {
+        'Statistic': (skewness, excess_kurtosis),
+        'p-value': None,
+        'Normality': abs(skewness) <= MAX_ABS_SKEW and abs(excess_kurtosis) <= MAX_ABS_EXCESS_KURTOSIS,
+    }
+
+def check_assumptions(groups, strata=None, strategy=DEFAULT_STRATEGY, alpha=ALPHA, max_sample=MAX_SAMPLE, seed=0):
+    """Homogeneity of variance and per-group normality under a strategy that stays bounded for large N.
+
+    groups maps variant -> values, strata (optional) variant -> stratum labels for subsampling.
+    Every strategy, and Levene, sees at most max_sample stratified rows per variant, so the cost
+    does not grow with N. 'auto' picks Shapiro-Wilk when no group is over SHAPIRO_MAX_N rows (the
+    full groups) and 'subsample' beyond. Returns a dict with the strategy actually used.
+    """
+    from scipy import stats
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown assumption strategy {strategy!r}; expected one of {STRATEGIES}.")
+    groups = {variant: np.asarray(values, dtype=np.float64) for variant, values in groups.items()}
+    if strategy == 'auto':
+        strategy = 'shapiro' if max(len(v) for v in groups.values()) <= SHAPIRO_MAX_N else 'subsample'
+
+    strata = strata or {}
+    # Seeded per variant, so a variant's sample does not depend on which other variants exist
+    groups = {
+        variant: stratified_subsample(values, strata.get(variant), max_sample, [seed, zlib.crc32(str(variant).encode())])
+        for variant, values in groups.items()
+    }
+
+    samples = list(groups.values())
+    if strategy == 'effect_size':
+        variances = [np.var(values, ddof=1) for values in samples if len(values) > 1]
+        homogeneity_stat = max(variances) / min(variances) if min(variances) > 0 else np.inf
+        homogeneity_p = None
+        homogeneity = homogeneity_stat <= MAX_VARIANCE_RATIO
+    else:
+        homogeneity_stat, homogeneity_p = stats.levene(*samples)
+        homogeneity = homogeneity_p > alpha
+
+    normality = {variant: _normality(values, strategy, alpha) for variant, values in groups.items()}
+    return {
+        'strategy': strategy,
+        'homogeneity': homogeneity,
+        'homogeneity_statistic': homogeneity_stat,
+        'homogeneity_p': homogeneity_p,
+        'normality': normality,
+        'assumptions_met': bool(homogeneity and all(nr['Normality'] for nr in normality.values())),
+    }
@@ -0,0 +1,273 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from cache import load_frame, save_frame
+from contingency import analyze_table, count_table
+from db_connection import fetch_all
+from metrics import repurchase_flags
+from monitor import REPURCHASE_WINDOW, SequentialMonitor
+from outofcore import run_out_of_core
+from ranks import dunn, kruskal, rank_counts
+from transform import clean_data, run_multivariate_ab_test
+from queries import ANALYSIS_QUERY
+
+# The original repurchase_in_30_days: a correlated EXISTS over orders for every order
+LEGACY_ANALYSIS_QUERY = """
+WITH order_metrics AS(
+SELECT
+    o.order_id,
+    CASE
+        WHEN MOD(o.order_id, 3) = 0 THEN '24h'
+        WHEN MOD(o.order_id, 3) = 1 THEN '48h'
+        WHEN MOD(o.order_id, 3) = 2 THEN '72h'
+        END AS shipping_variant,
+    o.total_value AS order_value,
+    o.order_status,
+    r.satisfaction,
+    r.delivery_rating,
+    l.expected_delivery,
+    l.actual_delivery,
+    u.user_id,
+    QUARTER(o.order_date) AS quarter,
+    CASE WHEN EXISTS(
+        SELECT 1
+        FROM orders o2
+        WHERE o2.user_id = o.user_id
+        AND o2.order_date > o.order_date
+        AND o2.order_date <= o.order_date + INTERVAL 30 DAY
+    ) THEN 1 ELSE 0 END AS repurchase_in_30_days
+FROM orders o
+LEFT JOIN reviews r ON o.order_id = r.order_id
+LEFT JOIN logistics l ON o.order_id = l.order_id
+LEFT JOIN users u ON o.user_id = u.user_id)
+
+SELECT
+    shipping_variant,
+    order_value,
+    satisfaction,
+    delivery_rating,
+    CASE WHEN order_status = 'cancelled' THEN 1 ELSE 0 END AS cancellation,
+    CASE WHEN actual_delivery <= expected_delivery THEN 1 ELSE 0 END AS on_time_delivery,
+    repurchase_in_30_days,
+    quarter
+FROM order_metrics
+"""
+
+REPURCHASE_SCALES = [100_000, 1_000_000, 10_000_000]
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _limit_orders(query, num_orders):
+    # Run the query over the first num_orders orders only (both the outer and any inner reference)
+    subset = f"(SELECT * FROM orders WHERE order_id <= {int(num_orders)})"
+    return query.replace("FROM orders o2", f"FROM {subset} o2").replace("FROM orders o", f"FROM {subset} o")
+
+def benchmark_repurchase(scales=REPURCHASE_SCALES):
+    """Time the analysis query with the correlated EXISTS vs the window function at growing order counts.
+
+    Needs a database holding at least the largest scale (e.g. from run_simulation with a raised NUM_ORDERS).
+    """
+    ((available,),) = fetch_all("SELECT COUNT(*) FROM orders")
+    for num_orders in scales:
+        if num_orders > available:
+            print(f"Skipping {num_orders:,} orders: only {available:,} in the database.")
+            continue
+        print(f"▶ analysis query over {num_orders:,} orders")
+        rows, elapsed = timed(fetch_all, _limit_orders(ANALYSIS_QUERY, num_orders))
+        print(f"{'window function':<24} {elapsed:10.2f}s  ({len(rows):,} rows)")
+        rows, elapsed = timed(fetch_all, _limit_orders(LEGACY_ANALYSIS_QUERY, num_orders))
+        print(f"{'correlated EXISTS':<24} {elapsed:10.2f}s  ({len(rows):,} rows)")
+
+def _synthetic_analysis_frame(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "order_id": np.arange(1, num_rows + 1),
+        "shipping_variant": rng.choice(["24h", "48h", "72h"], num_rows),
+        "order_value": rng.uniform(10, 500, num_rows).round(2),
+        "satisfaction": np.where(rng.random(num_rows) < 0.3, np.nan, rng.integers(1, 6, num_rows)),
+        "delivery_rating": np.where(rng.random(num_rows) < 0.3, np.nan, rng.integers(1, 6, num_rows)),
+        "cancellation": rng.integers(0, 2, num_rows),
+        "on_time_delivery": rng.integers(0, 2, num_rows),
+        "repurchase_in_30_days": rng.integers(0, 2, num_rows),
+        "quarter": rng.integers(1, 5, num_rows),
+    })
+
+def benchmark_cache(num_rows=10_000_000):
+    """Time writing and memory-mapping a cached analysis frame vs the CSV it replaces."""
+    df = _synthetic_analysis_frame(num_rows)
+    cache_dir = tempfile.mkdtemp(prefix="etl_cache_")
+    try:
+        _, elapsed = timed(save_frame, df, "benchmark", cache_dir)
+        print(f"{'columnar save':<24} {elapsed:10.2f}s")
+        loaded, elapsed = timed(load_frame, "benchmark", cache_dir)
+        print(f"{'columnar load (mmap)':<24} {elapsed:10.2f}s  ({len(loaded):,} rows)")
+        csv_file = f"{cache_dir}/data_cache.csv"
+        _, elapsed = timed(df.to_csv, csv_file, index=False)
+        print(f"{'csv save':<24} {elapsed:10.2f}s")
+        _, elapsed = timed(pd.read_csv, csv_file)
+        print(f"{'csv load':<24} {elapsed:10.2f}s")
+    finally:
+        shutil.rmtree(cache_dir)
+
+def benchmark_metrics(num_orders=10_000_000, num_users=1_000_000, windows=(30, 60)):
+    """Recompute repurchase flags for several windows in NumPy (checked against the SQL window in tests/test_metrics.py)."""
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2024-01-01T00:00:00")
+    user_ids = rng.integers(1, num_users + 1, num_orders)
+    order_dates = start + rng.integers(0, 365 * 86400, num_orders).astype("timedelta64[s]")
+    # Same-second ties, as the real data has
+    order_dates[::7] = order_dates[::7].astype("datetime64[D]")
+
+    for window_days in windows:
+        flags, elapsed = timed(repurchase_flags, user_ids, order_dates, window_days)
+        print(f"{f'repurchase {window_days}d':<24} {elapsed:10.2f}s  ({flags.mean():.1%} of {num_orders:,} orders)")
+
+def benchmark_parallel_tests(num_rows=200_000, worker_counts=None):
+    """Wall-clock of run_multivariate_ab_test by worker count; every run must match the serial table."""
+    worker_counts = worker_counts or sorted({1, 2, 3, 6, os.cpu_count() or 1})
+    df = _synthetic_analysis_frame(num_rows).dropna()
+    df["shipping_variant"] = df["shipping_variant"].astype(str)
+
+    baseline = None
+    for n_workers in worker_counts:
+        (results, _), elapsed = timed(run_multivariate_ab_test, df, n_workers)
+        print(f"{f'{n_workers} worker(s)':<24} {elapsed:10.2f}s")
+        results = results.astype(str)
+        if baseline is None:
+            baseline = results
+        elif not results.equals(baseline):
+            raise AssertionError(f"results with {n_workers} workers differ from the serial run")
+
+def benchmark_clean(num_rows=10_000_000):
+    """Exact vs sketched outlier fences in clean_data (the sketches' rank error is checked in tests/test_sketches.py)."""
+    df = _synthetic_analysis_frame(num_rows)
+    df["order_value"] = np.random.default_rng(1).lognormal(4, 0.8, num_rows)
+    for approximate in (False, True):
+        (cleaned, report), elapsed = timed(clean_data, df, approximate)
+        label = "sketched" if approximate else "exact"
+        print(f"{f'clean_data ({label})':<24} {elapsed:10.2f}s  ({len(cleaned):,} rows kept, {report['removed_outliers']})")
+
+def benchmark_outofcore(scales=(200_000, 800_000), chunk_rows=50_000):
+    """Out-of-core run vs the in-memory tests, with a peak that does not grow with rows (results are compared in tests/test_outofcore.py)."""
+    peaks = []
+    for num_rows in scales:
+        df = _synthetic_analysis_frame(num_rows)
+        chunks = lambda: (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+        tracemalloc.start()
+        _, elapsed = timed(run_out_of_core, chunks)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        print(f"{f'out of core {num_rows:,}':<24} {elapsed:10.2f}s  (peak {peak / 1024 ** 2:.1f} MiB traced)")
+
+        _, elapsed = timed(run_multivariate_ab_test, clean_data(df)[0])
+        print(f"{f'in memory {num_rows:,}':<24} {elapsed:10.2f}s")
+    if peaks[-1] > 1.5 * peaks[0]:
+        raise AssertionError("out-of-core peak memory grows with the number of rows")
+
+def _crosstab_reference(df, col):
+    # The former per-pair path: a crosstab over the frame, then an isin filter and crosstab per pair
+    from scipy.stats import chi2_contingency, fisher_exact
+
+    variants = df["shipping_variant"].unique()
+    posthoc = {}
+    for i in range(len(variants)):
+        for j in range(i + 1, len(variants)):
+            subset = df[df["shipping_variant"].isin([variants[i], variants[j]])]
+            table = pd.crosstab(subset[col], subset["shipping_variant"])
+            if table.size == 4 and (table < 5).any().any():
+                p_value = fisher_exact(table)[1]
+            else:
+                p_value = chi2_contingency(table)[1]
+            posthoc[f"{variants[i]}-{variants[j]}"] = p_value
+    return chi2_contingency(pd.crosstab(df[col], df["shipping_variant"]))[1], posthoc
+
+def benchmark_contingency(num_rows=10_000_000, columns=("cancellation", "on_time_delivery", "repurchase_in_30_days")):
+    """Crosstab-per-pair tests vs one count table per metric (agreement is checked in tests/test_contingency.py)."""
+    df = _synthetic_analysis_frame(num_rows)
+    for col in columns:
+        _, crosstab_elapsed = timed(_crosstab_reference, df, col)
+        (table, variants), table_elapsed = timed(count_table, df, col)
+        _, tests_elapsed = timed(analyze_table, table, variants)
+        print(f"{col:<24} {crosstab_elapsed:10.2f}s crosstabs  {table_elapsed:.2f}s table + {tests_elapsed:.4f}s tests")
+
+def _scipy_rank_tests(groups):
+    # The former path: scipy's Kruskal-Wallis and scikit-posthocs' Dunn, each ranking the full column
+    import scipy.stats as stats
+    from scikit_posthocs import posthoc_dunn
+
+    frame = pd.DataFrame({"group": np.repeat(np.arange(len(groups)), [len(g) for g in groups]), "value": np.concatenate(groups)})
+    return stats.kruskal(*groups), posthoc_dunn(frame, val_col="value", group_col="group").to_numpy()
+
+def benchmark_ranks(num_rows=3_000_000):
+    """Rank engine vs scipy/scikit-posthocs for a 1-5 rating (histogram path) and a continuous metric (sorted path)."""
+    df = _synthetic_analysis_frame(num_rows).dropna()
+    for col in ("satisfaction", "order_value"):
+        groups = [df.loc[df["shipping_variant"] == v, col].to_numpy() for v in sorted(df["shipping_variant"].unique())]
+        (expected, expected_dunn), scipy_elapsed = timed(_scipy_rank_tests, groups)
+
+        def engine():
+            counts = rank_counts(groups)
+            return kruskal(counts), dunn(counts)
+        ((statistic, p_value), dunn_p), elapsed = timed(engine)
+        print(f"{col:<24} {scipy_elapsed:10.2f}s scipy  {elapsed:.2f}s rank engine")
+        if not (np.isclose(statistic, expected.statistic) and np.isclose(p_value, expected.pvalue)
+                and np.allclose(dunn_p, expected_dunn)):
+            raise AssertionError(f"rank engine disagrees with scipy for {col}")
+
+def benchmark_monitor(num_orders=300_000, num_users=30_000, min_events_per_second=20_000):
+    """Events per second through SequentialMonitor (agreement with the batch metrics is checked in tests/test_monitor.py)."""
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2024-01-01T00:00:00")
+    # Dates are not sorted by order_id, as in the simulator
+    order_dates = start + rng.integers(0, 365 * 86400, num_orders).astype("timedelta64[s]")
+    order_ids = np.arange(1, num_orders + 1)
+    user_ids = rng.integers(1, num_users + 1, num_orders)
+    values = rng.uniform(10, 500, num_orders).round(2)
+    statuses = rng.choice(["delivered", "cancelled"], num_orders, p=[0.9, 0.1])
+    ratings = rng.integers(1, 6, (num_orders, 2))
+    late = rng.random(num_orders) < 0.2
+    orders = list(zip(order_ids.tolist(), user_ids.tolist(), order_dates.tolist(), values.tolist(), statuses.tolist()))
+    reviews = list(zip(order_ids.tolist(), ratings[:, 0].tolist(), ratings[:, 1].tolist()))
+
+    monitor = SequentialMonitor()
+    begin = time.perf_counter()
+    for order, review, is_late in zip(orders, reviews, late.tolist()):
+        monitor.on_order(*order)
+        # Cancelled orders never get a logistics row
+        if order[4] != "cancelled":
+            monitor.on_logistics(order[0], order[2], order[2] + REPURCHASE_WINDOW if is_late else order[2])
+        monitor.on_review(*review)
+    elapsed = time.perf_counter() - begin
+    rate = monitor.events / elapsed
+    print(f"{'monitor events':<24} {elapsed:10.2f}s  ({rate:,.0f} events/s)")
+    monitor.report()
+    if rate < min_events_per_second:
+        raise AssertionError(f"monitor sustained {rate:,.0f} events/s, under {min_events_per_second:,}")
+
+BENCHMARKS = {
+    "repurchase": benchmark_repurchase,
+    "cache": benchmark_cache,
+    "metrics": benchmark_metrics,
+    "clean": benchmark_clean,
+    "outofcore": benchmark_outofcore,
+    "contingency": benchmark_contingency,
+    "ranks": benchmark_ranks,
+    "parallel_tests": benchmark_parallel_tests,
+    "monitor": benchmark_monitor,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
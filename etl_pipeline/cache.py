@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from db_connection import fetch_all
+
+CACHE_DIR = os.getenv('ETL_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+# Snapshots kept on disk; the least recently used are evicted past either bound
+MAX_SNAPSHOTS = int(os.getenv('ETL_CACHE_MAX_SNAPSHOTS', '4'))
+MAX_CACHE_BYTES = int(os.getenv('ETL_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+# Tables the analysis query reads -> primary key
+SOURCE_TABLES = {'orders': 'order_id', 'reviews': 'review_id', 'logistics': 'logistics_id'}
+META_FILE = 'meta.json'
+
+def table_fingerprint(tables=SOURCE_TABLES, extra=''):
+    """Hash of row counts, max ids and last update times of the source tables (plus e.g. the query text)."""
+    state = [extra]
+    for table, primary_key in tables.items():
+        ((count, max_id),) = fetch_all(f"SELECT COUNT(*), COALESCE(MAX({primary_key}), 0) FROM {table}")
+        state.append([table, int(count), int(max_id)])
+    # UPDATE_TIME catches in-place UPDATEs that leave counts and ids alone (NULL on some engines/versions)
+    update_times = fetch_all(
+        """
+        SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({})
+        ORDER BY TABLE_NAME
+        """.format(", ".join(["%s"] * len(tables))),
+        tuple(tables),
+    )
+    state.append([[name, str(updated)] for name, updated in update_times])
+    return hashlib.sha256(json.dumps(state).encode()).hexdigest()[:16]
+
+# MySQL's DECIMAL and NEWDECIMAL field types, as cursor.description reports them
+DECIMAL_TYPE_CODES = (0, 246)
+
+def decimal_columns(description):
+    """Names of the DECIMAL columns in a DB-API cursor description."""
+    return [column[0] for column in description if column[1] in DECIMAL_TYPE_CODES]
+
+def _is_decimal(series):
+    # The driver returns DECIMAL values (and only those) as Decimal objects
+    present = series.dropna()
+    return len(present) > 0 and isinstance(present.iloc[0], Decimal)
+
+def _compact(series):
+    # DECIMAL columns become float64 and every other text column a categorical, so codes such as
+    # "00123" keep their leading zeros; all-missing chunks are float NaN whatever the column holds
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        if series.isna().all():
+            return series.astype(np.float64)
+        if _is_decimal(series):
+            return pd.to_numeric(series)
+        return series.astype('category')
+    return series
+
+def _save_categories(path, i, categories):
+    # Fixed-width unicode, so the categories memory-map like the codes
+    np.save(os.path.join(path, f"{i}.categories.npy"), np.asarray(categories, dtype=str))
+
+def _write_meta(path, rows, columns):
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump({'rows': rows, 'columns': columns, 'created_at': time.time()}, f)
+
+def write_columns(df, path):
+    """Write df as one .npy per column under path; strings become categorical codes + a categories array."""
+    os.makedirs(path, exist_ok=True)
+    columns = []
+    for name in df.columns:
+        series = _compact(df[name])
+        column = {'name': str(name)}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            _save_categories(path, len(columns), series.cat.categories.astype(str))
+            column['categorical'] = True
+            values = series.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+        np.save(os.path.join(path, f"{len(columns)}.npy"), values)
+        columns.append(column)
+    _write_meta(path, len(df), columns)
+
+def _codes_dtype(n_categories):
+    # Smallest signed integer holding every code, as pandas picks for cat.codes
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+class ColumnWriter:
+    """Builds the write_columns layout from frames appended one chunk at a time.
+
+    Each chunk's columns go straight to a raw file per column, so memory stays at one chunk whatever
+    the table size; close() copies them into memory-mapped .npy files at the widest dtype seen.
+    Categories are merged across chunks (and sorted, as a single categorical would have them).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.columns = None
+        os.makedirs(path, exist_ok=True)
+        # Leftovers of an interrupted run would be appended to
+        for entry in os.scandir(path):
+            if entry.name.endswith('.raw'):
+                os.remove(entry.path)
+
+    def _raw(self, i):
+        return os.path.join(self.path, f"{i}.raw")
+
+    def append(self, df):
+        if self.columns is None:
+            # segments: (dtype, rows) per chunk written to the raw file, dtype None for an all-missing chunk
+            self.columns = [{'name': str(name), 'categories': None, 'segments': []} for name in df.columns]
+        if df.empty:
+            return
+        for i, (column, name) in enumerate(zip(self.columns, df.columns)):
+            series = _compact(df[name])
+            categorical = isinstance(series.dtype, pd.CategoricalDtype)
+            if not categorical and series.isna().all():
+                # All-NULL chunks compact to float NaN whatever the column holds; filled in on close
+                column['segments'].append((None, len(series)))
+                continue
+            if categorical != (column['categories'] is not None) and any(dtype for dtype, _ in column['segments']):
+                raise ValueError(f"Column {column['name']} holds both text and numbers across chunks.")
+            if categorical:
+                categories = column['categories'] = column['categories'] or {}
+                # Chunk codes -> codes in order of first appearance; -1 (missing) stays -1
+                lookup = np.array([categories.setdefault(c, len(categories)) for c in series.cat.categories.astype(str)]
+                                  + [-1], dtype=np.int64)
+                values = lookup[series.cat.codes.to_numpy()]
+            else:
+                values = np.ascontiguousarray(series.to_numpy())
+            with open(self._raw(i), 'ab') as f:
+                values.tofile(f)
+            column['segments'].append((values.dtype, len(values)))
+        self.rows += len(df)
+
+    def close(self):
+        """Write the .npy columns and the meta file; returns the number of rows written."""
+        columns = []
+        for i, column in enumerate(self.columns or []):
+            dtypes = [dtype for dtype, _ in column['segments'] if dtype is not None]
+            if column['categories'] is not None:
+                names = sorted(column['categories'])
+                _save_categories(self.path, i, names)
+                # First-appearance codes -> sorted codes, with a trailing -1 for missing values
+                remap = np.empty(len(names) + 1, dtype=np.int64)
+                remap[[column['categories'][name] for name in names]] = np.arange(len(names))
+                remap[-1] = -1
+                dtype, fill = _codes_dtype(len(names)), -1
+            else:
+                dtype = np.result_type(*dtypes) if dtypes else np.dtype(np.float64)
+                if len(dtypes) < len(column['segments']) and dtype.kind in 'biu':
+                    dtype = np.result_type(dtype, np.float64)
+                fill = np.datetime64('NaT') if dtype.kind == 'M' else np.nan
+
+            out = np.lib.format.open_memmap(os.path.join(self.path, f"{i}.npy"), mode='w+', dtype=dtype, shape=(self.rows,))
+            position = 0
+            raw = open(self._raw(i), 'rb') if dtypes else None
+            for segment_dtype, n in column['segments']:
+                if segment_dtype is None:
+                    out[position:position + n] = fill
+                else:
+                    values = np.fromfile(raw, dtype=segment_dtype, count=n)
+                    out[position:position + n] = remap[values] if column['categories'] is not None else values
+                position += n
+            out.flush()
+            del out
+            if raw is not None:
+                raw.close()
+                os.remove(self._raw(i))
+            meta = {'name': column['name']}
+            if column['categories'] is not None:
+                meta['categorical'] = True
+            columns.append(meta)
+        _write_meta(self.path, self.rows, columns)
+        return self.rows
+
+def read_columns(path, mmap=True):
+    """DataFrame over the .npy columns under path (memory-mapped by default), or None if absent."""
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    mmap_mode = 'r' if mmap else None
+    data = {}
+    for i, column in enumerate(meta['columns']):
+        values = np.load(os.path.join(path, f"{i}.npy"), mmap_mode=mmap_mode)
+        if column.get('categorical'):
+            categories = np.load(os.path.join(path, f"{i}.categories.npy"), mmap_mode=mmap_mode)
+            dtype = pd.CategoricalDtype(pd.Index(categories))
+            values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+def save_frame(df, key, cache_dir=CACHE_DIR):
+    """Cache df as snapshot key, evicting older snapshots past the bounds."""
+    path = os.path.join(cache_dir, key)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    write_columns(df, tmp_path)
+    # Readers only ever see complete snapshots
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    evict(cache_dir, keep=key)
+
+def load_frame(key, cache_dir=CACHE_DIR, mmap=True):
+    """Memory-map a cached snapshot back into a DataFrame, or None if there is none for key."""
+    path = os.path.join(cache_dir, key)
+    df = read_columns(path, mmap)
+    if df is not None:
+        # Last access time drives eviction
+        os.utime(os.path.join(path, META_FILE))
+    return df
+
+def _snapshots(cache_dir):
+    snapshots = []
+    for key in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, key, META_FILE)
+        if key.endswith('.tmp') or not os.path.exists(meta_path):
+            continue
+        folder = os.path.join(cache_dir, key)
+        size = sum(entry.stat().st_size for entry in os.scandir(folder))
+        snapshots.append((os.path.getmtime(meta_path), key, size))
+    return sorted(snapshots, reverse=True)
+
+def evict(cache_dir=CACHE_DIR, keep=None, max_snapshots=MAX_SNAPSHOTS, max_bytes=MAX_CACHE_BYTES):
+    """Drop least recently used snapshots until both the count and size bounds hold."""
+    if not os.path.isdir(cache_dir):
+        return
+    total = 0
+    kept = 0
+    for _, key, size in _snapshots(cache_dir):
+        if key == keep or (kept < max_snapshots and total + size <= max_bytes):
+            total += size
+            kept += 1
+        else:
+            shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+            print(f"Evicted cached snapshot {key}.")
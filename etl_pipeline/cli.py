@@ -0,0 +1,103 @@
+# Single entry point for the ETL pipeline: python cli.py {extract,transform,load,report,monitor}.
+# Only argparse is loaded up front; each subcommand imports the modules (and heavy libraries) it needs.
+import argparse
+import csv
+import sys
+
+RESULTS_CSV = 'multivariate_ab_test_results.csv'
+# assumptions.STRATEGIES, copied so building the parser needs no numpy (tests/test_imports.py keeps them equal)
+ASSUMPTION_STRATEGIES = ('auto', 'shapiro', 'subsample', 'dagostino', 'anderson', 'effect_size')
+REPORT_COLUMNS = ['Metric', 'Test Used', 'Statistic', 'p-value', 'Significant', 'Effect Size (η²)']
+
+def run_extract(args):
+    import extract
+    extract.main(args.output_dir or extract.EXTRACT_DIR, args.workers or extract.MAX_WORKERS, args.csv)
+
+def run_transform(args):
+    if args.repurchase_days and not args.from_extracted:
+        print("❌ --repurchase-days only applies with --from-extracted.")
+        return 1
+    import transform
+    options = {'assumption_strategy': args.assumptions} if args.assumptions else {}
+    transform.main(args.workers, plots=not args.no_plots, resampling=args.resampling,
+                   approximate_quantiles=args.approximate_quantiles, out_of_core=args.out_of_core,
+                   full_refresh=args.full, use_cache=args.use_cache, pushdown=args.pushdown,
+                   from_extracted=args.from_extracted, repurchase_days=args.repurchase_days, **options)
+
+def run_load(args):
+    import load
+    load.load_results(args.results)
+
+def run_monitor(args):
+    import monitor
+    monitor.run(args.checkpoint or monitor.CHECKPOINT_FILE, args.interval or monitor.POLL_INTERVAL, args.once)
+
+def run_report(args):
+    # Plain csv, so printing saved results needs neither pandas nor a database
+    try:
+        with open(args.results, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    except FileNotFoundError:
+        print(f"❌ No results at {args.results}; run the transform step first.")
+        return 1
+
+    widths = [max(len(col), *(len(_format(row.get(col, ''))) for row in rows)) for col in REPORT_COLUMNS]
+    print("  ".join(col.ljust(width) for col, width in zip(REPORT_COLUMNS, widths)))
+    for row in rows:
+        print("  ".join(_format(row.get(col, '')).ljust(width) for col, width in zip(REPORT_COLUMNS, widths)))
+    return 0
+
+def _format(value):
+    try:
+        return f"{float(value):.4g}"
+    except ValueError:
+        return value
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Shipping A/B test ETL pipeline.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    extract = subcommands.add_parser("extract", help="extract every table into the columnar store")
+    extract.add_argument("--output-dir")
+    extract.add_argument("--workers", type=int)
+    extract.add_argument("--csv", action="store_true", help="also dump each table to CSV for debugging")
+    extract.set_defaults(handler=run_extract)
+
+    transform = subcommands.add_parser("transform", help="fetch, clean and A/B test the analysis dataset")
+    transform.add_argument("--workers", type=int, default=1, help="test metrics on N processes")
+    transform.add_argument("--no-plots", action="store_true", help="skip the diagnostic plot stage")
+    transform.add_argument("--assumptions", choices=ASSUMPTION_STRATEGIES, help="normality/variance check")
+    transform.add_argument("--resampling", action="store_true", help="add permutation tests and bootstrap CIs")
+    transform.add_argument("--approximate-quantiles", action="store_true", help="outlier fences from KLL sketches")
+    mode = transform.add_mutually_exclusive_group()
+    mode.add_argument("--out-of-core", action="store_true", help="stream the data in bounded chunks "
+                                                                "(memory from OUTOFCORE_MEMORY_MB)")
+    mode.add_argument("--pushdown", action="store_true", help="test from aggregates computed in MySQL")
+    source = transform.add_mutually_exclusive_group()
+    source.add_argument("--full", action="store_true", help="reload the whole analysis dataset, not just changed orders")
+    source.add_argument("--use-cache", action="store_true", help="use the columnar snapshot keyed on the tables' state")
+    source.add_argument("--from-extracted", metavar="DIR", help="compute the metrics from extract's tables in DIR")
+    transform.add_argument("--repurchase-days", type=int, help="repurchase window with --from-extracted (default 30)")
+    transform.set_defaults(handler=run_transform)
+
+    load = subcommands.add_parser("load", help="load the A/B test results into MySQL")
+    load.add_argument("--results", default=RESULTS_CSV)
+    load.set_defaults(handler=run_load)
+
+    report = subcommands.add_parser("report", help="print the saved A/B test results")
+    report.add_argument("--results", default=RESULTS_CSV)
+    report.set_defaults(handler=run_report)
+
+    monitor = subcommands.add_parser("monitor", help="poll new rows and report always-valid sequential p-values")
+    monitor.add_argument("--checkpoint")
+    monitor.add_argument("--interval", type=float, help="seconds between polls")
+    monitor.add_argument("--once", action="store_true", help="poll once and exit")
+    monitor.set_defaults(handler=run_monitor)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from db_connection import fetch_all
+from queries import ANALYSIS_SOURCE
+
+ALPHA = 0.05
+CONFIDENCE = 0.95
+CORRECTIONS = ('holm', 'bonferroni')
+POSTHOC_CORRECTION = 'holm'
+# 2 x 2 tables with an observed cell below this use Fisher's exact test
+MIN_CELL_COUNT = 5
+
+# Tables are 2 x K numpy arrays of counts: row 0 counts the 0s and row 1 the 1s of a binary
+# metric, one column per variant. Once a table exists nothing here touches the rows again.
+
+def count_table(df, col, variant_col='shipping_variant'):
+    """(2 x K table, variants) in one bincount pass; variants in order of first appearance."""
+    codes, variants = pd.factorize(df[variant_col], sort=False)
+    values = np.asarray(df[col])
+    keep = (codes >= 0) & ~pd.isna(values)
+    cells = values[keep].astype(np.int64) * len(variants) + codes[keep]
+    table = np.bincount(cells, minlength=2 * len(variants)).reshape(2, len(variants))
+    return table, list(variants)
+
+def sql_count_table(col, variants=None, bounds=None, source=ANALYSIS_SOURCE, fetch=fetch_all):
+    """(2 x K table, variants) from a GROUP BY in MySQL, without fetching any rows.
+
+    bounds ({metric: (low, high)}) keeps only rows with every bounded metric present and in range,
+    as sufficient_stats.sql_moments does. source and fetch as there.
+    """
+    bounds = bounds or {}
+    where = [f"{col} IS NOT NULL"] + [f"{metric} BETWEEN %s AND %s" for metric in bounds]
+    rows = fetch(
+        f"SELECT shipping_variant, {col}, COUNT(*) FROM {source} "
+        f"WHERE {' AND '.join(where)} GROUP BY shipping_variant, {col}",
+        tuple(float(v) for bound in bounds.values() for v in bound) or None,
+    )
+    variants = list(variants or sorted({variant for variant, _, _ in rows}))
+    table = np.zeros((2, len(variants)), dtype=np.int64)
+    for variant, value, count in rows:
+        table[int(value), variants.index(variant)] = int(count)
+    return table, variants
+
+def _observed(table):
+    # pd.crosstab only has rows for outcomes that occur
+    return table[table.sum(axis=1) > 0]
+
+def omnibus_test(table):
+    """(test used, statistic, p): Fisher's exact test for a 2 x 2 table with a small cell, else chi-squared."""
+    from scipy import stats
+
+    table = _observed(table)
+    if table.shape == (2, 2) and (table < MIN_CELL_COUNT).any():
+        statistic, p_value = stats.fisher_exact(table)
+        return "Fisher's Exact Test", statistic, p_value
+    chi2, p_value, _, _ = stats.chi2_contingency(table)
+    return 'Chi-squared Test', chi2, p_value
+
+def adjust_p_values(p_values, method=POSTHOC_CORRECTION):
+    """Family-wise adjusted p-values (Holm step-down or Bonferroni) for a {key: p} mapping."""
+    if method not in CORRECTIONS:
+        raise ValueError(f"Unknown correction {method!r}; expected one of {CORRECTIONS}.")
+    keys = list(p_values)
+    p = np.array([p_values[key] for key in keys], dtype=np.float64)
+    m = len(p)
+    if method == 'bonferroni':
+        adjusted = p * m
+    else:
+        order = np.argsort(p, kind='stable')
+        adjusted = np.empty(m)
+        adjusted[order] = np.maximum.accumulate(p[order] * (m - np.arange(m)))
+    return {key: float(value) for key, value in zip(keys, np.minimum(adjusted, 1.0))}
+
+def cramers_v(table):
+    """Cramér's V from the uncorrected chi-squared statistic of the table."""
+    from scipy import stats
+
+    table = _observed(table)
+    table = table[:, table.sum(axis=0) > 0]
+    if min(table.shape) < 2:
+        return np.nan
+    chi2 = stats.chi2_contingency(table, correction=False)[0]
+    return float(np.sqrt(chi2 / (table.sum() * (min(table.shape) - 1))))
+
+def risk_difference(table, i, j, confidence=CONFIDENCE):
+    """Rate of 1s in column i minus column j, with a Wald interval: (difference, low, high).
+
+    All NaN when either column is empty: a variant with no rows has no rate.
+    """
+    from scipy import stats
+
+    n_i, n_j = table[:, i].sum(), table[:, j].sum()
+    if n_i == 0 or n_j == 0:
+        return np.nan, np.nan, np.nan
+    p_i, p_j = table[1, i] / n_i, table[1, j] / n_j
+    difference = p_i - p_j
+    margin = stats.norm.ppf(0.5 + confidence / 2) * np.sqrt(p_i * (1 - p_i) / n_i + p_j * (1 - p_j) / n_j)
+    return float(difference), float(difference - margin), float(difference + margin)
+
+def analyze_table(table, variants, correction=POSTHOC_CORRECTION, alpha=ALPHA, confidence=CONFIDENCE):
+    """Omnibus test, pairwise tests (raw and adjusted), Cramér's V and risk differences from one table.
+
+    Pairs are keyed "v1-v2" in variant order, as run_multivariate_ab_test has always reported them.
+    """
+    test_used, statistic, p_value = omnibus_test(table)
+    posthoc = {}
+    differences = {}
+    for i in range(len(variants)):
+        for j in range(i + 1, len(variants)):
+            pair = f"{variants[i]}-{variants[j]}"
+            posthoc[pair] = omnibus_test(table[:, [i, j]])[2]
+            differences[pair] = risk_difference(table, i, j, confidence)
+    return {
+        'Test Used': test_used,
+        'Statistic': statistic,
+        'p-value': p_value,
+        'Significant': p_value < alpha,
+        'Posthoc Results': posthoc,
+        'Adjusted Posthoc': adjust_p_values(posthoc, correction) if posthoc else {},
+        "Cramér's V": cramers_v(table),
+        'Risk Differences': differences,
+    }
@@ -0,0 +1,17 @@
+import os
+import sys
+
+# The data-access layer is shared with etl_pipeline and lives in common/db.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.db import (  # noqa: E402
+    connection,
+    cursor,
+    execute,
+    fetch_all,
+    get_connection,
+    get_engine,
+    retry,
+    set_pool_size,
+    stream_query,
+)
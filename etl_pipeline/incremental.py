@@ -0,0 +1,76 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from db_connection import fetch_all, get_engine
+from queries import ANALYSIS_QUERY, INCREMENTAL_ANALYSIS_QUERY, WATERMARK_QUERY
+
+DATASET_FILE = 'analysis_dataset.pkl'
+STATE_FILE = 'analysis_state.json'
+
+WATERMARK_KEYS = ('max_order_id', 'max_logistics_id', 'max_review_id')
+
+def _fetch_watermarks():
+    ((max_order_id, max_logistics_id, max_review_id, order_count),) = fetch_all(WATERMARK_QUERY)
+    return {
+        'max_order_id': int(max_order_id),
+        'max_logistics_id': int(max_logistics_id),
+        'max_review_id': int(max_review_id),
+        'order_count': int(order_count),
+    }
+
+def _rewound(watermarks, state):
+    # Ids or the order count going backwards mean the tables were cleared (clear_db.py) and refilled,
+    # so the saved dataset describes data that no longer exists
+    if any(watermarks[key] < state[key] for key in WATERMARK_KEYS):
+        return True
+    return 'order_count' in state and watermarks['order_count'] < state['order_count']
+
+def load_state(state_file=STATE_FILE):
+    if not os.path.exists(state_file):
+        return None
+    with open(state_file) as f:
+        return json.load(f)
+
+def _save(df, watermarks, dataset_file, state_file):
+    df.to_pickle(dataset_file)
+    state = dict(watermarks, refreshed_at=datetime.now().isoformat(timespec='seconds'), rows=len(df))
+    # Written last and replaced atomically: a crash mid-refresh leaves the old watermarks,
+    # so the next run simply re-reads the same changes
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, state_file)
+
+def merge_changed(df, changed):
+    """Replace the rows of re-computed orders and append the new ones, keyed by order_id."""
+    kept = df[~df['order_id'].isin(changed['order_id'])]
+    return pd.concat([kept, changed], ignore_index=True).sort_values('order_id', ignore_index=True)
+
+def refresh_analysis_dataset(dataset_file=DATASET_FILE, state_file=STATE_FILE, full=False):
+    """Bring the persisted analysis dataset up to date, re-reading only orders changed since the last run."""
+    state = load_state(state_file)
+    # Watermarks are read before the data: rows landing in between are picked up
+    # again next time and merged by order_id rather than missed
+    watermarks = _fetch_watermarks()
+    rewound = state is not None and _rewound(watermarks, state)
+    if rewound:
+        print("⚠️ Source tables went back since the last refresh (cleared and re-simulated?); reloading everything.")
+    if full or rewound or state is None or not os.path.exists(dataset_file):
+        df = pd.read_sql(ANALYSIS_QUERY, get_engine())
+        _save(df, watermarks, dataset_file, state_file)
+        print(f"Full refresh: {len(df)} orders.")
+        return df
+
+    previous = {key: state[key] for key in WATERMARK_KEYS}
+    if all(watermarks[key] == previous[key] for key in WATERMARK_KEYS):
+        print("Analysis dataset is up to date.")
+        return pd.read_pickle(dataset_file)
+
+    changed = pd.read_sql(INCREMENTAL_ANALYSIS_QUERY, get_engine(), params=previous)
+    df = merge_changed(pd.read_pickle(dataset_file), changed)
+    _save(df, watermarks, dataset_file, state_file)
+    print(f"Incremental refresh: {len(changed)} orders re-computed, {len(df)} in total.")
+    return df
@@ -1,19 +1,7 @@
-import mysql.connector
 import pandas as pd
 import os
 import numpy as np
-from dotenv import load_dotenv
-
-
-load_dotenv()
-
-db_config = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD'),
-    'database': os.getenv('DB_NAME')
-}
+from db_connection import cursor
 
 
 def load_results(csv_path='multivariate_ab_test_results.csv'):
@@ -33,26 +21,6 @@ def load_results(csv_path='multivariate_ab_test_results.csv'):
     
     df = df.replace({np.nan: None, 'nan': None, 'NAN': None})
 
-    conn = mysql.connector.connect(**db_config)
-    cursor = conn.cursor()
-
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS ab_test_results (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        metric VARCHAR(50),
-        test_used VARCHAR(50),
-        statistic FLOAT,
-        p_value FLOAT,
-        significant BOOLEAN,
-        effect_size FLOAT,
-        assumptions_met BOOLEAN,
-        posthoc_comparison TEXT
-    )
-    """)
-    
-
-
     insert_query = """
     INSERT INTO ab_test_results (
         metric, test_used, statistic, p_value,
@@ -60,10 +28,22 @@ def load_results(csv_path='multivariate_ab_test_results.csv'):
     ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
     """
     data_tuples = [tuple(x) for x in df.to_numpy()]
-    cursor.executemany(insert_query, data_tuples)
-    conn.commit()
-    cursor.close()
-    conn.close()
+
+    with cursor(commit=True) as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS ab_test_results (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            metric VARCHAR(50),
+            test_used VARCHAR(50),
+            statistic FLOAT,
+            p_value FLOAT,
+            significant BOOLEAN,
+            effect_size FLOAT,
+            assumptions_met BOOLEAN,
+            posthoc_comparison TEXT
+        )
+        """)
+        cur.executemany(insert_query, data_tuples)
     print("✅ A/B test results loaded into database.")
 
 if __name__ == "__main__":
@@ -0,0 +1,241 @@
+import argparse
+import heapq
+import math
+import os
+import pickle
+import time
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from db_connection import stream_query
+
+VARIANTS = ('24h', '48h', '72h')  # order_id % 3, as in ANALYSIS_QUERY
+CONTINUOUS_METRICS = ('order_value', 'satisfaction', 'delivery_rating')
+CATEGORICAL_METRICS = ('cancellation', 'on_time_delivery', 'repurchase_in_30_days')
+REPURCHASE_WINDOW = timedelta(days=30)
+# How far behind the latest order date an order may still arrive; the simulator spreads dates over a year
+REPURCHASE_LATENESS = timedelta(days=int(os.getenv('MONITOR_LATENESS_DAYS', '400')))
+ALPHA = 0.05
+# mSPRT mixing prior on the difference in means: N(0, (MIXTURE_EFFECT_SIZE * pooled sd)^2)
+MIXTURE_EFFECT_SIZE = 0.1
+CHECKPOINT_FILE = 'monitor_state.pkl'
+POLL_INTERVAL = 60
+
+class Welford:
+    """Running count, mean and sum of squared deviations, O(1) per value."""
+
+    __slots__ = ('n', 'mean', 'm2')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+def msprt_likelihood_ratio(difference, variance, tau2):
+    """Normal-mixture SPRT statistic for an observed difference with the given sampling variance."""
+    if variance <= 0 or tau2 <= 0:
+        return 1.0
+    exponent = tau2 * difference ** 2 / (2 * variance * (variance + tau2))
+    # Past exp's range the evidence is overwhelming anyway
+    return math.sqrt(variance / (variance + tau2)) * math.exp(min(exponent, 700.0))
+
+class SequentialMonitor:
+    """Per-variant accumulators for the six test metrics, fed one order/logistics/review row at a time.
+
+    p_values() may be called after any number of events: they are always-valid mSPRT p-values,
+    kept as running minima across looks, so checking continuously does not inflate the error rate.
+    """
+
+    def __init__(self, alpha=ALPHA, effect_size=MIXTURE_EFFECT_SIZE, lateness=REPURCHASE_LATENESS):
+        self.alpha = alpha
+        self.lateness = lateness
+        self.effect_size = effect_size
+        self.moments = {col: [Welford() for _ in VARIANTS] for col in CONTINUOUS_METRICS}
+        # [rows, ones] per variant
+        self.counts = {col: [[0, 0] for _ in VARIANTS] for col in CATEGORICAL_METRICS}
+        self.p_running = {col: {} for col in CONTINUOUS_METRICS + CATEGORICAL_METRICS}
+        # Watermarks of the rows consumed so far, for polling and restarts
+        self.last_ids = {'orders': 0, 'logistics': 0, 'reviews': 0}
+        self.events = 0
+        # Repurchase flags follow the batch definition over the orders seen so far: every order is a
+        # row, flipped to 1 once an order of the same user lands in its window, whichever arrives first.
+        # user -> (sorted order dates, [order_id, variant, flagged] per date)
+        self.clock = None
+        self.user_orders = {}
+        # (order_date + window, user_id, order_id), to drop orders no late arrival can affect any more
+        self.expiry = []
+
+    # Events
+
+    def on_order(self, order_id, user_id, order_date, total_value, order_status):
+        variant = order_id % 3
+        self.events += 1
+        if total_value is not None:
+            self.moments['order_value'][variant].add(float(total_value))
+        self._count('cancellation', variant, order_status == 'cancelled')
+        # Every order is a row; on_logistics adds the on-time ones, as the LEFT JOIN in ANALYSIS_QUERY does
+        self._count('on_time_delivery', variant, False)
+
+        dates, entries = self.user_orders.setdefault(user_id, ([], []))
+        # Earlier orders of this user whose window this one falls in
+        for entry in entries[bisect_left(dates, order_date - REPURCHASE_WINDOW):bisect_left(dates, order_date)]:
+            if not entry[2]:
+                entry[2] = True
+                self.counts['repurchase_in_30_days'][entry[1]][1] += 1
+        # This order's own window, over the orders already seen (they need not come in date order)
+        position = bisect_right(dates, order_date)
+        flagged = position < len(dates) and dates[position] <= order_date + REPURCHASE_WINDOW
+        self._count('repurchase_in_30_days', variant, flagged)
+        dates.insert(position, order_date)
+        entries.insert(position, [order_id, variant, flagged])
+        heapq.heappush(self.expiry, (order_date + REPURCHASE_WINDOW, user_id, order_id))
+        self.advance(order_date)
+
+    def on_logistics(self, order_id, expected_delivery, actual_delivery):
+        self.events += 1
+        if actual_delivery is not None and expected_delivery is not None and actual_delivery <= expected_delivery:
+            self.counts['on_time_delivery'][order_id % 3][1] += 1
+
+    def on_review(self, order_id, satisfaction, delivery_rating):
+        variant = order_id % 3
+        self.events += 1
+        if satisfaction is not None:
+            self.moments['satisfaction'][variant].add(float(satisfaction))
+        if delivery_rating is not None:
+            self.moments['delivery_rating'][variant].add(float(delivery_rating))
+
+    def advance(self, now):
+        """Move the stream clock; orders whose window closed over `lateness` before it are final and forgotten."""
+        if self.clock is not None and now <= self.clock:
+            return
+        self.clock = now
+        horizon = now - self.lateness
+        while self.expiry and self.expiry[0][0] < horizon:
+            deadline, user_id, order_id = heapq.heappop(self.expiry)
+            dates, entries = self.user_orders[user_id]
+            index = bisect_left(dates, deadline - REPURCHASE_WINDOW)
+            while entries[index][0] != order_id:
+                index += 1
+            del dates[index], entries[index]
+            if not dates:
+                del self.user_orders[user_id]
+
+    def _count(self, col, variant, flag):
+        cell = self.counts[col][variant]
+        cell[0] += 1
+        cell[1] += flag
+
+    # Inference
+
+    def _summaries(self, col):
+        # (n, mean, variance) per variant
+        if col in self.moments:
+            return [(w.n, w.mean, w.variance) for w in self.moments[col]]
+        summaries = []
+        for n, ones in self.counts[col]:
+            rate = ones / n if n else 0.0
+            summaries.append((n, rate, rate * (1 - rate)))
+        return summaries
+
+    def p_values(self):
+        """{metric: {'v1-v2': always-valid p}} for every variant pair, updated with this look."""
+        for col, running in self.p_running.items():
+            summaries = self._summaries(col)
+            total = sum(n for n, _, _ in summaries)
+            pooled_variance = sum(n * var for n, _, var in summaries) / total if total else 0.0
+            tau2 = (self.effect_size ** 2) * pooled_variance
+            for i in range(len(VARIANTS)):
+                for j in range(i + 1, len(VARIANTS)):
+                    (n_a, mean_a, var_a), (n_b, mean_b, var_b) = summaries[i], summaries[j]
+                    if n_a < 2 or n_b < 2:
+                        continue
+                    ratio = msprt_likelihood_ratio(mean_a - mean_b, var_a / n_a + var_b / n_b, tau2)
+                    pair = f"{VARIANTS[i]}-{VARIANTS[j]}"
+                    running[pair] = min(running.get(pair, 1.0), 1.0 / ratio)
+        return {col: dict(running) for col, running in self.p_running.items()}
+
+    def report(self):
+        """One row per metric: per-variant means/rates and the Bonferroni-adjusted smallest pairwise p."""
+        p_values = self.p_values()
+        rows = []
+        for col in CONTINUOUS_METRICS + CATEGORICAL_METRICS:
+            pairs = p_values[col]
+            p_value = min(1.0, min(pairs.values()) * len(pairs)) if pairs else 1.0
+            rows.append({
+                'Metric': col,
+                'Test Used': 'mSPRT',
+                'Means': {v: mean for v, (_, mean, _) in zip(VARIANTS, self._summaries(col))},
+                'p-value': p_value,
+                'Significant': p_value < self.alpha,
+                'Posthoc Results': pairs,
+            })
+        return rows
+
+    # Persistence
+
+    def save(self, path=CHECKPOINT_FILE):
+        # Atomic: a crash mid-write leaves the previous checkpoint intact
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CHECKPOINT_FILE):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+# Feeding from MySQL
+
+def poll(monitor):
+    """Consume every order, logistics and review row past the monitor's watermarks; returns rows read."""
+    before = monitor.events
+    for order_id, user_id, order_date, total_value, order_status in stream_query(
+        "SELECT order_id, user_id, order_date, total_value, order_status FROM orders "
+        "WHERE order_id > %s ORDER BY order_id", (monitor.last_ids['orders'],)
+    ):
+        monitor.on_order(order_id, user_id, order_date, total_value, order_status)
+        monitor.last_ids['orders'] = order_id
+    for logistics_id, order_id, expected, actual in stream_query(
+        "SELECT logistics_id, order_id, expected_delivery, actual_delivery FROM logistics "
+        "WHERE logistics_id > %s ORDER BY logistics_id", (monitor.last_ids['logistics'],)
+    ):
+        monitor.on_logistics(order_id, expected, actual)
+        monitor.last_ids['logistics'] = logistics_id
+    for review_id, order_id, satisfaction, delivery_rating in stream_query(
+        "SELECT review_id, order_id, satisfaction, delivery_rating FROM reviews "
+        "WHERE review_id > %s ORDER BY review_id", (monitor.last_ids['reviews'],)
+    ):
+        monitor.on_review(order_id, satisfaction, delivery_rating)
+        monitor.last_ids['reviews'] = review_id
+    return monitor.events - before
+
+def run(checkpoint=CHECKPOINT_FILE, interval=POLL_INTERVAL, once=False):
+    monitor = SequentialMonitor.load(checkpoint) if os.path.exists(checkpoint) else SequentialMonitor()
+    while True:
+        new_rows = poll(monitor)
+        monitor.save(checkpoint)
+        print(f"{new_rows} new rows ({monitor.events} total).")
+        for row in monitor.report():
+            print(f"  {row['Metric']:<24} p={row['p-value']:.4f}{'  ✅ significant' if row['Significant'] else ''}")
+        if once:
+            return monitor
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously monitor the shipping-variant experiment.")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    parser.add_argument("--once", action="store_true", help="poll once and exit")
+    args = parser.parse_args()
+    run(args.checkpoint, args.interval, args.once)
@@ -0,0 +1,208 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from contingency import analyze_table
+from db_connection import cursor
+from metrics import SHIPPING_VARIANTS
+from queries import ANALYSIS_QUERY
+from ranks import dunn, kruskal
+from sketches import KLLSketch, iqr_fences, sketch_columns, sketch_quartiles
+from sufficient_stats import (
+    ALPHA, CATEGORICAL_METRICS, CONTINUOUS_METRICS, GroupMoments, ancova, anova, bartlett,
+    contingency_table, frame_moments, normality, tukey_hsd,
+)
+
+# Out-of-core analysis: two streaming passes over the analysis query, never holding more than one chunk.
+#   pass 1: KLL sketches of every continuous metric -> clean_data's IQR fences
+#   pass 2: rows inside the fences -> per-(variant, quarter) moments, per-variant rank histograms
+#           and per-variant sketches; all state is fixed-size whatever the number of orders.
+# Approximations against the in-memory run_multivariate_ab_test:
+#   - fences come from sketched quartiles (rank error about 1 / KLL_K);
+#   - Bartlett and D'Agostino-Pearson K^2 (from moments) gate ANCOVA instead of Levene and Shapiro-Wilk;
+#   - Kruskal-Wallis and Dunn rank histogram bins: exact for integer metrics with fewer distinct
+#     values than HISTOGRAM_BINS (the ratings), otherwise values sharing a bin count as ties;
+#   - box plot summaries come from sketches, with whiskers clipped to the fences and no fliers.
+# ANCOVA/ANOVA, Tukey and the contingency engine's tests are exact from the moments.
+
+# Peak memory for the chunk being processed; state outside it is a few MiB at most
+MEMORY_BUDGET = int(float(os.getenv('OUTOFCORE_MEMORY_MB', '256')) * 1024 ** 2)
+# Rough size of one fetched analysis row: the driver's tuple of Python objects plus its frame columns
+ROW_BYTES = 1024
+HISTOGRAM_BINS = 4096
+
+def chunk_rows_for(budget=MEMORY_BUDGET):
+    return max(1, budget // ROW_BYTES)
+
+def iter_analysis_chunks(chunk_rows):
+    """Stream the analysis query through a server-side cursor as numeric DataFrame chunks."""
+    with cursor(streaming=True) as cur:
+        cur.execute(ANALYSIS_QUERY)
+        columns = cur.column_names
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                return
+            chunk = pd.DataFrame.from_records(rows, columns=columns)
+            # DECIMAL columns arrive as Decimal objects
+            metrics = CONTINUOUS_METRICS + CATEGORICAL_METRICS + ['quarter']
+            chunk[metrics] = chunk[metrics].apply(pd.to_numeric)
+            yield chunk
+
+class RankHistogram:
+    """Counts per (bin, variant) over fixed bins: a ranks.py counts table built chunk by chunk.
+
+    Integer metrics spanning fewer than max_bins values get one bin per integer, so their ranks are exact.
+    """
+
+    def __init__(self, lower, upper, integral, max_bins=HISTOGRAM_BINS):
+        if integral and upper - lower < max_bins:
+            self.origin, self.width = float(np.ceil(lower)), 1.0
+            bins = int(np.floor(upper) - self.origin) + 1
+        else:
+            self.origin = float(lower)
+            self.width = (upper - lower) / max_bins if upper > lower else 1.0
+            bins = max_bins
+        self.counts = np.zeros((max(bins, 1), len(SHIPPING_VARIANTS)), dtype=np.int64)
+
+    def update(self, values, variant_codes):
+        bins = np.floor((np.asarray(values, dtype=np.float64) - self.origin) / self.width)
+        bins = bins.clip(0, len(self.counts) - 1).astype(np.int64)
+        k = self.counts.shape[1]
+        self.counts += np.bincount(bins * k + variant_codes, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def kruskal(self):
+        """Kruskal-Wallis H (tie-corrected) and p across variants, from bin midranks."""
+        return kruskal(self.counts)
+
+    def dunn(self):
+        """Dunn's pairwise p-values for both orders of each pair of present variants."""
+        present = np.flatnonzero(self.counts.sum(axis=0) > 0)
+        p_values = dunn(self.counts[:, present])
+        return {
+            (SHIPPING_VARIANTS[i], SHIPPING_VARIANTS[j]): p_values[a, b]
+            for a, i in enumerate(present) for b, j in enumerate(present) if i != j
+        }
+
+def _box_summary(col, sketches, lower, upper):
+    box_stats = []
+    for variant, sketch in zip(SHIPPING_VARIANTS, sketches):
+        if sketch.count == 0:
+            continue
+        q1, med, q3 = sketch.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        box_stats.append({
+            'label': str(variant),
+            'q1': float(q1), 'med': float(med), 'q3': float(q3),
+            'whislo': float(max(sketch.min, q1 - 1.5 * iqr, lower)),
+            'whishi': float(min(sketch.max, q3 + 1.5 * iqr, upper)),
+            'fliers': [],
+        })
+    return {'kind': 'box', 'metric': col, 'stats': box_stats}
+
+def _proportion_summary(col, moments):
+    g = moments.by_variant()
+    present = g.n > 0
+    return {
+        'kind': 'proportion',
+        'metric': col,
+        'labels': [str(v) for v in SHIPPING_VARIANTS[present]],
+        'values': [float(v) for v in g.mean[present]],
+    }
+
+def out_of_core_bounds(chunks):
+    """Pass 1: IQR fences from sketched quartiles, plus whether each metric only ever held integers."""
+    sketches = {col: KLLSketch() for col in CONTINUOUS_METRICS}
+    integral = dict.fromkeys(CONTINUOUS_METRICS, True)
+    for chunk in chunks:
+        present = chunk.dropna(subset=CONTINUOUS_METRICS)
+        for col, sketch in sketch_columns([present], CONTINUOUS_METRICS).items():
+            sketches[col].merge(sketch)
+            integral[col] = integral[col] and bool((np.mod(present[col].to_numpy(dtype=np.float64), 1) == 0).all())
+    lower, upper = iqr_fences(sketch_quartiles(sketches))
+    return lower, upper, integral
+
+def out_of_core_state(chunks, lower, upper, integral):
+    """Pass 2: moments, rank histograms, per-variant sketches and the cleaning report over cleaned rows."""
+    moments = {col: GroupMoments.empty() for col in CONTINUOUS_METRICS + CATEGORICAL_METRICS}
+    histograms = {col: RankHistogram(lower[col], upper[col], integral[col]) for col in CONTINUOUS_METRICS}
+    sketches = {col: [KLLSketch(seed=i) for i in range(len(SHIPPING_VARIANTS))] for col in CONTINUOUS_METRICS}
+    report = {'initial_rows': 0, 'cleaned_rows': 0, 'removed_rows': 0,
+              'removed_outliers': dict.fromkeys(CONTINUOUS_METRICS, 0)}
+    for chunk in chunks:
+        report['initial_rows'] += len(chunk)
+        present = chunk.dropna(subset=CONTINUOUS_METRICS)
+        values = present[CONTINUOUS_METRICS]
+        flagged = (values < lower) | (values > upper)
+        for col, n in flagged.sum().items():
+            report['removed_outliers'][col] += int(n)
+        cleaned = present[~flagged.any(axis=1).to_numpy()]
+        report['cleaned_rows'] += len(cleaned)
+        if cleaned.empty:
+            continue
+
+        for col, chunk_moments in frame_moments(cleaned).items():
+            moments[col] = moments[col].merge(chunk_moments)
+        codes = pd.Categorical(cleaned['shipping_variant'], categories=SHIPPING_VARIANTS).codes.astype(np.int64)
+        for col in CONTINUOUS_METRICS:
+            column = cleaned[col].to_numpy(dtype=np.float64)
+            histograms[col].update(column, codes)
+            for i, sketch in enumerate(sketches[col]):
+                sketch.update(column[codes == i])
+    report['removed_rows'] = report['initial_rows'] - report['cleaned_rows']
+    return moments, histograms, sketches, report
+
+def run_out_of_core(chunks=None, budget=MEMORY_BUDGET, alpha=ALPHA):
+    """run_multivariate_ab_test's results table, plot summaries and clean_data's report, out of core.
+
+    chunks is a callable returning a fresh iterable of analysis frames (it is called once per pass);
+    by default the analysis query is streamed in chunks sized to budget.
+    Returns (results, plot summaries, report).
+    """
+    chunks = chunks or (lambda: iter_analysis_chunks(chunk_rows_for(budget)))
+    lower, upper, integral = out_of_core_bounds(chunks())
+    moments, histograms, sketches, report = out_of_core_state(chunks(), lower, upper, integral)
+
+    results = []
+    plots = []
+    for col in CONTINUOUS_METRICS:
+        m = moments[col]
+        if (m.by_variant().n > 0).sum() < 2:
+            print(f"Not enough groups for {col} to run test.")
+            continue
+        _, bartlett_p = bartlett(m)
+        assumptions_met = bool(bartlett_p > alpha and all(p is not None and p > alpha for _, p in normality(m).values()))
+        if assumptions_met:
+            if (m.n.sum(axis=0) > 0).sum() > 1:
+                statistic, p_value, eta_squared = ancova(m)
+                test_used = 'ANCOVA'
+            else:
+                statistic, p_value, eta_squared = anova(m)
+                test_used = 'ANOVA'
+            posthoc = tukey_hsd(m, alpha) if p_value < alpha else {}
+        else:
+            statistic, p_value = histograms[col].kruskal()
+            test_used = 'Kruskal-Wallis'
+            eta_squared = np.nan
+            posthoc = histograms[col].dunn() if p_value < alpha else {}
+        results.append({
+            'Metric': col,
+            'Test Used': test_used,
+            'Statistic': statistic,
+            'p-value': p_value,
+            'Significant': p_value < alpha,
+            'Effect Size (η²)': eta_squared,
+            'Posthoc Results': posthoc,
+            'Assumptions Met': assumptions_met,
+            'Assumption Check': 'moments',
+        })
+        plots.append(_box_summary(col, sketches[col], lower[col], upper[col]))
+
+    for col in CATEGORICAL_METRICS:
+        variants = SHIPPING_VARIANTS[moments[col].by_variant().n > 0]
+        result = {'Metric': col, **analyze_table(contingency_table(moments[col]), list(variants), alpha=alpha)}
+        result.update({'Effect Size (η²)': np.nan, 'Assumptions Met': True, 'Assumption Check': None})
+        results.append(result)
+        plots.append(_proportion_summary(col, moments[col]))
+    return pd.DataFrame(results), plots, report
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+PLOT_DPI = 300
+FIGSIZE = (10, 6)
+# Outliers drawn per variant; beyond this an evenly spaced subset of the sorted outliers is kept
+MAX_FLIERS = 200
+MANIFEST_FILE = 'diagnostic_plots.json'
+
+def box_summary(df, col, variant_col='shipping_variant'):
+    """Boxplot statistics per variant (as matplotlib's Axes.bxp takes them), instead of the raw rows."""
+    stats = []
+    for variant in sorted(df[variant_col].unique()):
+        values = np.sort(np.asarray(df.loc[df[variant_col] == variant, col], dtype=np.float64))
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            continue
+        q1, med, q3 = np.percentile(values, [25, 50, 75])
+        iqr = q3 - q1
+        inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+        fliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+        if len(fliers) > MAX_FLIERS:
+            fliers = fliers[np.linspace(0, len(fliers) - 1, MAX_FLIERS).astype(int)]
+        stats.append({
+            'label': str(variant),
+            'q1': float(q1), 'med': float(med), 'q3': float(q3),
+            'whislo': float(inside.min()), 'whishi': float(inside.max()),
+            'fliers': fliers.tolist(),
+        })
+    return {'kind': 'box', 'metric': col, 'stats': stats}
+
+def proportion_summary(df, col, variant_col='shipping_variant'):
+    """Share of 1s per variant, i.e. the bar heights of the old seaborn barplot."""
+    means = df.groupby(variant_col, observed=True)[col].mean().sort_index()
+    return {
+        'kind': 'proportion',
+        'metric': col,
+        'labels': [str(v) for v in means.index],
+        'values': [float(v) for v in means.to_numpy()],
+    }
+
+def plot_key(summary, dpi=PLOT_DPI, figsize=FIGSIZE):
+    """Fingerprint of the plotted data and the plot spec; an unchanged key means an unchanged image."""
+    spec = {'summary': summary, 'dpi': dpi, 'figsize': list(figsize)}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+def render_plot(summary, path, dpi=PLOT_DPI, figsize=FIGSIZE):
+    # Figure + Agg canvas directly: no pyplot global state, so safe off the main thread too
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    label = summary['metric']
+    if summary['kind'] == 'box':
+        ax.bxp(summary['stats'], showfliers=True)
+        ax.set_title(f'Boxplot of {label} by Shipping Variant')
+        ax.set_ylabel(label)
+    else:
+        ax.bar(summary['labels'], summary['values'])
+        ax.set_title(f'{label} by Shipping Variant')
+        ax.set_ylabel('Proportion')
+    ax.set_xlabel('shipping_variant')
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+
+def render_plots(summaries, output_dir='.', dpi=PLOT_DPI, figsize=FIGSIZE):
+    """Write diagnostic_plot_{i}.png for each summary, skipping those whose key is unchanged.
+
+    Returns the list of paths written.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    written = []
+    for i, summary in enumerate(summaries):
+        filename = f'diagnostic_plot_{i}.png'
+        path = os.path.join(output_dir, filename)
+        key = plot_key(summary, dpi, figsize)
+        if manifest.get(filename) == key and os.path.exists(path):
+            continue
+        render_plot(summary, path, dpi, figsize)
+        manifest[filename] = key
+        written.append(path)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return written
+
+def render_plots_in_background(summaries, output_dir='.', dpi=PLOT_DPI, figsize=FIGSIZE):
+    """Start render_plots in a separate process; returns (executor, future).
+
+    Only the small summaries cross the process boundary. Shut the executor down once the future is done.
+    """
+    executor = ProcessPoolExecutor(max_workers=1)
+    return executor, executor.submit(render_plots, summaries, output_dir, dpi, figsize)
@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from contingency import analyze_table, sql_count_table
+from db_connection import cursor, fetch_all
+from metrics import SHIPPING_VARIANTS
+from queries import ANALYSIS_SOURCE
+from sketches import iqr_fences
+from sufficient_stats import ALPHA, CATEGORICAL_METRICS, CONTINUOUS_METRICS, run_sufficient_stats_tests, sql_moments
+
+# Pushdown analysis: MySQL does every pass over the rows and only aggregates come back.
+# The analysis query runs once, into a temporary table that every aggregate below reads.
+#   quartiles -> ROW_NUMBER() over each continuous metric, reading the order statistics
+#                DataFrame.quantile interpolates between (so the fences match clean_data's);
+#   moments   -> sql_moments over the rows inside the fences, tested by run_sufficient_stats_tests;
+#   ranks     -> per-variant midrank sums from a RANK() window, for Kruskal-Wallis and Dunn
+#                when the moment checks reject ANCOVA (exact, as ranks.kruskal on the rows);
+#   counts    -> sql_count_table per categorical metric over the same rows, tested by analyze_table.
+# Bartlett stands in for Levene and D'Agostino-Pearson for Shapiro-Wilk in the assumption gate.
+# No box plots: they would need the rows.
+
+QUARTILES = (0.25, 0.75)
+TEMPORARY_TABLE = 'pushdown_analysis'
+
+@contextmanager
+def materialized_analysis(table=TEMPORARY_TABLE):
+    """fetch(query, params) on one connection holding the analysis query's rows in a temporary table.
+
+    Temporary tables are private to their connection, so every query goes through the same cursor.
+    """
+    with cursor() as cur:
+        cur.execute(f"CREATE TEMPORARY TABLE {table} AS SELECT * FROM {ANALYSIS_SOURCE}")
+
+        def fetch(query, params=None):
+            cur.execute(query, params)
+            return cur.fetchall()
+
+        try:
+            yield fetch
+        finally:
+            # The connection goes back to the pool, which would otherwise keep the table alive
+            cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+
+def _present(metrics):
+    return " AND ".join(f"{col} IS NOT NULL" for col in metrics)
+
+def _in_bounds(bounds):
+    return " AND ".join(f"{col} BETWEEN %s AND %s" for col in bounds)
+
+def sql_quartiles(metrics=CONTINUOUS_METRICS, probabilities=QUARTILES, source=ANALYSIS_SOURCE, fetch=fetch_all):
+    """Quantile frame (as DataFrame.quantile returns it) over rows with every metric present, ranked in MySQL."""
+    ((n,),) = fetch(f"SELECT COUNT(*) FROM {source} WHERE {_present(metrics)}")
+    positions = np.asarray(probabilities, dtype=np.float64) * (n - 1)
+    low, high = np.floor(positions).astype(np.int64), np.ceil(positions).astype(np.int64)
+    ranks = sorted({int(rank) + 1 for rank in np.concatenate([low, high])})
+    quartiles = {}
+    for col in metrics:
+        if n == 0:
+            quartiles[col] = np.full(len(positions), np.nan)
+            continue
+        rows = fetch(
+            f"""
+            SELECT rn, value FROM (
+                SELECT {col} AS value, ROW_NUMBER() OVER (ORDER BY {col}) AS rn
+                FROM {source} WHERE {_present(metrics)}
+            ) ranked WHERE rn IN ({", ".join(["%s"] * len(ranks))})
+            """,
+            tuple(ranks),
+        )
+        value = {int(rn): float(v) for rn, v in rows}
+        below = np.array([value[rank + 1] for rank in low])
+        above = np.array([value[rank + 1] for rank in high])
+        quartiles[col] = below + (positions - low) * (above - below)
+    return pd.DataFrame(quartiles, index=list(probabilities))
+
+def sql_clean_report(lower, upper, metrics=CONTINUOUS_METRICS, source=ANALYSIS_SOURCE, fetch=fetch_all):
+    """clean_data's report for the given fences, counted in MySQL."""
+    in_range = [f"{col} BETWEEN %s AND %s" for col in metrics]
+    flagged = [f"SUM({_present(metrics)} AND NOT {condition})" for condition in in_range]
+    bounds = tuple(float(v) for col in metrics for v in (lower[col], upper[col]))
+    ((initial, cleaned, *outliers),) = fetch(
+        f"""
+        SELECT COUNT(*), SUM({_present(metrics)} AND {" AND ".join(in_range)}), {", ".join(flagged)}
+        FROM {source}
+        """,
+        bounds + bounds,
+    )
+    # SUM comes back as DECIMAL, and NULL over no rows
+    return {
+        'initial_rows': int(initial),
+        'cleaned_rows': int(cleaned or 0),
+        'removed_rows': int(initial) - int(cleaned or 0),
+        'removed_outliers': {col: int(n or 0) for col, n in zip(metrics, outliers)},
+    }
+
+def sql_rank_sums(col, bounds, source=ANALYSIS_SOURCE, fetch=fetch_all):
+    """(midrank sums, sizes, sum of t^3 - t over ties) per variant in SHIPPING_VARIANTS order, ranked in MySQL
+    over the rows inside bounds: what ranks.kruskal_from_rank_sums and dunn_from_rank_sums take."""
+    rows = fetch(
+        f"""
+        SELECT shipping_variant, COUNT(*), SUM(midrank), SUM(ties * ties - 1) FROM (
+            SELECT shipping_variant,
+                   RANK() OVER (ORDER BY {col}) + (COUNT(*) OVER (PARTITION BY {col}) - 1) / 2.0 AS midrank,
+                   COUNT(*) OVER (PARTITION BY {col}) AS ties
+            FROM {source} WHERE {_in_bounds(bounds)}
+        ) ranked GROUP BY shipping_variant
+        """,
+        tuple(float(v) for bound in bounds.values() for v in bound),
+    )
+    sums = np.zeros(len(SHIPPING_VARIANTS))
+    n = np.zeros(len(SHIPPING_VARIANTS))
+    # Each row of a tie of t adds t^2 - 1, so the groups together add t^3 - t per tied value
+    tie_sum = 0.0
+    for variant, count, rank_sum, ties in rows:
+        i = list(SHIPPING_VARIANTS).index(variant)
+        n[i], sums[i] = int(count), float(rank_sum)
+        tie_sum += float(ties)
+    return sums, n, tie_sum
+
+def _proportion_summary(col, table, variants):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = table[1] / table.sum(axis=0)
+    return {'kind': 'proportion', 'metric': col, 'labels': [str(v) for v in variants],
+            'values': [float(v) for v in rates]}
+
+def run_pushdown(alpha=ALPHA):
+    """run_multivariate_ab_test's results table, plot summaries and clean_data's report from aggregate queries.
+
+    Only the categorical metrics get plot summaries (proportions, from their count tables).
+    Returns (results, plot summaries, report).
+    """
+    with materialized_analysis() as fetch:
+        source = TEMPORARY_TABLE
+        lower, upper = iqr_fences(sql_quartiles(source=source, fetch=fetch))
+        bounds = {col: (float(lower[col]), float(upper[col])) for col in CONTINUOUS_METRICS}
+        report = sql_clean_report(lower, upper, source=source, fetch=fetch)
+
+        results = run_sufficient_stats_tests(
+            sql_moments(CONTINUOUS_METRICS, bounds, source=source, fetch=fetch), categorical_metrics=[], alpha=alpha,
+            rank_sums=lambda col: sql_rank_sums(col, bounds, source, fetch),
+        )
+        results['Assumption Check'] = 'moments'
+        rows = results.to_dict('records')
+        plots = []
+        for col in CATEGORICAL_METRICS:
+            table, variants = sql_count_table(col, bounds=bounds, source=source, fetch=fetch)
+            result = {'Metric': col, **analyze_table(table, variants, alpha=alpha)}
+            result.update({'Effect Size (η²)': np.nan, 'Assumptions Met': True, 'Assumption Check': None})
+            rows.append(result)
+            plots.append(_proportion_summary(col, table, variants))
+    return pd.DataFrame(rows), plots, report
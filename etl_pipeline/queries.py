@@ -0,0 +1,108 @@
+# Per-order analysis dataset for the A/B test.
+#
+# repurchase_in_30_days: does the same user have a strictly later order within 30 days?
+# Computed with a window over each user's orders (served by idx_orders_user_date) instead of a
+# correlated EXISTS per order. DATETIME has second precision, so a frame starting one second
+# ahead is "strictly later"; ties on order_date are handled exactly as the EXISTS did.
+#
+# {changed_ctes}, {user_filter} and {order_filter} let the incremental refresh restrict the
+# query to changed orders while the window still sees the affected users' full history.
+ANALYSIS_QUERY_TEMPLATE = """
+WITH {changed_ctes}user_orders AS(
+SELECT
+    o.order_id,
+    o.user_id,
+    o.order_date,
+    o.total_value,
+    o.order_status,
+    CASE WHEN COUNT(*) OVER (
+        PARTITION BY o.user_id
+        ORDER BY o.order_date
+        RANGE BETWEEN INTERVAL 1 SECOND FOLLOWING AND INTERVAL {repurchase_days} DAY FOLLOWING
+    ) > 0 THEN 1 ELSE 0 END AS repurchase_in_30_days
+FROM orders o{user_filter}),
+
+order_metrics AS(
+SELECT
+    o.order_id,
+    CASE 
+        WHEN MOD(o.order_id, 3) = 0 THEN '24h'
+        WHEN MOD(o.order_id, 3) = 1 THEN '48h'
+        WHEN MOD(o.order_id, 3) = 2 THEN '72h'
+        END AS shipping_variant,
+    o.total_value AS order_value,
+    o.order_status,
+    r.satisfaction,
+    r.delivery_rating,
+    l.expected_delivery,
+    l.actual_delivery,
+    o.user_id,
+    QUARTER(o.order_date) AS quarter,
+    o.repurchase_in_30_days
+FROM user_orders o
+LEFT JOIN reviews r ON o.order_id = r.order_id
+LEFT JOIN logistics l ON o.order_id = l.order_id)
+
+SELECT
+    order_id,
+    shipping_variant,
+    order_value,
+    satisfaction,
+    delivery_rating,
+    CASE WHEN order_status = 'cancelled' THEN 1 ELSE 0 END AS cancellation,
+    CASE WHEN actual_delivery <= expected_delivery THEN 1 ELSE 0 END AS on_time_delivery,
+    repurchase_in_30_days,
+    quarter
+FROM order_metrics{order_filter}
+"""
+
+REPURCHASE_DAYS = 30
+
+ANALYSIS_QUERY = ANALYSIS_QUERY_TEMPLATE.format(
+    changed_ctes="", user_filter="", order_filter="", repurchase_days=REPURCHASE_DAYS
+)
+# FROM clause reading the analysis query as a derived table; pushdown.py swaps in a temporary table
+ANALYSIS_SOURCE = f"({ANALYSIS_QUERY}) analysis"
+
+# Orders whose analysis row may differ since the last refresh, given the previous watermarks:
+# new orders, orders that gained logistics or reviews (however late they arrive), and earlier
+# orders of the same users whose repurchase flag a new order can flip.
+CHANGED_ORDERS_CTES = """new_orders AS(
+SELECT order_id, user_id, order_date
+FROM orders
+WHERE order_id > %(max_order_id)s),
+
+changed_orders AS(
+SELECT order_id FROM new_orders
+UNION
+SELECT order_id FROM logistics WHERE logistics_id > %(max_logistics_id)s
+UNION
+SELECT order_id FROM reviews WHERE review_id > %(max_review_id)s
+UNION
+SELECT o.order_id
+FROM orders o
+JOIN (SELECT user_id, MIN(order_date) AS first_new FROM new_orders GROUP BY user_id) n
+    ON o.user_id = n.user_id
+    AND o.order_date >= n.first_new - INTERVAL {repurchase_days} DAY),
+
+changed_users AS(
+SELECT DISTINCT o.user_id
+FROM orders o
+JOIN changed_orders c ON o.order_id = c.order_id),
+
+"""
+
+INCREMENTAL_ANALYSIS_QUERY = ANALYSIS_QUERY_TEMPLATE.format(
+    changed_ctes=CHANGED_ORDERS_CTES.format(repurchase_days=REPURCHASE_DAYS),
+    user_filter="\nWHERE o.user_id IN (SELECT user_id FROM changed_users)",
+    order_filter="\nWHERE order_id IN (SELECT order_id FROM changed_orders)",
+    repurchase_days=REPURCHASE_DAYS,
+)
+
+WATERMARK_QUERY = """
+SELECT
+    (SELECT COALESCE(MAX(order_id), 0) FROM orders),
+    (SELECT COALESCE(MAX(logistics_id), 0) FROM logistics),
+    (SELECT COALESCE(MAX(review_id), 0) FROM reviews),
+    (SELECT COUNT(*) FROM orders)
+"""
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Integer metrics spanning fewer values than this are counted with one bincount (O(n));
+# anything else goes through np.unique (a sort), which gives the same table
+MAX_HISTOGRAM_VALUES = 1024
+
+# Rank tests here work on a counts table: one row per distinct value (ascending), one column per
+# group. Midranks and tie corrections come from the row totals, so Kruskal-Wallis and Dunn share
+# one pass over the data however many rows tie. Both reduce the table to per-group midrank sums,
+# group sizes and the tie sum, which is also all a RANK() window in MySQL has to return (pushdown.py).
+
+def rank_counts(groups, max_values=MAX_HISTOGRAM_VALUES):
+    """Counts table (distinct values x groups) for a list of value arrays; NaNs are skipped."""
+    groups = [np.asarray(g, dtype=np.float64) for g in groups]
+    groups = [g[~np.isnan(g)] for g in groups]
+    values = np.concatenate(groups)
+    codes = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+    k = len(groups)
+    if len(values) == 0:
+        return np.zeros((0, k), dtype=np.int64)
+
+    low, high = values.min(), values.max()
+    if high - low < max_values and np.array_equal(values, np.floor(values)):
+        index = (values - low).astype(np.int64)
+        size = int(high - low) + 1
+    else:
+        _, index = np.unique(values, return_inverse=True)
+        size = int(index.max()) + 1
+    counts = np.bincount(index * k + codes, minlength=size * k).reshape(size, k)
+    return counts[counts.sum(axis=1) > 0]
+
+def _midranks(counts):
+    ties = counts.sum(axis=1)
+    return np.cumsum(ties) - ties + (ties + 1) / 2, ties
+
+def _rank_sums(counts):
+    midranks, ties = _midranks(counts)
+    return midranks @ counts, counts.sum(axis=0), float((ties ** 3 - ties).sum())
+
+def kruskal_from_rank_sums(rank_sums, n, tie_sum):
+    """kruskal from per-group midrank sums, group sizes and the sum of t^3 - t over tied values."""
+    from scipy import stats
+
+    rank_sums, n = np.asarray(rank_sums, dtype=np.float64), np.asarray(n, dtype=np.float64)
+    rank_sums, n = rank_sums[n > 0], n[n > 0]
+    total = n.sum()
+    h = 12 / (total * (total + 1)) * (rank_sums ** 2 / n).sum() - 3 * (total + 1)
+    correction = 1 - tie_sum / (total ** 3 - total)
+    h = h / correction if correction > 0 else np.nan
+    return h, stats.chi2.sf(h, len(n) - 1)
+
+def dunn_from_rank_sums(rank_sums, n, tie_sum):
+    """dunn from per-group midrank sums, group sizes and the sum of t^3 - t over tied values."""
+    from scipy import stats
+
+    rank_sums, n = np.asarray(rank_sums, dtype=np.float64), np.asarray(n, dtype=np.float64)
+    total = n.sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_ranks = rank_sums / n
+        variance = total * (total + 1) / 12 - tie_sum / (12 * (total - 1))
+        z = np.abs(mean_ranks[:, None] - mean_ranks[None, :]) / np.sqrt(variance * (1 / n[:, None] + 1 / n[None, :]))
+    p_values = 2 * stats.norm.sf(z)
+    np.fill_diagonal(p_values, 1.0)
+    return p_values
+
+def kruskal(counts):
+    """Kruskal-Wallis H with tie correction and its chi-squared p-value, as scipy.stats.kruskal."""
+    return kruskal_from_rank_sums(*_rank_sums(counts))
+
+def dunn(counts):
+    """Dunn's pairwise z-test p-values (unadjusted, as scikit-posthocs' posthoc_dunn) as a groups x groups matrix."""
+    return dunn_from_rank_sums(*_rank_sums(counts))
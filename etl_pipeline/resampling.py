@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+
+N_BOOTSTRAP = 2000
+N_PERMUTATIONS = 1000
+CONFIDENCE = 0.95
+# Bytes a single batch of resamples may use; batches are sized to fit
+MEMORY_BUDGET = int(float(os.getenv('RESAMPLING_MEMORY_MB', '256')) * 1024 ** 2)
+# Up to this many distinct values a group is resampled as multinomial counts over them
+MAX_MULTINOMIAL_VALUES = 1000
+# Above this many rows, continuous groups use Poisson weights streamed over row chunks
+MAX_INDEX_ROWS = 100_000
+POISSON_CHUNK_ROWS = 65_536
+METHODS = ('auto', 'index', 'multinomial', 'poisson')
+
+def _batch_sizes(total, per_resample_bytes, budget=MEMORY_BUDGET):
+    size = max(1, min(total, budget // max(per_resample_bytes, 1)))
+    return [min(size, total - start) for start in range(0, total, size)]
+
+# Batch kernels: each returns the bootstrap means of one batch
+
+def _index_batch(values, size, seed):
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, len(values), (size, len(values)))
+    return values[indices].mean(axis=1)
+
+def _multinomial_batch(distinct, probabilities, n, size, seed):
+    rng = np.random.default_rng(seed)
+    counts = rng.multinomial(n, probabilities, size=size)
+    return counts @ distinct / n
+
+def _poisson_batch(values, size, seed, chunk_rows):
+    # Poisson(1) weight per row and resample, accumulated over row chunks so memory is size x chunk_rows
+    rng = np.random.default_rng(seed)
+    weighted = np.zeros(size)
+    weights = np.zeros(size)
+    for start in range(0, len(values), chunk_rows):
+        chunk = values[start:start + chunk_rows]
+        w = rng.poisson(1.0, (size, len(chunk)))
+        weighted += w @ chunk
+        weights += w.sum(axis=1)
+    return weighted / np.maximum(weights, 1)
+
+def _run_batch(task):
+    # Tasks carry their own data, so one pool can run batches of any metric and variant
+    method, size, seed, extra = task
+    if method == 'multinomial':
+        return _multinomial_batch(*extra, size, seed)
+    if method == 'index':
+        return _index_batch(extra, size, seed)
+    values, chunk_rows = extra
+    return _poisson_batch(values, size, seed, chunk_rows)
+
+def choose_method(values):
+    distinct = np.unique(values)
+    if len(distinct) <= MAX_MULTINOMIAL_VALUES:
+        return 'multinomial'
+    return 'index' if len(values) <= MAX_INDEX_ROWS else 'poisson'
+
+def bootstrap_tasks(values, n_resamples=N_BOOTSTRAP, method='auto', seed=0, budget=MEMORY_BUDGET):
+    """Memory-bounded batches for bootstrap_means, as picklable tasks for _run_batch.
+
+    Batches and their seeds depend only on the inputs and the budget, so the means are the
+    same whether the tasks run in process or on a pool of any size.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if method not in METHODS:
+        raise ValueError(f"Unknown bootstrap method {method!r}; expected one of {METHODS}.")
+    if method == 'auto':
+        method = choose_method(values)
+
+    n = len(values)
+    if method == 'multinomial':
+        distinct, counts = np.unique(values, return_counts=True)
+        extra = (distinct, counts / n, n)
+        sizes = _batch_sizes(n_resamples, 16 * len(distinct), budget)
+    elif method == 'index':
+        extra = values
+        sizes = _batch_sizes(n_resamples, 16 * n, budget)
+    else:
+        chunk_rows = max(1, min(n, POISSON_CHUNK_ROWS))
+        extra = (values, chunk_rows)
+        sizes = _batch_sizes(n_resamples, 16 * chunk_rows, budget)
+
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = root.spawn(len(sizes))
+    return [(method, size, s, extra) for size, s in zip(sizes, seeds)]
+
+def bootstrap_means(values, n_resamples=N_BOOTSTRAP, method='auto', seed=0, executor=None, budget=MEMORY_BUDGET):
+    """n_resamples bootstrap means of values, generated in memory-bounded batches (on executor if given)."""
+    tasks = bootstrap_tasks(values, n_resamples, method, seed, budget)
+    if executor is not None and len(tasks) > 1:
+        return np.concatenate(list(executor.map(_run_batch, tasks)))
+    return np.concatenate([_run_batch(task) for task in tasks])
+
+def difference_ci(means_a, means_b, confidence=CONFIDENCE):
+    """Percentile interval for mean(a) - mean(b) from independent bootstrap means."""
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means_a - means_b, [tail, 100 - tail])
+    return float(low), float(high)
+
+def _group_sums(labels, values, k):
+    # Per-row group sums for a (resamples x rows) label matrix via one offset bincount
+    rows = labels.shape[0]
+    offsets = labels + (np.arange(rows) * k)[:, None]
+    return np.bincount(offsets.ravel(), np.broadcast_to(values, labels.shape).ravel(), rows * k).reshape(rows, k)
+
+def _between_ss(labels, values, counts, chunk_rows):
+    # Group sums accumulated over column chunks, so the working set is resamples x chunk_rows
+    k = len(counts)
+    sums = np.zeros((labels.shape[0], k))
+    for start in range(0, labels.shape[1], chunk_rows):
+        sums += _group_sums(labels[:, start:start + chunk_rows], values[start:start + chunk_rows], k)
+    return (sums ** 2 / counts).sum(axis=1)
+
+def _permutation_batch(task):
+    # Number of permutations in the batch whose between-group SS reaches the observed one
+    size, seed, values, codes, threshold, chunk_rows = task
+    counts = np.bincount(codes)
+    labels = np.tile(codes, (size, 1))
+    np.random.default_rng(seed).permuted(labels, axis=1, out=labels)
+    return int((_between_ss(labels, values, counts, chunk_rows) >= threshold).sum())
+
+def permutation_tasks(values, codes, n_resamples=N_PERMUTATIONS, seed=0, budget=MEMORY_BUDGET):
+    """(between-group SS across codes, memory-bounded batches for _permutation_batch).
+
+    A batch holds its shuffled labels (the smallest integer dtype for the groups) plus two
+    float64/int64 cells per label in each row chunk. One permutation needs a full row of labels,
+    so inputs whose row alone does not fit the budget are rejected rather than run over it.
+    """
+    # Centred, so the group sums give the between-group SS with no grand-mean term to cancel
+    values = np.asarray(values, dtype=np.float64)
+    values = values - values.mean()
+    codes = np.asarray(codes)
+    k = int(codes.max()) + 1
+    codes = codes.astype(np.min_scalar_type(k - 1))
+    counts = np.bincount(codes, minlength=k)
+    chunk_rows = max(1, min(len(values), POISSON_CHUNK_ROWS))
+    per_resample = codes.itemsize * len(values) + 16 * chunk_rows
+    if per_resample > budget:
+        raise ValueError(
+            f"One permutation of {len(values):,} rows needs {per_resample:,} bytes, over the "
+            f"{budget:,} byte budget; raise RESAMPLING_MEMORY_MB."
+        )
+    observed = _between_ss(codes[None, :], values, counts, chunk_rows)[0]
+    # Ties with the observed statistic count, up to rounding in the sums
+    threshold = observed - 1e-12 * abs(observed)
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    sizes = _batch_sizes(n_resamples, per_resample, budget)
+    return observed, [(size, s, values, codes, threshold, chunk_rows) for size, s in zip(sizes, root.spawn(len(sizes)))]
+
+def permutation_test(values, labels, n_resamples=N_PERMUTATIONS, seed=0, budget=MEMORY_BUDGET, executor=None):
+    """Omnibus permutation test of equal means across groups: (between-group SS, p-value).
+
+    The between-group sum of squares orders permutations exactly as the ANOVA F does. Batches run
+    on executor if given, with the same result as in process.
+    """
+    _, codes = np.unique(np.asarray(labels), return_inverse=True)
+    observed, tasks = permutation_tasks(values, codes, n_resamples, seed, budget)
+    if executor is not None and len(tasks) > 1:
+        at_least = sum(executor.map(_permutation_batch, tasks))
+    else:
+        at_least = sum(_permutation_batch(task) for task in tasks)
+    return observed, (at_least + 1) / (n_resamples + 1)
+
+def resampling_test(groups, n_bootstrap=N_BOOTSTRAP, n_permutations=N_PERMUTATIONS, confidence=CONFIDENCE,
+                    method='auto', seed=0, executor=None):
+    """Permutation p-value across variants plus bootstrap CIs of every pairwise mean difference.
+
+    groups maps variant -> values. With an executor, the permutation batches and every variant's
+    bootstrap batches are all queued on it at once, and the pool is left open for the next metric.
+    Returns (statistic, p-value, {(v1, v2): (difference, low, high)}).
+    """
+    variants = list(groups)
+    values = [np.asarray(groups[v], dtype=np.float64) for v in variants]
+    values = [v[~np.isnan(v)] for v in values]
+    labels = np.repeat(np.arange(len(variants)), [len(v) for v in values])
+
+    # One independent stream per variant, whatever the other variants are
+    streams = np.random.SeedSequence(seed).spawn(len(variants))
+    tasks = [bootstrap_tasks(v, n_bootstrap, method, s) for v, s in zip(values, streams)]
+    statistic, permutations = permutation_tasks(np.concatenate(values), labels, n_permutations, seed)
+    if executor is not None:
+        pending = [[executor.submit(_run_batch, task) for task in batches] for batches in tasks]
+        permuted = [executor.submit(_permutation_batch, task) for task in permutations]
+        at_least = sum(future.result() for future in permuted)
+        means = [np.concatenate([future.result() for future in futures]) for futures in pending]
+    else:
+        at_least = sum(_permutation_batch(task) for task in permutations)
+        means = [np.concatenate([_run_batch(task) for task in batches]) for batches in tasks]
+    p_value = (at_least + 1) / (n_permutations + 1)
+    intervals = {}
+    for i in range(len(variants)):
+        for j in range(i + 1, len(variants)):
+            low, high = difference_ci(means[i], means[j], confidence)
+            intervals[(variants[i], variants[j])] = (float(values[i].mean() - values[j].mean()), low, high)
+    return statistic, p_value, intervals
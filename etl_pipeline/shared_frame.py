@@ -0,0 +1,48 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+def share_frame(df, columns=None):
+    """Copy df's columns into one shared memory block; returns (block, spec) for attach_frame.
+
+    The caller owns the block and must close() and unlink() it once workers are done.
+    Categorical (and string) columns travel as codes plus their categories.
+    """
+    layout = []
+    arrays = []
+    offset = 0
+    for name in columns or df.columns:
+        series = df[name]
+        categories = None
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series.dtype):
+            series = series.astype('category')
+            categories = series.cat.categories.tolist()
+            values = series.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+        # 8-byte aligned, so every column can be viewed in place
+        offset = -(-offset // 8) * 8
+        layout.append((name, values.dtype.str, len(values), offset, categories))
+        arrays.append(values)
+        offset += values.nbytes
+
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (_, dtype, length, start, _), values in zip(layout, arrays):
+        np.ndarray(length, dtype=dtype, buffer=block.buf, offset=start)[:] = values
+    return block, {'name': block.name, 'columns': layout}
+
+def attach_frame(spec):
+    """DataFrame viewing the shared block described by spec; returns (block, df).
+
+    Keep the block referenced (and close() it) for as long as df is in use.
+    """
+    # Pool workers share their parent's resource tracker, so attaching does not take ownership
+    block = shared_memory.SharedMemory(name=spec['name'])
+    data = {}
+    for name, dtype, length, start, categories in spec['columns']:
+        values = np.ndarray(length, dtype=dtype, buffer=block.buf, offset=start)
+        if categories is not None:
+            values = pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(categories), validate=False)
+        data[name] = values
+    return block, pd.DataFrame(data, copy=False)
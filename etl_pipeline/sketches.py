@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# Compactor size of the top KLL level; rank error is roughly 1.7 / KLL_K (under 1% at 200)
+KLL_K = 200
+# Each level below the top holds this fraction of the one above it
+KLL_DECAY = 2 / 3
+IQR_MULTIPLIER = 1.5
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang & Liberty) in O(k log(n / k)) memory.
+
+    Level h holds items of weight 2**h. A level over capacity is sorted and every other item,
+    from a random offset, is promoted to the next level. Sketches built over separate chunks or
+    shards merge into the sketch of their union; until the first compaction it is exact.
+    """
+
+    def __init__(self, k=KLL_K, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * KLL_DECAY ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind at its weight
+                leftover, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add a batch of values (NaNs skipped); returns self."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one; returns self."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    @property
+    def exact(self):
+        return len(self.levels) == 1
+
+    def quantile(self, q):
+        """Quantile(s) q in [0, 1]: exact (linear interpolation) until compaction, then within the rank error."""
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+        if self.exact:
+            return np.quantile(self.levels[0], q)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side='left').clip(0, len(items) - 1)
+        result = items[index]
+        return np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+
+def sketch_columns(chunks, columns, k=KLL_K, seed=0):
+    """{column: KLLSketch} over an iterable of frames (or dicts of arrays), one chunk at a time."""
+    sketches = {col: KLLSketch(k, seed) for col in columns}
+    for chunk in chunks:
+        for col in columns:
+            sketches[col].update(chunk[col])
+    return sketches
+
+def sketch_quartiles(sketches):
+    """Quartile frame (as DataFrame.quantile returns it) from {column: KLLSketch}."""
+    return pd.DataFrame({col: sketch.quantile([0.25, 0.75]) for col, sketch in sketches.items()}, index=[0.25, 0.75])
+
+def iqr_fences(quartiles, multiplier=IQR_MULTIPLIER):
+    """(lower, upper) Series per column from a frame indexed by the 0.25 and 0.75 quantiles."""
+    q1, q3 = quartiles.loc[0.25], quartiles.loc[0.75]
+    iqr = q3 - q1
+    return q1 - multiplier * iqr, q3 + multiplier * iqr
@@ -0,0 +1,338 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from contingency import analyze_table
+from db_connection import fetch_all
+from metrics import SHIPPING_VARIANTS
+from queries import ANALYSIS_SOURCE
+from ranks import dunn_from_rank_sums, kruskal_from_rank_sums
+
+QUARTERS = np.array([1, 2, 3, 4])
+CONTINUOUS_METRICS = ['order_value', 'satisfaction', 'delivery_rating']
+CATEGORICAL_METRICS = ['cancellation', 'on_time_delivery', 'repurchase_in_30_days']
+ALPHA = 0.05
+
+class GroupMoments:
+    """Count, mean and central moment sums M2..M4 of one metric per (variant, quarter) cell.
+
+    Everything the parametric and contingency tests need, mergeable across chunks.
+    """
+
+    def __init__(self, n, mean, m2, m3, m4):
+        self.n, self.mean, self.m2, self.m3, self.m4 = (np.asarray(a, dtype=np.float64) for a in (n, mean, m2, m3, m4))
+
+    @classmethod
+    def empty(cls, shape=(len(SHIPPING_VARIANTS), len(QUARTERS))):
+        return cls(*(np.zeros(shape) for _ in range(5)))
+
+    @classmethod
+    def from_values(cls, values, variant_codes, quarter_codes):
+        """Exact two-pass moments; rows with a NaN value are skipped."""
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        values = values[keep]
+        cells = np.asarray(variant_codes)[keep] * len(QUARTERS) + np.asarray(quarter_codes)[keep]
+        size = len(SHIPPING_VARIANTS) * len(QUARTERS)
+
+        n = np.bincount(cells, minlength=size).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, np.bincount(cells, values, size) / n, 0.0)
+        deviations = values - mean[cells]
+        sums = [np.bincount(cells, deviations ** power, size) for power in (2, 3, 4)]
+        shape = (len(SHIPPING_VARIANTS), len(QUARTERS))
+        return cls(*(a.reshape(shape) for a in [n, mean] + sums))
+
+    @classmethod
+    def from_power_sums(cls, n, s1, s2, s3, s4, shift=0.0):
+        """Moments from sums of (x - shift)^k, as a GROUP BY can compute them."""
+        n, s1, s2, s3, s4 = (np.asarray(a, dtype=np.float64) for a in (n, s1, s2, s3, s4))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            d = np.where(n > 0, s1 / n, 0.0)
+        m2 = s2 - n * d ** 2
+        m3 = s3 - 3 * d * s2 + 2 * n * d ** 3
+        m4 = s4 - 4 * d * s3 + 6 * d ** 2 * s2 - 3 * n * d ** 4
+        return cls(n, d + shift, np.maximum(m2, 0.0), m3, np.maximum(m4, 0.0))
+
+    def merge(self, other):
+        """Combine with moments of disjoint rows (Chan et al. / Pébay pairwise update)."""
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            safe_n = np.where(n > 0, n, 1.0)
+            mean = self.mean + delta * nb / safe_n
+            m2 = self.m2 + other.m2 + delta ** 2 * na * nb / safe_n
+            m3 = (self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / safe_n ** 2
+                  + 3 * delta * (na * other.m2 - nb * self.m2) / safe_n)
+            m4 = (self.m4 + other.m4
+                  + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / safe_n ** 3
+                  + 6 * delta ** 2 * (na ** 2 * other.m2 + nb ** 2 * self.m2) / safe_n ** 2
+                  + 4 * delta * (na * other.m3 - nb * self.m3) / safe_n)
+        return GroupMoments(n, np.where(n > 0, mean, 0.0), m2, m3, m4)
+
+    def by_variant(self):
+        """Moments per variant, pooled over quarters."""
+        pooled = GroupMoments(*(a[:, 0] for a in self._arrays()))
+        for q in range(1, self.n.shape[1]):
+            pooled = pooled.merge(GroupMoments(*(a[:, q] for a in self._arrays())))
+        return pooled
+
+    def _arrays(self):
+        return self.n, self.mean, self.m2, self.m3, self.m4
+
+    @property
+    def variance(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.m2 / (self.n - 1)
+
+# Accumulation
+
+def _codes(df):
+    variant_codes = pd.Categorical(df['shipping_variant'], categories=SHIPPING_VARIANTS).codes
+    quarter_codes = np.asarray(df['quarter'], dtype=np.int64) - 1
+    if (variant_codes < 0).any():
+        raise ValueError("Unknown shipping_variant in data.")
+    return variant_codes, quarter_codes
+
+def frame_moments(df, metrics=CONTINUOUS_METRICS + CATEGORICAL_METRICS):
+    """{metric: GroupMoments} for an in-memory analysis frame."""
+    variant_codes, quarter_codes = _codes(df)
+    return {col: GroupMoments.from_values(df[col], variant_codes, quarter_codes) for col in metrics}
+
+def accumulate_moments(chunks, metrics=CONTINUOUS_METRICS + CATEGORICAL_METRICS):
+    """{metric: GroupMoments} over an iterable of frames, holding one chunk at a time."""
+    totals = {col: GroupMoments.empty() for col in metrics}
+    for chunk in chunks:
+        for col, moments in frame_moments(chunk, metrics).items():
+            totals[col] = totals[col].merge(moments)
+    return totals
+
+def sql_moments(metrics=CONTINUOUS_METRICS + CATEGORICAL_METRICS, bounds=None, shifts=None,
+                source=ANALYSIS_SOURCE, fetch=fetch_all):
+    """{metric: GroupMoments} computed inside MySQL with GROUP BY shipping_variant, quarter.
+
+    bounds ({metric: (low, high)}, e.g. clean_data's IQR fences) restricts every metric to rows
+    where all bounded metrics are present and in range, as clean_data does. Power sums are taken
+    around shifts (default: the middle of the bounds) to limit cancellation in the higher moments.
+    source is the FROM clause (the analysis query by default) and fetch runs the query.
+    """
+    bounds = bounds or {}
+    shifts = shifts or {col: (low + high) / 2 for col, (low, high) in bounds.items()}
+    select = []
+    params = []
+    for col in metrics:
+        shift = float(shifts.get(col, 0.0))
+        select.append(f"COUNT({col})")
+        select += [f"SUM(POW({col} - %s, {power}))" for power in range(1, 5)]
+        params += [shift] * 4
+    where = [f"{col} BETWEEN %s AND %s" for col in bounds]
+    for low, high in bounds.values():
+        params += [low, high]
+    query = f"""
+    SELECT shipping_variant, quarter, {", ".join(select)}
+    FROM {source}
+    {"WHERE " + " AND ".join(where) if where else ""}
+    GROUP BY shipping_variant, quarter
+    """
+    rows = fetch(query, tuple(params))
+
+    shape = (len(SHIPPING_VARIANTS), len(QUARTERS))
+    sums = np.zeros((len(metrics), 5) + shape)
+    variant_index = {v: i for i, v in enumerate(SHIPPING_VARIANTS)}
+    for variant, quarter, *values in rows:
+        # SUM over integers comes back as DECIMAL, and NULL for all-NULL groups
+        values = np.array([float(v) if v is not None else 0.0 for v in values]).reshape(len(metrics), 5)
+        sums[:, :, variant_index[variant], int(quarter) - 1] = values
+    return {
+        col: GroupMoments.from_power_sums(*sums[i], shift=float(shifts.get(col, 0.0)))
+        for i, col in enumerate(metrics)
+    }
+
+# Tests from moments
+
+def anova(moments):
+    """One-way ANOVA across variants: (F, p, eta squared)."""
+    g = moments.by_variant()
+    present = g.n > 0
+    n, mean, m2 = g.n[present], g.mean[present], g.m2[present]
+    k, total = len(n), n.sum()
+    grand_mean = (n * mean).sum() / total
+    ss_between = (n * (mean - grand_mean) ** 2).sum()
+    ss_within = m2.sum()
+    f_stat = (ss_between / (k - 1)) / (ss_within / (total - k))
+    eta_squared = ss_between / (ss_between + ss_within) if ss_between + ss_within > 0 else np.nan
+    return f_stat, stats.f.sf(f_stat, k - 1, total - k), eta_squared
+
+def _cell_rss(moments, include_variant):
+    # Additive OLS on the raw rows = weighted least squares on the cell means (weights = counts),
+    # plus the within-cell sum of squares that no cell-level model can explain
+    present = moments.n > 0
+    variants, quarters = np.nonzero(present)
+    weights = moments.n[present]
+    columns = [np.ones(len(weights))]
+    columns += [(quarters == q).astype(float) for q in range(1, moments.n.shape[1])]
+    if include_variant:
+        columns += [(variants == v).astype(float) for v in range(1, moments.n.shape[0])]
+    design = np.column_stack(columns)
+    root = np.sqrt(weights)
+    coef, _, rank, _ = np.linalg.lstsq(design * root[:, None], moments.mean[present] * root, rcond=None)
+    residual = moments.mean[present] - design @ coef
+    return (weights * residual ** 2).sum() + moments.m2[present].sum(), rank
+
+def ancova(moments):
+    """Type II F test for variant in y ~ C(shipping_variant) + C(quarter): (F, p, eta squared)."""
+    rss_full, rank_full = _cell_rss(moments, include_variant=True)
+    rss_reduced, rank_reduced = _cell_rss(moments, include_variant=False)
+    df_effect = rank_full - rank_reduced
+    df_resid = moments.n.sum() - rank_full
+    ss_effect = rss_reduced - rss_full
+    f_stat = (ss_effect / df_effect) / (rss_full / df_resid)
+    eta_squared = ss_effect / (ss_effect + rss_full) if ss_effect + rss_full > 0 else np.nan
+    return f_stat, stats.f.sf(f_stat, df_effect, df_resid), eta_squared
+
+def bartlett(moments):
+    """Bartlett's test for equal variances across variants: (statistic, p)."""
+    g = moments.by_variant()
+    present = g.n > 1
+    n, var = g.n[present], g.variance[present]
+    k, total = len(n), n.sum()
+    pooled = ((n - 1) * var).sum() / (total - k)
+    numerator = (total - k) * np.log(pooled) - ((n - 1) * np.log(var)).sum()
+    correction = 1 + (1 / (3 * (k - 1))) * ((1 / (n - 1)).sum() - 1 / (total - k))
+    statistic = numerator / correction
+    return statistic, stats.chi2.sf(statistic, k - 1)
+
+def _skew_z(n, skewness):
+    # D'Agostino's skewness test, as scipy.stats.skewtest
+    y = skewness * np.sqrt((n + 1) * (n + 3) / (6.0 * (n - 2)))
+    beta2 = 3.0 * (n ** 2 + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+    w2 = -1 + np.sqrt(2 * (beta2 - 1))
+    delta = 1 / np.sqrt(0.5 * np.log(w2))
+    alpha = np.sqrt(2.0 / (w2 - 1))
+    y = np.where(y == 0, 1, y)
+    return delta * np.log(y / alpha + np.sqrt((y / alpha) ** 2 + 1))
+
+def _kurtosis_z(n, kurtosis):
+    # Anscombe-Glynn kurtosis test, as scipy.stats.kurtosistest
+    expected = 3.0 * (n - 1) / (n + 1)
+    var_b2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+    x = (kurtosis - expected) / np.sqrt(var_b2)
+    sqrt_beta1 = 6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9)) * np.sqrt(6.0 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3)))
+    a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / sqrt_beta1 ** 2))
+    term1 = 1 - 2 / (9.0 * a)
+    denom = 1 + x * np.sqrt(2 / (a - 4.0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        term2 = np.sign(denom) * np.where(denom == 0.0, np.nan, np.power((1 - 2.0 / a) / np.abs(denom), 1 / 3.0))
+    return (term1 - term2) / np.sqrt(2 / (9.0 * a))
+
+def normality(moments):
+    """D'Agostino-Pearson K^2 per variant from skewness and kurtosis: {variant: (K2, p)}.
+
+    Needs at least 20 rows per variant; smaller variants get (None, None).
+    """
+    g = moments.by_variant()
+    results = {}
+    for variant, n, m2, m3, m4 in zip(SHIPPING_VARIANTS, g.n, g.m2, g.m3, g.m4):
+        if n < 20 or m2 == 0:
+            results[variant] = (None, None)
+            continue
+        skewness = np.sqrt(n) * m3 / m2 ** 1.5
+        kurtosis = n * m4 / m2 ** 2
+        k2 = _skew_z(n, skewness) ** 2 + _kurtosis_z(n, kurtosis) ** 2
+        results[variant] = (k2, stats.chi2.sf(k2, 2))
+    return results
+
+def tukey_hsd(moments, alpha=ALPHA):
+    """Tukey-Kramer pairwise comparisons from the pooled within-variant variance: {(v1, v2): p}."""
+    g = moments.by_variant()
+    present = np.flatnonzero(g.n > 0)
+    k, total = len(present), g.n[present].sum()
+    mse = g.m2[present].sum() / (total - k)
+    posthoc = {}
+    for a, i in enumerate(present):
+        for j in present[a + 1:]:
+            q = abs(g.mean[i] - g.mean[j]) / np.sqrt(mse / 2 * (1 / g.n[i] + 1 / g.n[j]))
+            posthoc[(SHIPPING_VARIANTS[i], SHIPPING_VARIANTS[j])] = stats.studentized_range.sf(q, k, total - k)
+    return posthoc
+
+def contingency_table(moments):
+    """2 x variants table of 0/1 counts for a binary metric (rows: 0, 1)."""
+    g = moments.by_variant()
+    ones = np.rint(g.n * g.mean)
+    table = np.vstack([g.n - ones, ones]).astype(np.int64)
+    return table[:, g.n > 0]
+
+def contingency_test(moments, alpha=ALPHA):
+    """Omnibus test plus unadjusted pairwise p-values, as run_multivariate_ab_test reports them."""
+    variants = SHIPPING_VARIANTS[moments.by_variant().n > 0]
+    result = analyze_table(contingency_table(moments), list(variants), alpha=alpha)
+    return result['Test Used'], result['Statistic'], result['p-value'], result['Posthoc Results']
+
+def _dunn_posthoc(sums, n, tie_sum):
+    # Both orders of each pair of present variants, as transform reports Dunn's test
+    present = np.flatnonzero(np.asarray(n) > 0)
+    p_values = dunn_from_rank_sums(np.asarray(sums)[present], np.asarray(n)[present], tie_sum)
+    return {
+        (str(SHIPPING_VARIANTS[i]), str(SHIPPING_VARIANTS[j])): float(p_values[a, b])
+        for a, i in enumerate(present) for b, j in enumerate(present) if i != j
+    }
+
+def run_sufficient_stats_tests(moments, continuous_metrics=CONTINUOUS_METRICS,
+                               categorical_metrics=CATEGORICAL_METRICS, alpha=ALPHA, rank_sums=None):
+    """Results table in run_multivariate_ab_test's layout, from {metric: GroupMoments} alone.
+
+    Bartlett stands in for Levene (absolute deviations around the final group means are not a
+    mergeable moment) and D'Agostino-Pearson for Shapiro-Wilk. Ranks are not a moment either:
+    when the assumptions fail, rank_sums(metric) must supply (midrank sums, sizes, tie sum) per
+    variant for Kruskal-Wallis and Dunn, or the row reports the test as unavailable.
+    """
+    results = []
+    for col in continuous_metrics:
+        m = moments[col]
+        _, bartlett_p = bartlett(m)
+        normal = all(p is not None and p > alpha for _, p in normality(m).values())
+        assumptions_met = bartlett_p > alpha and normal
+        if assumptions_met:
+            if (m.n.sum(axis=0) > 0).sum() > 1:
+                statistic, p_value, eta_squared = ancova(m)
+                test_used = 'ANCOVA'
+            else:
+                statistic, p_value, eta_squared = anova(m)
+                test_used = 'ANOVA'
+            posthoc = tukey_hsd(m, alpha) if p_value < alpha else {}
+        elif rank_sums is not None:
+            sums, n, tie_sum = rank_sums(col)
+            statistic, p_value = kruskal_from_rank_sums(sums, n, tie_sum)
+            test_used = 'Kruskal-Wallis'
+            eta_squared = np.nan
+            posthoc = _dunn_posthoc(sums, n, tie_sum) if p_value < alpha else {}
+        else:
+            statistic, p_value = np.nan, np.nan
+            test_used = 'Kruskal-Wallis (not available from moments)'
+            eta_squared = np.nan
+            posthoc = {}
+        results.append({
+            'Metric': col,
+            'Test Used': test_used,
+            'Statistic': statistic,
+            'p-value': p_value,
+            'Significant': p_value < alpha,
+            'Effect Size (η²)': eta_squared,
+            'Posthoc Results': posthoc,
+            'Assumptions Met': assumptions_met,
+        })
+
+    for col in categorical_metrics:
+        test_used, statistic, p_value, posthoc = contingency_test(moments[col], alpha)
+        results.append({
+            'Metric': col,
+            'Test Used': test_used,
+            'Statistic': statistic,
+            'p-value': p_value,
+            'Significant': p_value < alpha,
+            'Effect Size (η²)': np.nan,
+            'Posthoc Results': posthoc,
+            'Assumptions Met': True,
+        })
+    return pd.DataFrame(results)
@@ -1,296 +1,294 @@
-import mysql.connector
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import scipy.stats as stats
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
-from scikit_posthocs import posthoc_dunn
-from scipy.stats import fisher_exact, chi2_contingency
-import os
-import statsmodels.api as sm
-from statsmodels.formula.api import ols 
-from dotenv import load_dotenv
+from assumptions import DEFAULT_STRATEGY, check_assumptions
+from cache import load_frame, save_frame, table_fingerprint
+import cli
+from contingency import analyze_table, count_table
+from db_connection import get_engine
+from incremental import refresh_analysis_dataset
+from plots import box_summary, proportion_summary, render_plots_in_background
+from queries import ANALYSIS_QUERY
+from ranks import dunn, kruskal, rank_counts
+from resampling import resampling_test
+from shared_frame import attach_frame, share_frame
+from sketches import iqr_fences, sketch_columns, sketch_quartiles
 
 
-load_dotenv()
+def fetch_data(use_cache=True, incremental=False, full=False):
+    if incremental:
+        return refresh_analysis_dataset(full=full)
 
-db_config = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD'),
-    'database': os.getenv('DB_NAME')
-}
+    # Cached snapshots are keyed on the source tables' state, so any change invalidates them
+    key = table_fingerprint(extra=ANALYSIS_QUERY) if use_cache else None
+    df = load_frame(key) if use_cache else None
+    if df is not None:
+        print("Loading data from cache...")
+        return df
 
+    df = pd.read_sql(ANALYSIS_QUERY, get_engine())
+    if use_cache:
+        save_frame(df, key)
+    return df
 
+CONTINUOUS_METRICS = ['order_value', 'satisfaction', 'delivery_rating']
+CATEGORICAL_METRICS = ['cancellation', 'on_time_delivery', 'repurchase_in_30_days']
+# Rows per chunk when clean_data sketches the quartiles instead of sorting whole columns
+CLEAN_CHUNK_ROWS = 1_000_000
 
-def fetch_data(use_cache=True, cache_file='data_cache.csv'):
-    if use_cache and os.path.exists(cache_file):
-        print("Loading data from cache...")
-        return pd.read_csv(cache_file)
-    
-    conn = mysql.connector.connect(**db_config)
-    query = """
-    WITH order_metrics AS(
-    SELECT
-        o.order_id,
-        CASE 
-            WHEN MOD(o.order_id, 3) = 0 THEN '24h'
-            WHEN MOD(o.order_id, 3) = 1 THEN '48h'
-            WHEN MOD(o.order_id, 3) = 2 THEN '72h'
-            END AS shipping_variant,
-        o.total_value AS order_value,
-        o.order_status,
-        r.satisfaction,
-        r.delivery_rating,
-        l.expected_delivery,
-        l.actual_delivery,
-        u.user_id,
-        QUARTER(o.order_date) AS quarter,
-        CASE WHEN EXISTS(
-            SELECT 1 
-            FROM orders o2
-            WHERE o2.user_id = o.user_id
-            AND o2.order_date > o.order_date
-            AND o2.order_date <= o.order_date + INTERVAL 30 DAY 
-        ) THEN 1 ELSE 0 END AS repurchase_in_30_days
-    FROM orders o
-    LEFT JOIN reviews r ON o.order_id = r.order_id
-    LEFT JOIN logistics l ON o.order_id = l.order_id
-    LEFT JOIN users u ON o.user_id = u.user_id)
-    
-    SELECT
-        shipping_variant,
-        order_value,
-        satisfaction,
-        delivery_rating,
-        CASE WHEN order_status = 'cancelled' THEN 1 ELSE 0 END AS cancellation,
-        CASE WHEN actual_delivery <= expected_delivery THEN 1 ELSE 0 END AS on_time_delivery,
-        repurchase_in_30_days,
-        quarter
-    FROM order_metrics
-        
-    
-    """ 
-    df = pd.read_sql(query, conn)
-    conn.close()    
-    df.to_csv(cache_file, index=False)  
-    return df
+def clean_data(df, approximate=False, chunk_rows=CLEAN_CHUNK_ROWS):
+    """Drop rows missing a continuous metric or outside any metric's IQR fences, with one combined mask.
+
+    Every metric's fences come from the same rows (those with all metrics present), so the order
+    of the metrics no longer matters. approximate=True takes the quartiles from KLL sketches built
+    chunk by chunk, the same mergeable state the out-of-core mode keeps.
+    """
+    present = df.dropna(subset=CONTINUOUS_METRICS)
+    values = present[CONTINUOUS_METRICS]
+    if approximate:
+        chunks = (values.iloc[start:start + chunk_rows] for start in range(0, len(values), chunk_rows))
+        quartiles = sketch_quartiles(sketch_columns(chunks, CONTINUOUS_METRICS))
+    else:
+        quartiles = values.quantile([0.25, 0.75])
+    lower, upper = iqr_fences(quartiles)
+    flagged = (values < lower) | (values > upper)
+    df_cleaned = present[~flagged.any(axis=1).to_numpy()]
 
-def clean_data(df):
-    # handle outliers in continuous metrics
-    continuous_metrics = ['order_value', 'satisfaction', 'delivery_rating']
-    df_cleaned = df.dropna(subset=continuous_metrics)
-    for col in continuous_metrics:
-        q1 = df_cleaned[col].quantile(0.25)
-        q3 = df_cleaned[col].quantile(0.75)
-        iqr = q3 - q1
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-        df_cleaned = df_cleaned[(df_cleaned[col] >= lower_bound) & (df_cleaned[col] <= upper_bound)]
-        
     report = {
         'initial_rows': len(df),
         'cleaned_rows': len(df_cleaned),
         'removed_rows': len(df) - len(df_cleaned),
-        'removed_outliers': {col: df[col].nunique() - df_cleaned[col].nunique() for col in continuous_metrics}
+        # Rows outside each metric's fences; a row can be flagged by several metrics
+        'removed_outliers': {col: int(n) for col, n in flagged.sum().items()},
     }
 
     return df_cleaned, report
 
-def run_multivariate_ab_test(df_cleaned):
-    results = []
-    diagnostic_plots = []
-    
-    # define metrics 
-    continuous_metrics = ['order_value', 'satisfaction', 'delivery_rating' ]
-    categorical_metrics = ['cancellation', 'on_time_delivery', 'repurchase_in_30_days']
-    
-    # analyze continuous metrics
-    for col in continuous_metrics:
-        label = col 
-        groups = []
-        group_data ={}
-        for variant in df_cleaned['shipping_variant'].unique():
-            group = df_cleaned[df_cleaned['shipping_variant'] == variant][col]
-            groups.append(group)
-            group_data[variant] = group
-
-        if len(groups) < 2:
-            print(f"Not enough groups for {label} to run test.")
-            continue
-
-        # homogeneity of variance test
-        levene_stat, levene_p = stats.levene(*groups)
-        homogeneity = levene_p > 0.05
+# Columns the per-metric tests read, shared with worker processes
+TEST_COLUMNS = ['shipping_variant', 'quarter'] + CONTINUOUS_METRICS + CATEGORICAL_METRICS
+
+def analyze_continuous_metric(df_cleaned, col, assumption_strategy=DEFAULT_STRATEGY):
+    # scipy and statsmodels take seconds to import; only pay for them when testing
+    import scipy.stats as stats
+    import statsmodels.api as sm
+    from statsmodels.formula.api import ols
+    from statsmodels.stats.multicomp import pairwise_tukeyhsd
+
+    label = col 
+    groups = []
+    group_data ={}
+    for variant in df_cleaned['shipping_variant'].unique():
+        group = df_cleaned[df_cleaned['shipping_variant'] == variant][col]
+        groups.append(group)
+        group_data[variant] = group
+
+    if len(groups) < 2:
+        print(f"Not enough groups for {label} to run test.")
+        return None, None
+
+    # homogeneity of variance and normality, bounded in time however large the groups are
+    strata = {variant: df_cleaned.loc[group.index, 'quarter'].to_numpy() for variant, group in group_data.items()}
+    assumptions = check_assumptions(group_data, strata, strategy=assumption_strategy)
+    assumptions_met = assumptions['assumptions_met']
+
+    if assumptions_met:
+        # ANCOVA test
+        model = ols(f"{col} ~ C(shipping_variant) + C(quarter)", data=df_cleaned).fit()
+        anova_table = sm.stats.anova_lm(model, typ=2)  
         
-        # Normality test
-        normality_results = {}
-        for variant, group in group_data.items():
-            if len(group)>=3:
-                shapiro_stat, shapiro_p = stats.shapiro(group)
-                normality_results[variant] = {
-                    'Shapiro-Wilk Statistic': shapiro_stat,
-                    'p-value': shapiro_p,
-                    'Normality': shapiro_p > 0.05
-                }
-            
-            else: 
-                normality_results[variant] = {
-                    'Shapiro-Wilk Statistic': None,
-                    'p-value': None,
-                    'Normality': None
-                }
-
-        if homogeneity and all(nr['Normality'] for nr in normality_results.values()):
-            # ANCOVA test
-            model = ols(f"{col} ~ C(shipping_variant) + C(quarter)", data=df_cleaned).fit()
-            anova_table = sm.stats.anova_lm(model, typ=2)  
-            
-            if 'C(shipping_variant)' in anova_table.index:
-                f_stat = anova_table.loc['C(shipping_variant)', 'F']
-                p_value = anova_table.loc['C(shipping_variant)', 'PR(>F)']
-                test_used = 'ANCOVA'
-
-                # effct size
-                ss_effect = anova_table.loc['C(shipping_variant)', 'sum_sq']
-                ss_residual = anova_table.loc['Residual', 'sum_sq']
-                eta_squared = ss_effect / (ss_effect + ss_residual) if (ss_effect + ss_residual) > 0 else np.nan
-            else:
-                # run ANOVA if no covariates
-                f_stat, p_value = stats.f_oneway(*groups)
-                test_used = 'ANOVA'
-                ss_total = sum((df_cleaned[col] - df_cleaned[col].mean()) ** 2)
-                ss_between = sum((group.mean() - df_cleaned[col].mean()) ** 2 * len(group) for group in groups)
-                eta_squared = ss_between / ss_total if ss_total > 0 else np.nan
-        else: 
-            # Kruskal-Wallis test for non-parametric data
-            h_stat, p_value = stats.kruskal(*groups)
-            test_used = 'Kruskal-Wallis'
-            eta_squared = np.nan
-            
+        if 'C(shipping_variant)' in anova_table.index:
+            statistic = anova_table.loc['C(shipping_variant)', 'F']
+            p_value = anova_table.loc['C(shipping_variant)', 'PR(>F)']
+            test_used = 'ANCOVA'
+
+            # effct size
+            ss_effect = anova_table.loc['C(shipping_variant)', 'sum_sq']
+            ss_residual = anova_table.loc['Residual', 'sum_sq']
+            eta_squared = ss_effect / (ss_effect + ss_residual) if (ss_effect + ss_residual) > 0 else np.nan
+        else:
+            # run ANOVA if no covariates
+            statistic, p_value = stats.f_oneway(*groups)
+            test_used = 'ANOVA'
+            ss_total = sum((df_cleaned[col] - df_cleaned[col].mean()) ** 2)
+            ss_between = sum((group.mean() - df_cleaned[col].mean()) ** 2 * len(group) for group in groups)
+            eta_squared = ss_between / ss_total if ss_total > 0 else np.nan
+    else: 
+        # Kruskal-Wallis for non-parametric data; it and Dunn's test share one value x variant count table
+        rank_variants = sorted(group_data)
+        counts = rank_counts([group_data[variant] for variant in rank_variants])
+        statistic, p_value = kruskal(counts)
+        test_used = 'Kruskal-Wallis'
+        eta_squared = np.nan
+        
+        
+    # Post-hoc test
+    posthoc = {}
+    if p_value < 0.05:
+        if test_used == 'ANCOVA' or test_used == 'ANOVA':
+            tukey = pairwise_tukeyhsd(df_cleaned[col], df_cleaned['shipping_variant'], alpha=0.05)
+            for i in range(len(tukey._results_table.data[0])):
+                pair = tukey._results_table.data[0][i]
+                pval = tukey._results_table.data[1][i]
+                posthoc[pair] = pval    
             
-        # Post-hoc test
-        posthoc = {}
-        if p_value < 0.05:
-            if test_used == 'ANCOVA' or test_used == 'ANOVA':
-                tukey = pairwise_tukeyhsd(df_cleaned[col], df_cleaned['shipping_variant'], alpha=0.05)
-                for i in range(len(tukey._results_table.data[0])):
-                    pair = tukey._results_table.data[0][i]
-                    pval = tukey._results_table.data[1][i]
-                    posthoc[pair] = pval    
-                
-                
-                
-            else:
-                # Dunn's test for non-parametric data
-                dunn_results = posthoc_dunn(df_cleaned, val_col=col, group_col='shipping_variant')
-                for i in dunn_results.index:
-                    for j in dunn_results.columns:
-                        if i != j:
-                            posthoc[(i, j)] = dunn_results.loc[i, j]
-                            
-        # diagnostic plots
-        plt.figure(figsize=(10, 6))
-        sns.boxplot(x='shipping_variant', y=col, data=df_cleaned)
-        plt.title(f'Boxplot of {label} by Shipping Variant')
-        plt.tight_layout()
-        diagnostic_plots.append(plt.gcf())
-        plt.close()
             
-        results.append({
-                'Metric': label,
-                'Test Used': test_used,
-                'Statistic': f_stat if test_used == 'ANOVA' else h_stat,
-                'p-value': p_value,
-                'Significant': p_value < 0.05,
-                'Effect Size (η²)': eta_squared,
-                'Posthoc Results': posthoc,
-                'Assumptions Met': homogeneity and all(nr['Normality'] for nr in normality_results.values())
-            })
             
-        
-        
-    # analyze categorical metrics
-    for col in categorical_metrics:
-        label = col 
-        contingency = pd.crosstab(df_cleaned[col], df_cleaned['shipping_variant'])
-        
-        if contingency.size == 4:
-            if (contingency <5).any().any():
-                # Fisher's Exact Test for small sample sizes
-                oddsratio, p_value = stats.fisher_exact(contingency)
-                test_used = "Fisher's Exact Test"
-                statistic = oddsratio
-            else:
-                # Chi-squared test 
-                chi2, p_value, _, _ = stats.chi2_contingency(contingency)
-                test_used = 'Chi-squared Test'
-                statistic = chi2
-                
         else:
-            chi2, p_value, _, _ = stats.chi2_contingency(contingency)
-            test_used = 'Chi-squared Test'
-            statistic = chi2
-                
-                
-        # Post-hoc pairwise comparisons with Bonferroni correction
-        posthoc = {}
-        variants = df_cleaned['shipping_variant'].unique()
-        n_comparisons = len(variants) * (len(variants) - 1) / 2
-        alpha_corrected = 0.05 / n_comparisons
-        
-        for i in range(len(variants)):
-            for j in range(i+1, len(variants)):
-                v1 = variants[i]
-                v2 = variants[j]
-                subset = df_cleaned[df_cleaned['shipping_variant'].isin([v1, v2])]
-                cont_table = pd.crosstab(subset[col], subset['shipping_variant'])
-                
-                if cont_table.size == 4 and (cont_table < 5).any().any():
-                    _, p_val = fisher_exact(cont_table)
-                else:
-                    _, p_val, _, _ = chi2_contingency(cont_table)
-                
-                posthoc[f"{v1}-{v2}"] = p_val
-        
-        # Diagnostic plot
-        plt.figure(figsize=(10, 6))
-        sns.barplot(x='shipping_variant', y=col, data=df_cleaned, errorbar=None)
-        plt.title(f'{label} by Shipping Variant')
-        plt.ylabel('Proportion')
-        plt.tight_layout()
-        diagnostic_plots.append(plt.gcf())
-        plt.close()
+            # Dunn's test for non-parametric data
+            dunn_p = dunn(counts)
+            for a, i in enumerate(rank_variants):
+                for b, j in enumerate(rank_variants):
+                    if i != j:
+                        posthoc[(i, j)] = dunn_p[a, b]
+                        
+    # diagnostic plot data; drawn later by the plots stage
+    plot = box_summary(df_cleaned, col)
         
-        results.append({
+    result = {
             'Metric': label,
             'Test Used': test_used,
             'Statistic': statistic,
             'p-value': p_value,
             'Significant': p_value < 0.05,
-            'Effect Size (η²)': np.nan,
+            'Effect Size (η²)': eta_squared,
             'Posthoc Results': posthoc,
-            'Assumptions Met': True  # No assumptions for categorical tests
-        })
-    
+            'Assumptions Met': assumptions_met,
+            'Assumption Check': assumptions['strategy'],
+        }
+    return result, plot
+
+def analyze_categorical_metric(df_cleaned, col):
+    # One 2 x K count table; every test and effect size below is computed from it alone
+    table, variants = count_table(df_cleaned, col)
+    result = {'Metric': col, **analyze_table(table, variants)}
+    result.update({
+        'Effect Size (η²)': np.nan,
+        'Assumptions Met': True,  # No assumptions for categorical tests
+        'Assumption Check': None,
+    })
+
+    # Diagnostic plot data
+    plot = proportion_summary(df_cleaned, col)
+    return result, plot
+
+def analyze_metric(df_cleaned, col, assumption_strategy=DEFAULT_STRATEGY):
+    if col in CONTINUOUS_METRICS:
+        return analyze_continuous_metric(df_cleaned, col, assumption_strategy)
+    return analyze_categorical_metric(df_cleaned, col)
+
+def analyze_resampling(df_cleaned, col, executor=None):
+    """Permutation test across variants plus bootstrap CIs of the pairwise differences in means (or rates)."""
+    group_data = {variant: df_cleaned.loc[df_cleaned['shipping_variant'] == variant, col]
+                  for variant in df_cleaned['shipping_variant'].unique()}
+    statistic, p_value, intervals = resampling_test(group_data, executor=executor)
+    return {
+        'Metric': col,
+        'Test Used': 'Permutation + Bootstrap',
+        'Statistic': statistic,
+        'p-value': p_value,
+        'Significant': p_value < 0.05,
+        'Effect Size (η²)': np.nan,
+        # (v1, v2) -> (difference in means, CI low, CI high)
+        'Posthoc Results': {f"{v1}-{v2}": interval for (v1, v2), interval in intervals.items()},
+        'Assumptions Met': True,  # distribution-free
+        'Assumption Check': None,
+    }
+
+def _analyze_shared(spec, col, assumption_strategy):
+    # Worker side: view the parent's columns in shared memory rather than unpickling a frame
+    block, df = attach_frame(spec)
+    try:
+        # Back to plain labels: crosstabs of a categorical would keep unobserved variants
+        df['shipping_variant'] = df['shipping_variant'].astype(str)
+        return analyze_metric(df, col, assumption_strategy)
+    finally:
+        del df
+        block.close()
+
+def _shared_columns(df_cleaned):
+    # The variant's order of first appearance drives group and pair order, so keep it
+    df = df_cleaned[TEST_COLUMNS]
+    variants = pd.unique(df['shipping_variant'])
+    return df.assign(shipping_variant=pd.Categorical(df['shipping_variant'], categories=variants))
+
+def run_multivariate_ab_test(df_cleaned, n_workers=1, assumption_strategy=DEFAULT_STRATEGY, resampling=False):
+    """Test every metric, on n_workers processes when > 1; results come back in metric order.
+
+    assumption_strategy picks how the ANCOVA/Kruskal-Wallis gate is checked (see assumptions.py);
+    resampling=True appends a permutation/bootstrap row per metric.
+    Returns (results, plot summaries); plots.render_plots draws the summaries.
+    """
+    metrics = CONTINUOUS_METRICS + CATEGORICAL_METRICS
+    if n_workers > 1:
+        block, spec = share_frame(_shared_columns(df_cleaned))
+        try:
+            with ProcessPoolExecutor(n_workers) as executor:
+                outcomes = list(executor.map(
+                    _analyze_shared, [spec] * len(metrics), metrics, [assumption_strategy] * len(metrics)
+                ))
+        finally:
+            block.close()
+            block.unlink()
+    else:
+        outcomes = [analyze_metric(df_cleaned, col, assumption_strategy) for col in metrics]
+
+    results = [result for result, _ in outcomes if result is not None]
+    if resampling:
+        # One pool runs the bootstrap batches of every metric and variant
+        if n_workers > 1:
+            with ProcessPoolExecutor(n_workers) as executor:
+                results += [analyze_resampling(df_cleaned, col, executor) for col in metrics]
+        else:
+            results += [analyze_resampling(df_cleaned, col) for col in metrics]
+    diagnostic_plots = [plot for _, plot in outcomes if plot is not None]
     return pd.DataFrame(results), diagnostic_plots
                 
                 
 
-def main():
-    df = fetch_data(use_cache=False)
-    
-    print("Data fetched successfully.")
-    
-    df_cleaned, report = clean_data(df)
-    print("Data cleaned successfully.")
-    
-    
-    print("Running multivariate A/B test...")
-    results_df, diagnostic_plots = run_multivariate_ab_test(df_cleaned)
+def main(n_workers=1, plots=True, assumption_strategy=DEFAULT_STRATEGY, resampling=False, approximate_quantiles=False,
+         out_of_core=False, full_refresh=False, use_cache=False, pushdown=False, from_extracted=None,
+         repurchase_days=None):
+    if pushdown:
+        # Quartiles, moments and count tables are all computed by MySQL (see pushdown.py)
+        from pushdown import run_pushdown
+
+        print("Running multivariate A/B test from aggregate queries...")
+        results_df, diagnostic_plots, report = run_pushdown()
+    elif out_of_core:
+        # Streams the analysis query twice in bounded chunks instead of loading it (see outofcore.py)
+        from outofcore import run_out_of_core
+
+        print("Running out-of-core multivariate A/B test...")
+        results_df, diagnostic_plots, report = run_out_of_core()
+    else:
+        if from_extracted:
+            # Metrics recomputed from extract.py's columnar tables, without touching the database
+            from metrics import metrics_from_extracted
+
+            options = {'repurchase_days': repurchase_days} if repurchase_days else {}
+            df = metrics_from_extracted(from_extracted, **options)
+        elif use_cache:
+            # The fingerprinted snapshot re-reads everything when any source table changed
+            df = fetch_data(use_cache=True)
+        else:
+            # The incremental dataset only re-reads changed orders
+            df = fetch_data(incremental=True, full=full_refresh)
+
+        print("Data fetched successfully.")
+
+        df_cleaned, report = clean_data(df, approximate=approximate_quantiles)
+        print("Data cleaned successfully.")
+
+
+        print("Running multivariate A/B test...")
+        results_df, diagnostic_plots = run_multivariate_ab_test(df_cleaned, n_workers, assumption_strategy, resampling)
     
+    # Plots render in the background while the results are saved and shown
+    if plots:
+        plot_executor, plot_future = render_plots_in_background(diagnostic_plots)
+
     # Save and display results
     results_df.to_csv('multivariate_ab_test_results.csv', index=False)
     print("Data Quality Report:", report)
@@ -299,11 +297,13 @@ def main():
     print(results_df[['Metric', 'Test Used', 'Statistic', 'p-value', 'Significant', 'Effect Size (η²)']])
     
     
-    # Save plots to files
-    for i, plot in enumerate(diagnostic_plots):
-        plot.savefig(f'diagnostic_plot_{i}.png', dpi=300)
+    if plots:
+        written = plot_future.result()
+        plot_executor.shutdown()
+        print(f"Diagnostic plots: {len(written)} rendered, {len(diagnostic_plots) - len(written)} unchanged.")
     
     print("Analysis complete. Results saved")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Same options as python cli.py transform, from the one parser that defines them
+    sys.exit(cli.main(["transform", *sys.argv[1:]]))
@@ -0,0 +1,7 @@
+USE ecommerce_ab_test;
+
+-- Indexes added after the initial schema; run once on databases created before them.
+-- (reviews.order_id and logistics.order_id are already indexed by their foreign keys.)
+
+-- ORDERS: per-user order history, used by the repurchase_in_30_days window
+CREATE INDEX idx_orders_user_date ON orders (user_id, order_date);
@@ -32,7 +32,9 @@ CREATE TABLE orders (
     product_category VARCHAR(100),
     total_value FLOAT,
     FOREIGN KEY (user_id) REFERENCES users(user_id),
-    FOREIGN KEY (store_id) REFERENCES stores(store_id)
+    FOREIGN KEY (store_id) REFERENCES stores(store_id),
+    -- per-user order history, used by the repurchase_in_30_days window
+    INDEX idx_orders_user_date (user_id, order_date)
 );
 
 -- ORDER ITEMS
@@ -0,0 +1,46 @@
+import os
+import sys
+from unittest import mock
+
+import numpy as np
+import pytest
+from scipy import stats
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+import assumptions  # noqa: E402
+from assumptions import STRATEGIES, check_assumptions, stratified_subsample  # noqa: E402
+
+MAX_SAMPLE = 500
+
+def _groups(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return {variant: rng.normal(0, 1, size) for variant in ("24h", "48h", "72h")}
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_every_strategy_sees_at_most_max_sample(strategy):
+    seen = []
+    normality = assumptions._normality
+
+    def record(values, *args):
+        seen.append(len(values))
+        return normality(values, *args)
+
+    with mock.patch.object(assumptions, "_normality", side_effect=record), \
+            mock.patch.object(stats, "levene", wraps=stats.levene) as levene:
+        check_assumptions(_groups(20_000), strategy=strategy, max_sample=MAX_SAMPLE)
+    assert seen == [MAX_SAMPLE] * 3
+    for call in levene.call_args_list:
+        assert [len(sample) for sample in call.args] == [MAX_SAMPLE] * 3
+
+def test_small_groups_are_used_whole():
+    groups = _groups(300)
+    result = check_assumptions(groups, strategy="shapiro", max_sample=MAX_SAMPLE)
+    assert result["homogeneity_p"] == pytest.approx(stats.levene(*groups.values()).pvalue)
+
+def test_stratified_subsample_keeps_shares():
+    strata = np.repeat([1, 2, 3, 4], [1_000, 2_000, 3_000, 4_000])
+    values = np.arange(len(strata), dtype=float)
+    sample = stratified_subsample(values, strata, max_size=1_000)
+    assert len(sample) == 1_000
+    np.testing.assert_array_equal(np.unique(strata[sample.astype(int)], return_counts=True)[1], [100, 200, 300, 400])
@@ -0,0 +1,49 @@
+import os
+import sys
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from cache import ColumnWriter, decimal_columns, read_columns, write_columns  # noqa: E402
+
+def _frame():
+    # As the driver returns rows: DECIMAL as Decimal objects, VARCHAR codes as strings
+    return pd.DataFrame({
+        "order_id": [1, 2, 3, 4],
+        "total_value": [Decimal("10.50"), None, Decimal("3.25"), Decimal("7.00")],
+        "zip_code": ["00123", "04567", None, "00123"],
+        "order_status": ["delivered", "cancelled", "delivered", "returned"],
+    })
+
+def test_decimal_columns_from_description():
+    # (name, type_code, ...) per column; 246 is NEWDECIMAL, 253 VARCHAR, 3 INT
+    description = [("order_id", 3), ("total_value", 246), ("zip_code", 253), ("legacy", 0)]
+    assert decimal_columns(description) == ["total_value", "legacy"]
+
+def test_only_decimals_become_numbers(tmp_path):
+    write_columns(_frame(), str(tmp_path))
+    df = read_columns(str(tmp_path), mmap=False)
+    np.testing.assert_array_equal(df["total_value"], [10.5, np.nan, 3.25, 7.0])
+    assert isinstance(df["zip_code"].dtype, pd.CategoricalDtype)
+    assert list(df["zip_code"].astype(object)) == ["00123", "04567", np.nan, "00123"]
+    assert list(df["order_status"]) == ["delivered", "cancelled", "delivered", "returned"]
+
+def test_column_writer_matches_write_columns(tmp_path):
+    frame = _frame()
+    write_columns(frame, str(tmp_path / "whole"))
+    writer = ColumnWriter(str(tmp_path / "chunked"))
+    # The second chunk has no zip codes at all, which must not turn the column into numbers
+    for chunk in (frame.iloc[:2], frame.iloc[2:3].assign(zip_code=[None]), frame.iloc[3:]):
+        writer.append(chunk.reset_index(drop=True))
+    assert writer.close() == len(frame)
+    pd.testing.assert_frame_equal(read_columns(str(tmp_path / "chunked"), mmap=False),
+                                  read_columns(str(tmp_path / "whole"), mmap=False))
+
+@pytest.mark.parametrize("values", [["1", "2", "3"], ["001", "010", "100"]])
+def test_numeric_looking_text_stays_text(tmp_path, values):
+    write_columns(pd.DataFrame({"code": values}), str(tmp_path))
+    assert list(read_columns(str(tmp_path), mmap=False)["code"]) == values
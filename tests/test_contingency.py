@@ -0,0 +1,77 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency, fisher_exact
+from statsmodels.stats.multitest import multipletests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from contingency import adjust_p_values, analyze_table, count_table, risk_difference  # noqa: E402
+
+SEEDS = [0, 1, 7]
+
+def _frame(num_rows, seed, rates=(0.1, 0.12, 0.2)):
+    rng = np.random.default_rng(seed)
+    variants = rng.choice(["24h", "48h", "72h"], num_rows)
+    rate = np.select([variants == "24h", variants == "48h"], rates[:2], rates[2])
+    values = (rng.random(num_rows) < rate).astype(float)
+    values[rng.random(num_rows) < 0.05] = np.nan
+    return pd.DataFrame({"shipping_variant": variants, "cancellation": values})
+
+def _crosstab_reference(df, col):
+    # The per-pair path count_table replaced: a crosstab per pair of variants
+    variants = df["shipping_variant"].unique()
+    posthoc = {}
+    for i in range(len(variants)):
+        for j in range(i + 1, len(variants)):
+            subset = df[df["shipping_variant"].isin([variants[i], variants[j]])]
+            table = pd.crosstab(subset[col], subset["shipping_variant"])
+            if table.size == 4 and (table < 5).any().any():
+                p_value = fisher_exact(table)[1]
+            else:
+                p_value = chi2_contingency(table)[1]
+            posthoc[f"{variants[i]}-{variants[j]}"] = p_value
+    return chi2_contingency(pd.crosstab(df[col], df["shipping_variant"]))[1], posthoc
+
+@pytest.mark.parametrize("num_rows", [40, 5_000])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_matches_crosstab_tests(seed, num_rows):
+    # 40 rows leave cells under 5, so the pairs go through Fisher's exact test
+    df = _frame(num_rows, seed)
+    table, variants = count_table(df, "cancellation")
+    result = analyze_table(table, variants)
+    p_value, posthoc = _crosstab_reference(df, "cancellation")
+    assert result["p-value"] == pytest.approx(p_value)
+    assert result["Posthoc Results"] == pytest.approx(posthoc)
+
+def test_count_table_matches_crosstab():
+    df = _frame(1_000, 0)
+    table, variants = count_table(df, "cancellation")
+    expected = pd.crosstab(df["cancellation"], df["shipping_variant"])[variants].to_numpy()
+    np.testing.assert_array_equal(table, expected)
+
+@pytest.mark.parametrize("method", ["holm", "bonferroni"])
+def test_adjusted_p_values_match_statsmodels(method):
+    p_values = {"a": 0.01, "b": 0.04, "c": 0.03, "d": 0.5}
+    expected = multipletests(list(p_values.values()), method=method)[1]
+    assert list(adjust_p_values(p_values, method).values()) == pytest.approx(list(expected))
+
+def test_risk_difference():
+    table = np.array([[80, 60], [20, 40]])
+    difference, low, high = risk_difference(table, 0, 1)
+    margin = 1.959964 * np.sqrt(0.2 * 0.8 / 100 + 0.4 * 0.6 / 100)
+    assert (difference, low, high) == pytest.approx((-0.2, -0.2 - margin, -0.2 + margin))
+
+@pytest.mark.parametrize("i, j", [(0, 1), (1, 0), (1, 1)])
+def test_risk_difference_with_an_empty_variant(i, j):
+    table = np.array([[10, 0], [5, 0]])
+    with np.errstate(all="raise"):
+        assert np.isnan(risk_difference(table, i, j)).all()
+
+def test_analyze_table_with_an_empty_variant():
+    # A variant fixed up front (as sql_count_table allows) that has no rows
+    result = analyze_table(np.array([[30, 0], [10, 0]]), ["24h", "48h"])
+    assert np.isnan(result["Risk Differences"]["24h-48h"]).all()
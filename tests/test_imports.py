@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ETL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline")
+
+# Seconds each pipeline entry point may take to import, and libraries none of them may load
+IMPORT_BUDGETS = {
+    "cli": 0.2,
+    "transform": 1.0,
+    "load": 1.0,
+}
+HEAVY_MODULES = {"matplotlib", "seaborn", "scipy", "statsmodels", "scikit_posthocs"}
+
+def _run(code):
+    # A fresh interpreter in etl_pipeline/, where the scripts import their siblings
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True, cwd=ETL_DIR,
+    )
+
+def import_profile(code):
+    """{module: cumulative import seconds} for everything running code imported (-X importtime)."""
+    cumulative = {}
+    # -X importtime writes "import time: self | cumulative | name" per module to stderr
+    for line in _run(code).stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(total) / 1e6
+    return cumulative
+
+@pytest.mark.parametrize("module, budget", IMPORT_BUDGETS.items())
+def test_import_within_budget(module, budget):
+    profile = import_profile(f"import {module}")
+    assert profile[module] <= budget, f"import {module} took {profile[module]:.3f}s"
+
+@pytest.mark.parametrize("module", IMPORT_BUDGETS)
+def test_import_loads_no_heavy_modules(module):
+    assert not HEAVY_MODULES & set(import_profile(f"import {module}"))
+
+def test_cli_parser_loads_no_heavy_modules():
+    # Building and using the parser (as every subcommand does) stays as light as importing cli
+    profile = import_profile("import cli; cli.build_parser().parse_args(['report'])")
+    assert not (HEAVY_MODULES | {"numpy", "pandas"}) & set(profile)
+
+def test_cli_assumption_choices_match_strategies():
+    result = _run("import assumptions, cli; print(cli.ASSUMPTION_STRATEGIES == assumptions.STRATEGIES)")
+    assert result.stdout.strip() == "True"
+
+def test_cli_rejects_unknown_assumption_strategy():
+    result = subprocess.run(
+        [sys.executable, "cli.py", "transform", "--assumptions", "levene"], capture_output=True, text=True, cwd=ETL_DIR,
+    )
+    assert result.returncode == 2
+    assert "invalid choice" in result.stderr
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from metrics import compute_order_metrics, repurchase_flags  # noqa: E402
+
+SEEDS = [0, 1, 7]
+WINDOWS = [1, 30, 60]
+
+def _orders(num_orders, num_users, seed):
+    rng = np.random.default_rng(seed)
+    user_ids = rng.integers(1, num_users + 1, num_orders)
+    order_dates = np.datetime64("2024-01-01T00:00:00") + rng.integers(0, 120 * 86400, num_orders).astype("timedelta64[s]")
+    # Same-second ties, which must not count as repurchases
+    order_dates[::7] = order_dates[::7].astype("datetime64[D]")
+    return user_ids, order_dates
+
+def _sql_window_reference(user_ids, order_dates, window_days):
+    # ANALYSIS_QUERY's window, with the dates as epoch seconds (SQLite has no INTERVAL frames)
+    con = sqlite3.connect(":memory:")
+    seconds = order_dates.astype("datetime64[s]").astype(np.int64)
+    con.execute("CREATE TABLE orders (order_id INTEGER, user_id INTEGER, order_date INTEGER)")
+    con.executemany("INSERT INTO orders VALUES (?, ?, ?)", zip(range(len(user_ids)), user_ids.tolist(), seconds.tolist()))
+    rows = con.execute(
+        f"""
+        SELECT CASE WHEN COUNT(*) OVER (
+            PARTITION BY user_id
+            ORDER BY order_date
+            RANGE BETWEEN 1 FOLLOWING AND {window_days * 86400} FOLLOWING
+        ) > 0 THEN 1 ELSE 0 END
+        FROM orders ORDER BY order_id
+        """
+    ).fetchall()
+    return np.array([flag for (flag,) in rows], dtype=np.int8)
+
+@pytest.mark.parametrize("window_days", WINDOWS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_repurchase_flags_match_sql_window(seed, window_days):
+    user_ids, order_dates = _orders(5_000, 300, seed)
+    expected = _sql_window_reference(user_ids, order_dates, window_days)
+    np.testing.assert_array_equal(repurchase_flags(user_ids, order_dates, window_days), expected)
+
+def test_repurchase_flags_edges():
+    dates = np.array(["2024-01-01T00:00:00", "2024-01-01T00:00:00", "2024-01-31T00:00:00", "2024-03-01T00:00:01"],
+                     dtype="datetime64[s]")
+    # A same-second order is not a repurchase; exactly 30 days later is, 30 days and a second is not
+    np.testing.assert_array_equal(repurchase_flags([1, 1, 1, 1], dates), [1, 1, 0, 0])
+    np.testing.assert_array_equal(repurchase_flags([1, 2, 1, 2], dates), [1, 0, 0, 0])
+    assert len(repurchase_flags([], np.array([], dtype="datetime64[s]"))) == 0
+
+def test_compute_order_metrics_left_joins():
+    orders = pd.DataFrame({
+        "order_id": [1, 2, 3, 4],
+        "user_id": [1, 1, 2, 2],
+        "order_date": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-04-01", "2024-12-31"]),
+        "total_value": [10.0, 20.0, 30.0, 40.0],
+        "order_status": ["delivered", "cancelled", "delivered", "delivered"],
+    })
+    # Order 2 has no logistics and order 3 no review
+    logistics = {"order_id": [4, 1, 3], "expected_delivery": [5.0, 3.0, 2.0], "actual_delivery": [5.0, 2.0, 4.0]}
+    reviews = {"order_id": [1, 2, 4], "satisfaction": [5, 4, 3], "delivery_rating": [1, 2, 3]}
+    df = compute_order_metrics(orders, logistics, reviews)
+
+    assert list(df["shipping_variant"]) == ["48h", "72h", "24h", "48h"]
+    np.testing.assert_array_equal(df["on_time_delivery"], [1, 0, 0, 1])
+    np.testing.assert_array_equal(df["satisfaction"], [5, 4, np.nan, 3])
+    np.testing.assert_array_equal(df["cancellation"], [0, 1, 0, 0])
+    np.testing.assert_array_equal(df["repurchase_in_30_days"], [1, 0, 0, 0])
+    np.testing.assert_array_equal(df["quarter"], [1, 1, 2, 4])
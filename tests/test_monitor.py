@@ -0,0 +1,92 @@
+import os
+import sys
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from metrics import repurchase_flags  # noqa: E402
+from monitor import REPURCHASE_WINDOW, SequentialMonitor  # noqa: E402
+
+SEEDS = [0, 1, 7]
+
+def _stream(num_orders, num_users, seed, sort_dates=False):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2024-01-01T00:00:00")
+    order_dates = start + rng.integers(0, 365 * 86400, num_orders).astype("timedelta64[s]")
+    # Dates are not sorted by order_id, as in the simulator (unless asked)
+    if sort_dates:
+        order_dates = np.sort(order_dates)
+    return {
+        "order_ids": np.arange(1, num_orders + 1),
+        "user_ids": rng.integers(1, num_users + 1, num_orders),
+        "order_dates": order_dates,
+        "values": rng.uniform(10, 500, num_orders).round(2),
+        "statuses": rng.choice(["delivered", "cancelled"], num_orders, p=[0.9, 0.1]),
+        "ratings": rng.integers(1, 6, (num_orders, 2)),
+        "late": rng.random(num_orders) < 0.2,
+    }
+
+def _feed(monitor, s):
+    for order_id, user_id, date, value, status, (satisfaction, rating), late in zip(
+        s["order_ids"].tolist(), s["user_ids"].tolist(), s["order_dates"].tolist(), s["values"].tolist(),
+        s["statuses"].tolist(), s["ratings"].tolist(), s["late"].tolist(),
+    ):
+        monitor.on_order(order_id, user_id, date, value, status)
+        # Cancelled orders never get a logistics row
+        if status != "cancelled":
+            monitor.on_logistics(order_id, date, date + REPURCHASE_WINDOW if late else date)
+        monitor.on_review(order_id, satisfaction, rating)
+    return monitor
+
+def assert_matches_batch(monitor, s):
+    variants = s["order_ids"] % 3
+    flags = repurchase_flags(s["user_ids"], s["order_dates"])
+    on_time = ~s["late"] & (s["statuses"] != "cancelled")
+    for variant in range(3):
+        rows = variants == variant
+        n = int(rows.sum())
+        assert monitor.counts["repurchase_in_30_days"][variant] == [n, int(flags[rows].sum())]
+        assert monitor.counts["cancellation"][variant] == [n, int((s["statuses"][rows] == "cancelled").sum())]
+        assert monitor.counts["on_time_delivery"][variant] == [n, int(on_time[rows].sum())]
+        for col, values in (("order_value", s["values"]), ("satisfaction", s["ratings"][:, 0])):
+            moments = monitor.moments[col][variant]
+            assert moments.n == n
+            assert moments.mean == pytest.approx(values[rows].mean())
+            assert moments.variance == pytest.approx(values[rows].var(ddof=1))
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_matches_batch_metrics(seed):
+    s = _stream(20_000, 2_000, seed)
+    assert_matches_batch(_feed(SequentialMonitor(), s), s)
+
+def test_expiry_keeps_batch_flags():
+    # Dates in order with a short lateness, so most orders are forgotten along the way
+    s = _stream(20_000, 500, 3, sort_dates=True)
+    monitor = _feed(SequentialMonitor(lateness=timedelta(days=1)), s)
+    assert sum(len(dates) for dates, _ in monitor.user_orders.values()) < len(s["order_ids"]) // 4
+    assert_matches_batch(monitor, s)
+
+def test_p_values_are_running_minima():
+    s = _stream(3_000, 300, 0)
+    monitor = SequentialMonitor()
+    previous = None
+    for start in range(0, 3_000, 500):
+        _feed(monitor, {key: values[start:start + 500] for key, values in s.items()})
+        p_values = monitor.p_values()
+        if previous is not None:
+            for col, pairs in p_values.items():
+                assert all(p <= previous[col].get(pair, 1.0) for pair, p in pairs.items())
+        previous = p_values
+
+def test_checkpoint_round_trip(tmp_path):
+    s = _stream(2_000, 200, 0)
+    monitor = _feed(SequentialMonitor(), s)
+    path = str(tmp_path / "monitor_state.pkl")
+    monitor.save(path)
+    restored = SequentialMonitor.load(path)
+    assert restored.p_values() == monitor.p_values()
+    assert restored.counts == monitor.counts
+    assert not os.path.exists(f"{path}.tmp")
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_simulation"))
+
+from generate_order_items import (  # noqa: E402
+    CATEGORY_LIST, PRICE_MAP, generate_order_items_batch, validate_order_items_batch,
+)
+from text_pool import TextPool  # noqa: E402
+
+SEEDS = [0, 1, 7, 42, 2024]
+
+@pytest.fixture(scope="module")
+def pool():
+    # A one-entry pool: names do not matter here, and the persisted pool would be written to disk
+    return TextPool(np.array(["Acme"]), np.array(["Widget"]), np.array(["Fine."]))
+
+def _orders(num_orders, seed):
+    # Totals drawn from the main category's price range, as generate_orders does
+    rng = np.random.default_rng(seed)
+    categories = rng.choice(CATEGORY_LIST, size=num_orders)
+    totals = np.array([round(rng.uniform(*PRICE_MAP[c]), 2) for c in categories])
+    return np.arange(1, num_orders + 1), categories, totals
+
+def _cents(values):
+    return np.rint(np.asarray(values, dtype=np.float64) * 100).astype(np.int64)
+
+def assert_invariants(items, order_ids, categories, totals):
+    """Every price is whole cents inside its category's bounds and each order's items add up to its total."""
+    prices = _cents(items["price"])
+    np.testing.assert_array_equal(prices / 100, items["price"])
+    low = np.array([PRICE_MAP[c][0] * 100 for c in items["category"]])
+    high = np.array([PRICE_MAP[c][1] * 100 for c in items["category"]])
+    assert ((prices >= low) & (prices <= high)).all()
+    assert (items["quantity"] >= 1).all()
+
+    index = {order_id: i for i, order_id in enumerate(order_ids)}
+    sums = np.zeros(len(order_ids), dtype=np.int64)
+    np.add.at(sums, [index[order_id] for order_id in items["order_id"]], prices * items["quantity"])
+    np.testing.assert_array_equal(sums, _cents(totals))
+    # Every order gets at least one item
+    assert set(items["order_id"]) == set(order_ids)
+    validate_order_items_batch(items, order_ids, categories, totals)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_random_orders(seed, pool):
+    order_ids, categories, totals = _orders(5_000, seed)
+    items = generate_order_items_batch(order_ids, categories, totals, seed=seed, pool=pool)
+    assert_invariants(items, order_ids, categories, totals)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_single_order(seed, pool):
+    # One order on its own, across seeds, so every item count (1-3) comes up
+    for i, category in enumerate(CATEGORY_LIST):
+        order_ids, categories, totals = np.array([i + 1]), np.array([category]), np.array([sum(PRICE_MAP[category]) / 2])
+        items = generate_order_items_batch(order_ids, categories, totals, seed=seed * 100 + i, pool=pool)
+        assert 1 <= len(items["order_id"]) <= 3
+        assert_invariants(items, order_ids, categories, totals)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_totals_at_category_bounds(seed, pool):
+    categories = np.repeat(CATEGORY_LIST, 2)
+    totals = np.array([float(PRICE_MAP[c][i % 2]) for i, c in enumerate(categories)])
+    order_ids = np.arange(1, len(categories) + 1)
+    items = generate_order_items_batch(order_ids, categories, totals, seed=seed, pool=pool)
+    assert_invariants(items, order_ids, categories, totals)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_tiny_totals_fall_back_to_one_item(seed, pool):
+    # Under twice the smallest category minimum only one item of quantity 1 fits, whatever was drawn
+    smallest = min(low for low, _ in PRICE_MAP.values())
+    cheapest = [c for c in CATEGORY_LIST if PRICE_MAP[c][0] == smallest]
+    rng = np.random.default_rng(seed)
+    categories = np.array(cheapest * 50)
+    totals = np.round(rng.uniform(smallest, 2 * smallest - 0.01, size=len(categories)), 2)
+    totals[:len(cheapest)] = smallest
+    order_ids = np.arange(1, len(categories) + 1)
+    items = generate_order_items_batch(order_ids, categories, totals, seed=seed, pool=pool)
+    assert_invariants(items, order_ids, categories, totals)
+
+    order = np.argsort(items["order_id"])
+    np.testing.assert_array_equal(items["order_id"][order], order_ids)
+    np.testing.assert_array_equal(items["quantity"], 1)
+    np.testing.assert_array_equal(_cents(items["price"][order]), _cents(totals))
+
+def test_same_seed_same_items(pool):
+    order_ids, categories, totals = _orders(1_000, 3)
+    first = generate_order_items_batch(order_ids, categories, totals, seed=3, pool=pool)
+    second = generate_order_items_batch(order_ids, categories, totals, seed=3, pool=pool)
+    for column in first:
+        np.testing.assert_array_equal(first[column], second[column])
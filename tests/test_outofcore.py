@@ -0,0 +1,95 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from outofcore import RankHistogram, run_out_of_core  # noqa: E402
+from ranks import kruskal, rank_counts  # noqa: E402
+from transform import CATEGORICAL_METRICS, clean_data, run_multivariate_ab_test  # noqa: E402
+
+SEEDS = [0, 1]
+CHUNK_ROWS = 10_000
+
+def _frame(num_rows, seed, skewed=False):
+    # As the analysis query returns it; a skewed order_value puts rows outside the fences
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "order_id": np.arange(1, num_rows + 1),
+        "shipping_variant": rng.choice(["24h", "48h", "72h"], num_rows),
+        "order_value": (rng.lognormal(4, 0.8, num_rows) if skewed else rng.uniform(10, 500, num_rows)).round(2),
+        "satisfaction": np.where(rng.random(num_rows) < 0.3, np.nan, rng.integers(1, 6, num_rows)),
+        "delivery_rating": np.where(rng.random(num_rows) < 0.3, np.nan, rng.integers(1, 6, num_rows)),
+        "cancellation": rng.integers(0, 2, num_rows),
+        "on_time_delivery": rng.integers(0, 2, num_rows),
+        "repurchase_in_30_days": rng.integers(0, 2, num_rows),
+        "quarter": rng.integers(1, 5, num_rows),
+    })
+
+def _chunks(df, chunk_rows=CHUNK_ROWS):
+    return lambda: (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+
+def _runs(df):
+    results, plots, report = run_out_of_core(_chunks(df))
+    cleaned, expected_report = clean_data(df)
+    expected, _ = run_multivariate_ab_test(cleaned)
+    return results.set_index("Metric"), plots, report, expected.set_index("Metric"), expected_report
+
+@pytest.fixture(scope="module", params=SEEDS)
+def runs(request):
+    # No outliers: both runs test the same rows
+    return _runs(_frame(100_000, request.param))
+
+@pytest.fixture(scope="module", params=SEEDS)
+def skewed_runs(request):
+    return _runs(_frame(100_000, request.param, skewed=True))
+
+def test_same_tests_as_in_memory(runs, skewed_runs):
+    for results, _, _, expected, _ in (runs, skewed_runs):
+        assert list(results.index) == list(expected.index)
+        assert list(results["Test Used"]) == list(expected["Test Used"])
+
+def test_statistics_close_to_in_memory(runs):
+    # Binned order_value ranks are approximate; the ratings and count tables are exact
+    results, _, report, expected, expected_report = runs
+    assert report == expected_report
+    np.testing.assert_allclose(results["Statistic"], expected["Statistic"], rtol=0.01)
+    expected = expected.drop(index="order_value")
+    np.testing.assert_allclose(results.loc[expected.index, "Statistic"], expected["Statistic"])
+
+def test_report_close_to_clean_data(skewed_runs):
+    # Sketched fences keep nearly the same rows
+    _, _, report, _, expected_report = skewed_runs
+    assert report["initial_rows"] == expected_report["initial_rows"]
+    assert report["removed_outliers"]["order_value"] > 0
+    assert abs(report["cleaned_rows"] - expected_report["cleaned_rows"]) <= 0.01 * expected_report["cleaned_rows"]
+
+def test_plot_summaries(runs):
+    _, plots, _, _, _ = runs
+    assert [plot["kind"] for plot in plots] == ["box"] * 3 + ["proportion"] * len(CATEGORICAL_METRICS)
+    for box in plots[0]["stats"]:
+        assert box["whislo"] <= box["q1"] <= box["med"] <= box["q3"] <= box["whishi"]
+
+def test_integer_metrics_give_exact_results():
+    # Integer metrics only: the sketched quartiles land on the exact ones and every rank is exact
+    df = _frame(30_000, 2)
+    df["order_value"] = np.random.default_rng(2).integers(10, 500, len(df)).astype(float)
+    results, _, report = run_out_of_core(_chunks(df, 1_000))
+    cleaned, expected_report = clean_data(df)
+    expected, _ = run_multivariate_ab_test(cleaned)
+    assert report == expected_report
+    np.testing.assert_allclose(results["Statistic"], expected["Statistic"])
+    np.testing.assert_allclose(results["p-value"], expected["p-value"])
+
+def test_rank_histogram_matches_ranks_for_integers():
+    rng = np.random.default_rng(0)
+    values = rng.integers(1, 6, 5_000).astype(float)
+    codes = rng.integers(0, 3, 5_000)
+    histogram = RankHistogram(1.0, 5.0, integral=True)
+    for start in range(0, 5_000, 1_000):
+        histogram.update(values[start:start + 1_000], codes[start:start + 1_000])
+    expected = kruskal(rank_counts([values[codes == i] for i in range(3)]))
+    assert histogram.kruskal() == pytest.approx(expected)
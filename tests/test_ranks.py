@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import scikit_posthocs as sp
+from scipy import stats
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from ranks import dunn, kruskal, rank_counts  # noqa: E402
+
+SEEDS = [0, 1, 7]
+
+def _groups(seed, integer=True):
+    # Small groups of unequal size; integer ratings tie heavily, rounded floats a little
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(5, 30, size=3)
+    if integer:
+        return [rng.integers(1, 6, size=n).astype(float) for n in sizes]
+    return [np.round(rng.normal(size=n), 1) for n in sizes]
+
+@pytest.mark.parametrize("integer", [True, False])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_kruskal_matches_scipy(seed, integer):
+    groups = _groups(seed, integer)
+    h, p_value = kruskal(rank_counts(groups))
+    expected = stats.kruskal(*groups)
+    assert h == pytest.approx(expected.statistic)
+    assert p_value == pytest.approx(expected.pvalue)
+
+@pytest.mark.parametrize("integer", [True, False])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_dunn_matches_scikit_posthocs(seed, integer):
+    groups = _groups(seed, integer)
+    frame = pd.DataFrame({
+        "value": np.concatenate(groups),
+        "group": np.repeat(np.arange(len(groups)), [len(g) for g in groups]),
+    })
+    expected = sp.posthoc_dunn(frame, val_col="value", group_col="group")
+    np.testing.assert_allclose(dunn(rank_counts(groups)), expected.to_numpy())
+
+def test_nans_are_skipped():
+    groups = [np.array([1.0, 2.0, np.nan, 2.0]), np.array([3.0, np.nan, 3.0, 1.0])]
+    h, p_value = kruskal(rank_counts(groups))
+    expected = stats.kruskal(*[g[~np.isnan(g)] for g in groups])
+    assert (h, p_value) == pytest.approx((expected.statistic, expected.pvalue))
+
+def test_every_value_tied():
+    # No spread to rank: the tie correction is zero and H is undefined, as in scipy
+    h, _ = kruskal(rank_counts([np.full(4, 2.0), np.full(3, 2.0)]))
+    assert np.isnan(h)
@@ -0,0 +1,45 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from resampling import permutation_test, resampling_test  # noqa: E402
+
+def _groups(shift, seed=0, size=2_000):
+    rng = np.random.default_rng(seed)
+    return {variant: rng.normal(i * shift, 1, size) for i, variant in enumerate(("24h", "48h", "72h"))}
+
+def _pooled(groups):
+    return np.concatenate(list(groups.values())), np.repeat(np.arange(len(groups)), [len(g) for g in groups.values()])
+
+def test_statistic_is_between_group_ss():
+    groups = _groups(0.1)
+    values, labels = _pooled(groups)
+    statistic, p_value = permutation_test(values, labels, 200)
+    expected = sum(len(g) * (g.mean() - values.mean()) ** 2 for g in groups.values())
+    assert statistic == pytest.approx(expected)
+    assert p_value == 1 / 201
+
+def test_no_effect_is_not_significant():
+    values, labels = _pooled(_groups(0.0))
+    assert permutation_test(values, labels, 500)[1] > 0.05
+
+def test_small_budget_chunks_and_rejects():
+    values, labels = _pooled(_groups(0.0, size=500))
+    # Batches of a few permutations each, row-chunked, give a valid p-value
+    _, p_value = permutation_test(values, labels, 300, budget=50_000)
+    assert 0 < p_value <= 1
+    with pytest.raises(ValueError, match="RESAMPLING_MEMORY_MB"):
+        permutation_test(values, labels, 10, budget=1_000)
+
+def test_executor_gives_the_in_process_result():
+    groups = _groups(0.02, size=1_000)
+    values, labels = _pooled(groups)
+    with ProcessPoolExecutor(2) as executor:
+        assert permutation_test(values, labels, 400, budget=100_000, executor=executor) == \
+            permutation_test(values, labels, 400, budget=100_000)
+        assert resampling_test(groups, 200, 200, executor=executor) == resampling_test(groups, 200, 200)
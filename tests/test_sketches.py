@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etl_pipeline"))
+
+from sketches import KLLSketch, iqr_fences, sketch_columns, sketch_quartiles  # noqa: E402
+from transform import CONTINUOUS_METRICS, clean_data  # noqa: E402
+
+SEEDS = [0, 1, 7]
+MAX_RANK_ERROR = 0.01
+
+def _frame(num_rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "order_value": rng.lognormal(4, 0.8, num_rows),
+        "satisfaction": np.where(rng.random(num_rows) < 0.3, np.nan, rng.integers(1, 6, num_rows)),
+        "delivery_rating": np.where(rng.random(num_rows) < 0.3, np.nan, rng.integers(1, 6, num_rows)),
+    })
+
+def assert_within_rank_error(values, q, estimate, max_error=MAX_RANK_ERROR):
+    # Any rank the estimate occupies counts (ties in discrete ratings span many ranks)
+    ordered = np.sort(values)
+    low, high = np.searchsorted(ordered, estimate, "left"), np.searchsorted(ordered, estimate, "right")
+    assert low / len(values) - max_error <= q <= high / len(values) + max_error
+
+def test_exact_until_compaction():
+    values = np.random.default_rng(0).normal(size=150)
+    sketch = KLLSketch().update(values)
+    assert sketch.exact
+    np.testing.assert_allclose(sketch.quantile([0.1, 0.25, 0.75]), np.quantile(values, [0.1, 0.25, 0.75]))
+
+@pytest.mark.parametrize("col", CONTINUOUS_METRICS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_merged_shards_within_rank_error(seed, col):
+    values = _frame(200_000, seed)[col].dropna().to_numpy()
+    merged = KLLSketch()
+    for i, shard in enumerate(np.array_split(values, 8)):
+        merged.merge(KLLSketch(seed=i).update(shard))
+    assert merged.count == len(values)
+    for q, estimate in zip((0.25, 0.75), merged.quantile([0.25, 0.75])):
+        assert_within_rank_error(values, q, estimate)
+
+def test_fences_match_exact_quartiles():
+    df = _frame(200_000, 0).dropna()
+    chunks = (df.iloc[start:start + 10_000] for start in range(0, len(df), 10_000))
+    quartiles = sketch_quartiles(sketch_columns(chunks, CONTINUOUS_METRICS))
+    lower, upper = iqr_fences(quartiles)
+    exact_lower, exact_upper = iqr_fences(df.quantile([0.25, 0.75]))
+    # Ratings land on the exact quartiles; the continuous metric within the rank error
+    for col in ("satisfaction", "delivery_rating"):
+        assert (lower[col], upper[col]) == (exact_lower[col], exact_upper[col])
+    values = df["order_value"].to_numpy()
+    for q, estimate in zip((0.25, 0.75), quartiles["order_value"]):
+        assert_within_rank_error(values, q, estimate)
+
+def test_iqr_fences():
+    quartiles = pd.DataFrame({"a": [1.0, 3.0]}, index=[0.25, 0.75])
+    lower, upper = iqr_fences(quartiles)
+    assert (lower["a"], upper["a"]) == (-2.0, 6.0)
+
+def test_clean_data_matches_per_metric_reference():
+    df = _frame(50_000, 1)
+    cleaned, report = clean_data(df)
+    present = df.dropna(subset=CONTINUOUS_METRICS)
+    quartiles = present[CONTINUOUS_METRICS].quantile([0.25, 0.75])
+    keep = np.ones(len(present), dtype=bool)
+    for col in CONTINUOUS_METRICS:
+        q1, q3 = quartiles[col]
+        keep &= present[col].between(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)).to_numpy()
+    pd.testing.assert_frame_equal(cleaned, present[keep])
+    assert report["removed_rows"] == len(df) - keep.sum()
+
+def test_sketched_clean_data_close_to_exact():
+    df = _frame(200_000, 2)
+    exact, _ = clean_data(df)
+    approximate, _ = clean_data(df, approximate=True, chunk_rows=20_000)
+    assert abs(len(approximate) - len(exact)) <= MAX_RANK_ERROR * len(exact)